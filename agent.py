@@ -9,12 +9,13 @@ from extractor import extract_entities
 from state import BookingState
 import state
 from tools import check_availability, book_appointment, cancel_appointment, is_working_day
-from state import FlowStage
+from state import CandidateAppointment, FlowStage
 
 from tools import cancel_appointment_by_id, update_calendar_event, is_within_clinic_hours
 from uuid import UUID
 from db.repository import reschedule_appointment_db
-from db.database import SessionLocal
+from db.database import session_scope
+from services.calendar_client import CalendarUnavailable
 
 # ===== PHASE 6.5 IMPORTS =====
 from db.repository import (
@@ -37,6 +38,12 @@ RESET_KEYWORDS = {
     "sorry", "cancel this", "never mind", "forget it"
 }
 
+# Calendar is down or short-circuited: fail fast, keep the flow
+CALENDAR_BUSY_REPLY = (
+    "⏳ The clinic calendar is not responding right now.\n"
+    "Please try again shortly — reply *yes* to retry."
+)
+
 
 # ---------------------------
 # Normalization helpers
@@ -331,6 +338,9 @@ def run_agent(user_message: str, state: BookingState) -> str:
                 f"Appointment cancelled | doctor_id={doctor_id} | "
                 f"appointment_id={state.selected_appointment_id}"
             )
+            except CalendarUnavailable:
+                # Keep the confirmation step so "yes" retries
+                return CALENDAR_BUSY_REPLY
             except Exception:
                 state.reset_flow()
                 return (
@@ -366,7 +376,7 @@ def run_agent(user_message: str, state: BookingState) -> str:
                 state.reset_flow()
                 return "You don’t have any active appointments."
 
-            state.candidate_appointments = appts
+            state.candidate_appointments = CandidateAppointment.from_rows(appts)
 
             if len(appts) == 1:
                 chosen = appts[0]
@@ -384,13 +394,10 @@ def run_agent(user_message: str, state: BookingState) -> str:
                 if appt_datetime - now < timedelta(hours=24):
 
                     # 🔥 FETCH CLINIC NUMBER
-                    db = SessionLocal()
-                    try:
+                    with session_scope() as db:
                         doctor = get_doctor_by_id(db, doctor_id)
-                    finally:
-                        db.close()
 
-                    clinic_phone = doctor.whatsapp_number or "the clinic"
+                    clinic_phone = doctor.clinic_phone_number or "the clinic"
 
                     state.reset_flow()
                     return (
@@ -444,13 +451,10 @@ def run_agent(user_message: str, state: BookingState) -> str:
             if appt_datetime - now < timedelta(hours=24):
 
                 # 🔥 FETCH CLINIC NUMBER
-                db = SessionLocal()
-                try:
+                with session_scope() as db:
                     doctor = get_doctor_by_id(db, doctor_id)
-                finally:
-                    db.close()
 
-                clinic_phone = doctor.whatsapp_number or "the clinic"
+                clinic_phone = doctor.clinic_phone_number or "the clinic"
 
                 state.reset_flow()
                 return (
@@ -495,7 +499,7 @@ def run_agent(user_message: str, state: BookingState) -> str:
                     state.reset_flow()
                     return "❌ No active appointments found for this number."
 
-                state.candidate_appointments = appts
+                state.candidate_appointments = CandidateAppointment.from_rows(appts)
 
                 if len(appts) == 1:
                     chosen = appts[0]
@@ -513,13 +517,10 @@ def run_agent(user_message: str, state: BookingState) -> str:
                     if appt_datetime - now < timedelta(hours=24):
 
                         # 🔥 FETCH CLINIC NUMBER
-                        db = SessionLocal()
-                        try:
+                        with session_scope() as db:
                             doctor = get_doctor_by_id(db, doctor_id)
-                        finally:
-                            db.close()
 
-                        clinic_phone = doctor.whatsapp_number or "the clinic"
+                        clinic_phone = doctor.clinic_phone_number or "the clinic"
 
                         state.reset_flow()
                         return (
@@ -555,13 +556,10 @@ def run_agent(user_message: str, state: BookingState) -> str:
                     if appt_datetime - now < timedelta(hours=24):
 
                         # 🔥 FETCH CLINIC NUMBER
-                        db = SessionLocal()
-                        try:
+                        with session_scope() as db:
                             doctor = get_doctor_by_id(db, doctor_id)
-                        finally:
-                            db.close()
 
-                        clinic_phone = doctor.whatsapp_number or "the clinic"
+                        clinic_phone = doctor.clinic_phone_number or "the clinic"
 
                         state.reset_flow()
                         return (
@@ -613,11 +611,8 @@ def run_agent(user_message: str, state: BookingState) -> str:
                 return "Could you please tell me the preferred time?"
 
             if not is_within_clinic_hours(t, doctor_id):
-                db = SessionLocal()
-                try:
+                with session_scope() as db:
                     doctor = get_doctor_by_id(db, doctor_id)
-                finally:
-                    db.close()
                 return (
                     "❌ The doctor is not available at that time.\n\n"
                     f"🕒 Clinic hours are "
@@ -681,6 +676,8 @@ def run_agent(user_message: str, state: BookingState) -> str:
                     new_date=state.reschedule_date,
                     new_time=state.reschedule_time,
                 )
+            except CalendarUnavailable:
+                return CALENDAR_BUSY_REPLY
             except Exception:
                 state.reset_flow()
                 return (
@@ -759,11 +756,8 @@ def run_agent(user_message: str, state: BookingState) -> str:
             
 
             if not is_within_clinic_hours(t, doctor_id):
-                db = SessionLocal()
-                try:
+                with session_scope() as db:
                     doctor = get_doctor_by_id(db,doctor_id)
-                finally:
-                    db.close() 
                 return (
                     "❌ The doctor is not available at that time.\n\n"
                     f"🕒 Clinic hours are "
@@ -845,6 +839,8 @@ def run_agent(user_message: str, state: BookingState) -> str:
         )
 
                 
+            except CalendarUnavailable:
+                return CALENDAR_BUSY_REPLY
             except Exception as e:
                 state.reset_flow()
                 return f"❌ Booking failed: {str(e)}"
@@ -19,10 +19,18 @@ if config.config_file_name is not None:
 # ---- Import DB + Models ----
 from db.database import Base  # Base.metadata
 from db import models         # IMPORTANT: ensures models are registered
+from db.partitions import is_partition_table
 
 target_metadata = Base.metadata
 
 
+def include_name(name, type_, parent_names):
+    # Monthly partitions / archive are managed by db.partitions, not models
+    if type_ == "table":
+        return not is_partition_table(name)
+    return True
+
+
 def get_database_url():
     return os.getenv("DATABASE_URL")
 
@@ -35,6 +43,7 @@ def run_migrations_offline() -> None:
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
         compare_type=True,
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -56,6 +65,7 @@ def run_migrations_online() -> None:
             connection=connection,
             target_metadata=target_metadata,
             compare_type=True,
+            include_name=include_name,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,38 @@
+"""add conversation state
+
+Revision ID: 2b6f0d9c4e17
+Revises: 9a4c1e7f3b28
+Create Date: 2026-10-19 21:04:51.227630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b6f0d9c4e17'
+down_revision: Union[str, Sequence[str], None] = '9a4c1e7f3b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # UNLOGGED: no WAL for a row rewritten on every chat turn. The table
+    # is truncated after a crash (and not replicated), which for live
+    # conversations and dashboard logins just means starting over.
+    op.create_table('conversation_state',
+    sa.Column('namespace', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('namespace', 'key'),
+    prefixes=['UNLOGGED']
+    )
+    op.create_index('ix_conversation_state_updated_at', 'conversation_state', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversation_state_updated_at', table_name='conversation_state')
+    op.drop_table('conversation_state')
@@ -0,0 +1,193 @@
+"""merge duplicate patients and make phone unique
+
+Revision ID: 3d7a9c5e21f4
+Revises: 8c2f4e1a9b73
+Create Date: 2026-10-19 11:02:17.540931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7a9c5e21f4'
+down_revision: Union[str, Sequence[str], None] = '8c2f4e1a9b73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 5000
+
+# Same rules as db.repository.normalize_patient_phone
+NORMALIZED_PHONE = """
+    CASE
+        WHEN regexp_replace(phone, '\\D', '', 'g') ~ '^91[0-9]{10}$'
+            THEN substr(regexp_replace(phone, '\\D', '', 'g'), 3)
+        WHEN regexp_replace(phone, '\\D', '', 'g') ~ '^0[0-9]{10}$'
+            THEN substr(regexp_replace(phone, '\\D', '', 'g'), 2)
+        ELSE regexp_replace(phone, '\\D', '', 'g')
+    END
+"""
+
+
+def _run_in_batches(conn, sql: str) -> int:
+    """Repeat a LIMIT-ed statement (one commit each) until it touches nothing."""
+    total = 0
+    while True:
+        count = conn.execute(sa.text(sql), {"batch": BATCH_SIZE}).rowcount
+        if not count:
+            return total
+        total += count
+
+
+def _merge_duplicates(conn) -> int:
+    """Fold every patient into the oldest row with the same phone."""
+
+    # old patient -> surviving patient. Rebuilt on every pass, so a
+    # failed run can simply be repeated.
+    conn.execute(sa.text("DROP TABLE IF EXISTS patient_merge_map"))
+    conn.execute(sa.text("""
+        CREATE TABLE patient_merge_map AS
+        SELECT patient_id AS old_id, keep_id
+        FROM (
+            SELECT
+                patient_id,
+                first_value(patient_id) OVER (
+                    PARTITION BY phone
+                    ORDER BY first_seen_at NULLS LAST, patient_id
+                ) AS keep_id
+            FROM patients
+        ) ranked
+        WHERE patient_id <> keep_id
+    """))
+    conn.execute(sa.text(
+        "CREATE UNIQUE INDEX ON patient_merge_map (old_id) INCLUDE (keep_id)"
+    ))
+    conn.execute(sa.text("ANALYZE patient_merge_map"))
+
+    merged = conn.execute(sa.text("SELECT count(*) FROM patient_merge_map")).scalar()
+
+    if merged:
+        # Survivors take the latest name and the full seen-range
+        conn.execute(sa.text("""
+            UPDATE patients k
+            SET name = agg.name,
+                first_seen_at = agg.first_seen_at,
+                last_seen_at = agg.last_seen_at
+            FROM (
+                SELECT
+                    m.keep_id,
+                    (array_agg(p.name ORDER BY p.last_seen_at DESC NULLS LAST))[1] AS name,
+                    min(p.first_seen_at) AS first_seen_at,
+                    max(p.last_seen_at) AS last_seen_at
+                FROM (
+                    SELECT old_id, keep_id FROM patient_merge_map
+                    UNION ALL
+                    SELECT DISTINCT keep_id, keep_id FROM patient_merge_map
+                ) m
+                JOIN patients p ON p.patient_id = m.old_id
+                GROUP BY m.keep_id
+            ) agg
+            WHERE k.patient_id = agg.keep_id
+        """))
+
+        # Repoint appointments
+        _run_in_batches(conn, """
+            UPDATE appointments a
+            SET patient_id = m.keep_id
+            FROM patient_merge_map m
+            WHERE a.patient_id = m.old_id
+              AND a.appointment_id IN (
+                  SELECT a2.appointment_id
+                  FROM appointments a2
+                  JOIN patient_merge_map m2 ON m2.old_id = a2.patient_id
+                  LIMIT :batch
+              )
+        """)
+
+        # Drop the merged rows
+        _run_in_batches(conn, """
+            DELETE FROM patients
+            WHERE patient_id IN (
+                SELECT p.patient_id
+                FROM patients p
+                JOIN patient_merge_map m ON m.old_id = p.patient_id
+                LIMIT :batch
+            )
+        """)
+
+    conn.execute(sa.text("DROP TABLE patient_merge_map"))
+    return merged
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # Short transactions only: bookings keep running during the merge
+    with op.get_context().autocommit_block():
+
+        # 1️⃣ Normalize stored phones
+        _run_in_batches(conn, f"""
+            UPDATE patients SET phone = {NORMALIZED_PHONE}
+            WHERE patient_id IN (
+                SELECT patient_id FROM patients
+                WHERE phone <> {NORMALIZED_PHONE}
+                LIMIT :batch
+            )
+        """)
+
+        # 2️⃣ Merge; repeat while bookings from not-yet-upgraded app
+        #    servers keep adding duplicates
+        while _merge_duplicates(conn):
+            pass
+
+        # 3️⃣ Enforce it from now on. A failed CONCURRENTLY build leaves
+        #    an INVALID index behind that IF NOT EXISTS would skip.
+        invalid = conn.execute(sa.text("""
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'ux_patients_phone' AND NOT i.indisvalid
+        """)).first()
+        if invalid:
+            op.drop_index(
+                "ux_patients_phone",
+                table_name="patients",
+                postgresql_concurrently=True,
+            )
+
+        op.create_index(
+            "ux_patients_phone",
+            "patients",
+            ["phone"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_patients_phone",
+            table_name="patients",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        conn.execute(sa.text("ANALYZE patients"))
+
+
+def downgrade() -> None:
+    # Merged patients are not split back out; only the constraint goes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_patients_phone",
+            "patients",
+            ["phone"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ux_patients_phone",
+            table_name="patients",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,87 @@
+"""add hot query indexes
+
+Revision ID: 8c2f4e1a9b73
+Revises: 50aeb3c2d326
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f4e1a9b73'
+down_revision: Union[str, Sequence[str], None] = '50aeb3c2d326'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BOOKED = sa.text("status = 'BOOKED'")
+ACTIVE = sa.text("is_active")
+
+# (name, table, columns, extra kwargs) – keep in sync with db/models.py
+INDEXES = [
+    (
+        "ix_appointments_doctor_booked_slot",
+        "appointments",
+        ["doctor_id", "appointment_date", "appointment_time", "appointment_id"],
+        {
+            "postgresql_include": ["calendar_event_id", "patient_id"],
+            "postgresql_where": BOOKED,
+        },
+    ),
+    (
+        "ix_appointments_doctor_date",
+        "appointments",
+        ["doctor_id", "appointment_date", "appointment_time"],
+        {},
+    ),
+    (
+        "ix_appointments_patient_booked",
+        "appointments",
+        ["patient_id", "doctor_id", "appointment_date", "appointment_time"],
+        {"postgresql_where": BOOKED},
+    ),
+    ("ix_appointments_patient_id", "appointments", ["patient_id"], {}),
+    ("ix_appointments_calendar_event_id", "appointments", ["calendar_event_id"], {}),
+    ("ix_patients_phone", "patients", ["phone"], {}),
+    ("ix_doctors_email_active", "doctors", ["email"], {"postgresql_where": ACTIVE}),
+    (
+        "ix_doctors_whatsapp_active",
+        "doctors",
+        ["doctor_whatsapp_number"],
+        {"postgresql_where": ACTIVE},
+    ),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    # IF NOT EXISTS makes a re-run safe after a partial failure,
+    # but an INVALID leftover index must be dropped by hand first.
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kwargs,
+            )
+
+        for table in ("appointments", "patients", "doctors"):
+            op.execute(f"ANALYZE {table};")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
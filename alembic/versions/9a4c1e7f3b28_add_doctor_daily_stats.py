@@ -0,0 +1,61 @@
+"""add doctor daily stats
+
+Revision ID: 9a4c1e7f3b28
+Revises: e5a13f8b0c27
+Create Date: 2026-10-19 18:12:36.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c1e7f3b28'
+down_revision: Union[str, Sequence[str], None] = 'e5a13f8b0c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('doctor_daily_stats',
+    sa.Column('doctor_id', sa.UUID(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('booked', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('cancelled', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rescheduled', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['doctor_id'], ['doctors.doctor_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('doctor_id', 'day')
+    )
+
+    # Backfill what the history can tell: every appointment was booked
+    # on created_at, cancelled ones were cancelled on their last update.
+    # Past reschedules left no trace and start at 0.
+    op.execute("""
+        INSERT INTO doctor_daily_stats (doctor_id, day, booked, cancelled)
+        SELECT doctor_id, day, sum(booked), sum(cancelled)
+        FROM (
+            SELECT doctor_id, created_at::date AS day, 1 AS booked, 0 AS cancelled
+            FROM appointments
+            WHERE created_at IS NOT NULL
+            UNION ALL
+            SELECT doctor_id, updated_at::date, 0, 1
+            FROM appointments
+            WHERE status = 'CANCELLED' AND updated_at IS NOT NULL
+            UNION ALL
+            SELECT doctor_id, created_at::date, 1, 0
+            FROM appointments_archive
+            WHERE created_at IS NOT NULL
+            UNION ALL
+            SELECT doctor_id, updated_at::date, 0, 1
+            FROM appointments_archive
+            WHERE status = 'CANCELLED' AND updated_at IS NOT NULL
+        ) history
+        WHERE doctor_id IS NOT NULL
+        GROUP BY doctor_id, day
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('doctor_daily_stats')
@@ -0,0 +1,175 @@
+"""partition appointments by month
+
+Revision ID: b41e7d2c9a60
+Revises: 3d7a9c5e21f4
+Create Date: 2026-10-19 14:26:51.118304
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e7d2c9a60'
+down_revision: Union[str, Sequence[str], None] = '3d7a9c5e21f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Later months are created by db.partitions.ensure_appointment_partitions
+MONTHS_AHEAD = 12
+
+COLUMNS = """
+    appointment_id uuid NOT NULL,
+    doctor_id uuid REFERENCES doctors (doctor_id),
+    patient_id uuid REFERENCES patients (patient_id),
+    appointment_date date NOT NULL,
+    appointment_time time without time zone NOT NULL,
+    status varchar,
+    calendar_event_id varchar,
+    created_at timestamp without time zone DEFAULT now(),
+    updated_at timestamp without time zone DEFAULT now()
+"""
+
+# Same as db.models.Appointment / revision 8c2f4e1a9b73
+INDEXES = [
+    (
+        "ix_appointments_doctor_booked_slot",
+        "(doctor_id, appointment_date, appointment_time, appointment_id) "
+        "INCLUDE (calendar_event_id, patient_id) WHERE status = 'BOOKED'",
+    ),
+    ("ix_appointments_doctor_date", "(doctor_id, appointment_date, appointment_time)"),
+    (
+        "ix_appointments_patient_booked",
+        "(patient_id, doctor_id, appointment_date, appointment_time) WHERE status = 'BOOKED'",
+    ),
+    ("ix_appointments_patient_id", "(patient_id)"),
+    ("ix_appointments_calendar_event_id", "(calendar_event_id)"),
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes() -> None:
+    for name, definition in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON appointments {definition}")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # A partitioned table can't be made from an existing one: build it
+    # next to the old table and swap. Reads keep working, writes wait
+    # for the copy; run it in a quiet window on large tables.
+    op.execute("LOCK TABLE appointments IN EXCLUSIVE MODE")
+
+    # 1️⃣ New parent. The partition key has to be part of the PK.
+    op.execute(f"""
+        CREATE TABLE appointments_partitioned (
+            {COLUMNS},
+            CONSTRAINT appointments_partitioned_pkey
+                PRIMARY KEY (appointment_id, appointment_date)
+        ) PARTITION BY RANGE (appointment_date)
+    """)
+    op.execute(
+        "CREATE TABLE appointments_default "
+        "PARTITION OF appointments_partitioned DEFAULT"
+    )
+
+    # 2️⃣ One partition per month, from the oldest appointment
+    first_day = conn.execute(sa.text("SELECT min(appointment_date) FROM appointments")).scalar()
+    current = date.today().replace(day=1)
+    month = min(first_day.replace(day=1), current) if first_day else current
+    last = _add_months(current, MONTHS_AHEAD)
+
+    while month <= last:
+        end = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE appointments_y{month.year:04d}m{month.month:02d} "
+            f"PARTITION OF appointments_partitioned "
+            f"FOR VALUES FROM ('{month}') TO ('{end}')"
+        )
+        month = end
+
+    # 3️⃣ Copy, swap, index (indexes built once, after the copy)
+    op.execute("""
+        INSERT INTO appointments_partitioned (
+            appointment_id, doctor_id, patient_id,
+            appointment_date, appointment_time,
+            status, calendar_event_id, created_at, updated_at
+        )
+        SELECT
+            appointment_id, doctor_id, patient_id,
+            appointment_date, appointment_time,
+            status, calendar_event_id, created_at, updated_at
+        FROM appointments
+    """)
+
+    op.execute("DROP TABLE appointments")
+    op.execute("ALTER TABLE appointments_partitioned RENAME TO appointments")
+    op.execute(
+        "ALTER TABLE appointments RENAME CONSTRAINT "
+        "appointments_partitioned_pkey TO appointments_pkey"
+    )
+    op.execute(
+        "ALTER TABLE appointments RENAME CONSTRAINT "
+        "appointments_partitioned_doctor_id_fkey TO appointments_doctor_id_fkey"
+    )
+    op.execute(
+        "ALTER TABLE appointments RENAME CONSTRAINT "
+        "appointments_partitioned_patient_id_fkey TO appointments_patient_id_fkey"
+    )
+    _create_indexes()
+
+    # 4️⃣ Where old months are detached to (db.partitions)
+    op.execute("""
+        CREATE TABLE appointments_archive (
+            LIKE appointments INCLUDING DEFAULTS,
+            PRIMARY KEY (appointment_id, appointment_date)
+        ) PARTITION BY RANGE (appointment_date)
+    """)
+
+    op.execute("ANALYZE appointments")
+
+
+def downgrade() -> None:
+    op.execute("LOCK TABLE appointments IN EXCLUSIVE MODE")
+
+    op.execute(f"""
+        CREATE TABLE appointments_unpartitioned (
+            {COLUMNS},
+            CONSTRAINT appointments_unpartitioned_pkey PRIMARY KEY (appointment_id)
+        )
+    """)
+
+    # Archived months come back too
+    for source in ("appointments", "appointments_archive"):
+        op.execute(f"""
+            INSERT INTO appointments_unpartitioned
+            SELECT
+                appointment_id, doctor_id, patient_id,
+                appointment_date, appointment_time,
+                status, calendar_event_id, created_at, updated_at
+            FROM {source}
+        """)
+
+    # Dropping the parents drops every partition with them
+    op.execute("DROP TABLE appointments_archive")
+    op.execute("DROP TABLE appointments")
+
+    op.execute("ALTER TABLE appointments_unpartitioned RENAME TO appointments")
+    for old, new in (
+        ("appointments_unpartitioned_pkey", "appointments_pkey"),
+        ("appointments_unpartitioned_doctor_id_fkey", "appointments_doctor_id_fkey"),
+        ("appointments_unpartitioned_patient_id_fkey", "appointments_patient_id_fkey"),
+    ):
+        op.execute(f"ALTER TABLE appointments RENAME CONSTRAINT {old} TO {new}")
+    _create_indexes()
+
+    op.execute("ANALYZE appointments")
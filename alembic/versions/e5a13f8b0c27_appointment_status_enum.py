@@ -0,0 +1,90 @@
+"""store appointment status as an enum
+
+Revision ID: e5a13f8b0c27
+Revises: b41e7d2c9a60
+Create Date: 2026-10-19 16:08:42.905117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a13f8b0c27'
+down_revision: Union[str, Sequence[str], None] = 'b41e7d2c9a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+STATUSES = ("BOOKED", "CANCELLED")
+
+# Same as db.models.Appointment; their predicates mention status
+PARTIAL_INDEXES = [
+    (
+        "ix_appointments_doctor_booked_slot",
+        "(doctor_id, appointment_date, appointment_time, appointment_id) "
+        "INCLUDE (calendar_event_id, patient_id)",
+    ),
+    (
+        "ix_appointments_patient_booked",
+        "(patient_id, doctor_id, appointment_date, appointment_time)",
+    ),
+]
+
+TABLES = ("appointments", "appointments_archive")
+
+
+def _drop_partial_indexes() -> None:
+    for name, _ in PARTIAL_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _create_partial_indexes() -> None:
+    for name, columns in PARTIAL_INDEXES:
+        op.execute(f"CREATE INDEX {name} ON appointments {columns} WHERE status = 'BOOKED'")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # 1️⃣ Refuse to guess what unknown values mean
+    for table in TABLES:
+        unknown = conn.execute(sa.text(f"""
+            SELECT DISTINCT status FROM {table}
+            WHERE status IS NOT NULL AND status NOT IN :statuses
+        """).bindparams(sa.bindparam("statuses", expanding=True)), {"statuses": list(STATUSES)}).scalars().all()
+        if unknown:
+            raise RuntimeError(f"Unexpected appointment statuses in {table}: {unknown}")
+
+    # 2️⃣ Rewrite the column (and every partition) as the enum.
+    #    This takes an ACCESS EXCLUSIVE lock for the whole rewrite.
+    values = ", ".join(f"'{status}'" for status in STATUSES)
+    op.execute(f"CREATE TYPE appointment_status AS ENUM ({values})")
+
+    _drop_partial_indexes()
+    for table in TABLES:
+        op.execute(
+            f"ALTER TABLE {table} ALTER COLUMN status "
+            f"TYPE appointment_status USING status::appointment_status"
+        )
+
+    # 3️⃣ Predicates now compare enums instead of casting to text
+    _create_partial_indexes()
+
+    op.execute("ANALYZE appointments")
+
+
+def downgrade() -> None:
+    _drop_partial_indexes()
+    for table in TABLES:
+        op.execute(
+            f"ALTER TABLE {table} ALTER COLUMN status "
+            f"TYPE varchar USING status::text"
+        )
+    op.execute("DROP TYPE appointment_status")
+
+    _create_partial_indexes()
+
+    op.execute("ANALYZE appointments")
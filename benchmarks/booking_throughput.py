@@ -0,0 +1,123 @@
+# benchmarks/booking_throughput.py
+
+"""
+Booking throughput against the fake calendar server.
+
+Usage (from the repo root):
+    python fake_calendar.py &
+    FAKE_CALENDAR_URL=http://127.0.0.1:8765 \\
+        python -m benchmarks.booking_throughput --bookings 200 --concurrency 8
+
+Creates a throwaway benchmark doctor with fake calendar credentials,
+books N appointments through tools.book_appointment and prints
+throughput and latency percentiles.
+"""
+
+import argparse
+import os
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dtime, timedelta
+
+
+def _seed_doctor():
+    from db.repository import create_doctor, save_doctor_calendar_credentials
+
+    suffix = uuid.uuid4().hex[:8]
+    doctor = create_doctor(
+        name=f"Bench {suffix}",
+        email=f"bench-{suffix}@example.com",
+        clinic_email=f"bench-{suffix}@example.com",
+        doctor_whatsapp_number=None,
+        clinic_phone_number=None,
+        slug=f"bench-{suffix}",
+        working_days=[0, 1, 2, 3, 4, 5, 6],
+        work_start_time=dtime(0, 0),
+        work_end_time=dtime(23, 59),
+        avg_consult_minutes=15,
+        buffer_minutes=0,
+    )
+
+    save_doctor_calendar_credentials(
+        doctor_id=doctor.doctor_id,
+        provider="google",
+        calendar_id=f"bench-{suffix}@fake.calendar",
+        access_token="fake-access-token",
+        refresh_token="fake-refresh-token",
+        expires_at=datetime.utcnow() + timedelta(days=1),
+    )
+
+    return doctor
+
+
+def _slots(count: int):
+    """Distinct (date, time) pairs, 15 minutes apart, starting tomorrow."""
+    start = datetime.combine(date.today() + timedelta(days=1), dtime(0, 0))
+    for i in range(count):
+        slot = start + timedelta(minutes=15 * i)
+        yield slot.strftime("%Y-%m-%d"), slot.strftime("%H:%M")
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bookings", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if not os.getenv("FAKE_CALENDAR_URL"):
+        raise SystemExit("FAKE_CALENDAR_URL must point at fake_calendar.py")
+
+    from db.database import request_scope
+    from tools import book_appointment
+
+    doctor = _seed_doctor()
+    print(f"Benchmark doctor: {doctor.slug} ({doctor.doctor_id})")
+
+    latencies = []
+    failures = 0
+
+    def book(numbered_slot):
+        i, (date_str, time_str) = numbered_slot
+        started = time.perf_counter()
+        try:
+            # One scope per booking, like a chat request
+            with request_scope():
+                book_appointment(
+                    date_str,
+                    time_str,
+                    doctor.doctor_id,
+                    "Bench Patient",
+                    # Distinct patients; one phone would serialize the upserts
+                    f"9{i:09d}",
+                )
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, e
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for elapsed, error in pool.map(book, enumerate(_slots(args.bookings))):
+            latencies.append(elapsed)
+            if error:
+                failures += 1
+    wall = time.perf_counter() - started
+
+    ok = len(latencies) - failures
+    print(f"bookings:    {len(latencies)} ({failures} failed)")
+    print(f"wall time:   {wall:.2f}s")
+    print(f"throughput:  {ok / wall:.1f} bookings/s")
+    print(f"latency p50: {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"latency p95: {_percentile(latencies, 95) * 1000:.1f} ms")
+    print(f"latency max: {max(latencies) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
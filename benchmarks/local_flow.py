@@ -0,0 +1,146 @@
+# benchmarks/local_flow.py
+
+"""
+Book / reschedule / cancel round trips, all in one process.
+
+Usage (from the repo root):
+    TWILIO_ACCOUNT_SID=AC... TWILIO_AUTH_TOKEN=... \\
+        python -m benchmarks.local_flow --flows 200
+
+No Postgres or calendar server needed: without DATABASE_URL it uses a
+fresh SQLite file (WAL, see db.database.SQLITE_PRAGMAS) and without
+FAKE_CALENDAR_URL it serves fake_calendar.py from a background thread.
+Each flow goes through the same tools / repository calls as the chat
+agent:
+
+- book        tools.book_appointment
+- reschedule  phone lookup, availability check, calendar patch, DB update
+- cancel      phone lookup, calendar delete, DB update
+
+and the per-step latency percentiles are printed at the end.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from benchmarks.booking_throughput import _percentile, _seed_doctor, _slots
+
+
+def _start_fake_calendar() -> str:
+    """fake_calendar.app on a free local port; returns its base URL."""
+    import uvicorn
+    from fake_calendar import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise SystemExit("fake calendar did not start")
+        time.sleep(0.01)
+
+    return f"http://127.0.0.1:{port}"
+
+
+def _run_flow(doctor, phone, slot, new_slot, timings):
+    from db.database import request_scope
+    from db.repository import get_active_appointments_by_phone, reschedule_appointment_db
+    from tools import (
+        book_appointment,
+        cancel_appointment_by_id,
+        check_availability_db,
+        update_calendar_event,
+    )
+
+    def timed(step, fn):
+        started = time.perf_counter()
+        # One scope per step, like one chat turn
+        with request_scope():
+            result = fn()
+        timings[step].append(time.perf_counter() - started)
+        return result
+
+    timed("book", lambda: book_appointment(*slot, doctor.doctor_id, "Local Patient", phone))
+
+    def reschedule():
+        appt = get_active_appointments_by_phone(phone=phone, doctor_id=doctor.doctor_id)[0]
+        if not check_availability_db(*new_slot, doctor.doctor_id, exclude_appointment_id=appt.appointment_id):
+            raise RuntimeError(f"Slot {new_slot} unexpectedly taken")
+        update_calendar_event(
+            doctor_id=doctor.doctor_id,
+            event_id=appt.calendar_event_id,
+            new_date=new_slot[0],
+            new_time=new_slot[1],
+        )
+        reschedule_appointment_db(
+            appointment_id=appt.appointment_id,
+            new_date=new_slot[0],
+            new_time=new_slot[1],
+            new_calendar_event_id=appt.calendar_event_id,
+        )
+
+    timed("reschedule", reschedule)
+
+    def cancel():
+        appt = get_active_appointments_by_phone(phone=phone, doctor_id=doctor.doctor_id)[0]
+        cancel_appointment_by_id(appt.appointment_id, doctor.doctor_id)
+
+    timed("cancel", cancel)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flows", type=int, default=100)
+    args = parser.parse_args()
+
+    # Both are read at import time by db.database / calendar_oauth
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix="medschedule-"), "local_flow.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    if not os.getenv("FAKE_CALENDAR_URL"):
+        os.environ["FAKE_CALENDAR_URL"] = _start_fake_calendar()
+
+    from db.database import engine, init_local_schema
+
+    if init_local_schema():
+        print(f"SQLite database: {engine.url.database}")
+    print(f"Calendar: {os.environ['FAKE_CALENDAR_URL']}")
+
+    doctor = _seed_doctor()
+    print(f"Benchmark doctor: {doctor.slug} ({doctor.doctor_id})")
+
+    # Booked slots first, reschedule targets after them
+    slots = list(_slots(args.flows * 2))
+    timings = {"book": [], "reschedule": [], "cancel": []}
+
+    started = time.perf_counter()
+    for i in range(args.flows):
+        _run_flow(doctor, f"8{i:09d}", slots[i], slots[args.flows + i], timings)
+    wall = time.perf_counter() - started
+
+    print(f"flows:       {args.flows} in {wall:.2f}s ({args.flows / wall:.1f} flows/s)")
+    print(f"{'step':<12}{'p50':>10}{'p95':>10}{'max':>10}")
+    for step, values in timings.items():
+        print(
+            f"{step:<12}"
+            f"{statistics.median(values) * 1000:>8.1f}ms"
+            f"{_percentile(values, 95) * 1000:>8.1f}ms"
+            f"{max(values) * 1000:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# benchmarks/query_plans.py
+
+"""
+EXPLAIN ANALYZE timings for the hot repository queries.
+
+Usage (from the repo root, PostgreSQL only):
+    DATABASE_URL=postgresql://... \\
+        python -m benchmarks.query_plans --appointments 1000000
+
+Builds a synthetic dataset in a scratch schema (bench_query_plans),
+runs each repository function once to capture the SQL it emits, then
+EXPLAINs that SQL twice: without the secondary indexes declared in
+db/models.py and with them. The schema is dropped at the end unless
+--keep is given.
+"""
+
+import argparse
+import json
+import statistics
+from datetime import date, timedelta
+
+from sqlalchemy import event, text
+
+
+SCHEMA = "bench_query_plans"
+MANAGED_TABLES = ("appointments", "patients", "doctors")
+
+
+def _use_schema(engine):
+    # Every pooled connection (including the repository's) sees only
+    # the scratch schema, so the real tables are never touched.
+    @event.listens_for(engine, "connect")
+    def set_search_path(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+        cursor.close()
+        dbapi_connection.commit()
+
+
+def _secondary_indexes():
+    from db.models import Base
+
+    return [
+        index
+        for table in MANAGED_TABLES
+        for index in Base.metadata.tables[table].indexes
+    ]
+
+
+def _seed(conn, *, doctors: int, patients: int, appointments: int):
+    conn.execute(text("""
+        INSERT INTO doctors (
+            doctor_id, slug, name, email, clinic_email,
+            doctor_whatsapp_number, notifications_enabled, calendar_id,
+            working_days, work_start_time, work_end_time,
+            avg_consult_minutes, buffer_minutes, is_active
+        )
+        SELECT
+            gen_random_uuid(), 'doc-' || i, 'Doctor ' || i,
+            'doc' || i || '@example.com', 'clinic' || i || '@example.com',
+            '+91' || (8000000000 + i), false, '',
+            '0,1,2,3,4,5', '09:00', '17:00',
+            15, 5, i % 10 <> 0
+        FROM generate_series(1, :n) AS i
+    """), {"n": doctors})
+
+    conn.execute(text("""
+        INSERT INTO patients (patient_id, name, phone)
+        SELECT gen_random_uuid(), 'Patient ' || i, (9000000000 + i)::text
+        FROM generate_series(1, :n) AS i
+    """), {"n": patients})
+
+    # Two years of history around today, 32 fifteen-minute slots a day,
+    # roughly one in five appointments cancelled
+    conn.execute(text("""
+        WITH d AS (SELECT array_agg(doctor_id ORDER BY slug) AS ids FROM doctors),
+             p AS (SELECT array_agg(patient_id) AS ids FROM patients)
+        INSERT INTO appointments (
+            appointment_id, doctor_id, patient_id,
+            appointment_date, appointment_time,
+            status, calendar_event_id
+        )
+        SELECT
+            gen_random_uuid(),
+            d.ids[1 + (random() * (cardinality(d.ids) - 1))::int],
+            p.ids[1 + (random() * (cardinality(p.ids) - 1))::int],
+            current_date - 365 + (random() * 730)::int,
+            time '09:00' + ((random() * 31)::int * interval '15 minutes'),
+            (CASE WHEN random() < 0.2 THEN 'CANCELLED' ELSE 'BOOKED' END)::appointment_status,
+            md5(i::text)
+        FROM generate_series(1, :n) AS i, d, p
+    """), {"n": appointments})
+
+
+def _sample(conn):
+    """A BOOKED appointment (and its doctor / patient) to aim queries at."""
+    return conn.execute(text("""
+        SELECT a.appointment_id, a.doctor_id, a.patient_id,
+               a.appointment_date, a.appointment_time, a.calendar_event_id,
+               p.phone, d.slug, d.email, d.doctor_whatsapp_number
+        FROM appointments a
+        JOIN patients p ON p.patient_id = a.patient_id
+        JOIN doctors d ON d.doctor_id = a.doctor_id
+        WHERE a.status = 'BOOKED'
+          AND a.appointment_date >= current_date
+          AND d.is_active
+        ORDER BY a.appointment_date
+        LIMIT 1
+    """)).one()
+
+
+def _query_cases(sample):
+    from db import repository
+    from tools import check_availability_db
+
+    def whatsapp_lookup():
+        db = repository.get_db_session()
+        try:
+            repository.get_doctor_by_whatsapp_number(db, sample.doctor_whatsapp_number)
+        finally:
+            db.close()
+
+    def first_keyset_page():
+        next(repository.iter_booked_appointment_pages(
+            doctor_id=sample.doctor_id,
+            start_date=sample.appointment_date,
+            end_date=sample.appointment_date + timedelta(days=7),
+        ), None)
+
+    return {
+        "get_doctor_by_slug": lambda: repository.get_doctor_by_slug(sample.slug),
+        "get_doctor_by_email": lambda: repository.get_doctor_by_email(sample.email),
+        "get_doctor_by_whatsapp_number": whatsapp_lookup,
+        "get_patients_by_phone": lambda: repository.get_patients_by_phone(sample.phone),
+        "get_active_appointments_by_phone": lambda: repository.get_active_appointments_by_phone(
+            phone=sample.phone, doctor_id=sample.doctor_id
+        ),
+        "get_active_appointments_by_date": lambda: repository.get_active_appointments_by_date(
+            patient_id=sample.patient_id,
+            doctor_id=sample.doctor_id,
+            appointment_date=sample.appointment_date,
+        ),
+        "check_availability_db": lambda: check_availability_db(
+            sample.appointment_date.isoformat(),
+            sample.appointment_time.strftime("%H:%M"),
+            sample.doctor_id,
+        ),
+        "get_appointment_by_event_id": lambda: repository.get_appointment_by_event_id(
+            sample.calendar_event_id
+        ),
+        "get_upcoming_appointments_for_doctor": lambda: repository.get_upcoming_appointments_for_doctor(
+            sample.doctor_id
+        ),
+        "get_todays_appointments_for_doctor": lambda: repository.get_todays_appointments_for_doctor(
+            sample.doctor_id
+        ),
+        "get_booked_appointments_in_range": lambda: repository.get_booked_appointments_in_range(
+            doctor_id=sample.doctor_id,
+            start_date=sample.appointment_date,
+            end_date=sample.appointment_date + timedelta(days=30),
+        ),
+        "iter_booked_appointment_pages": first_keyset_page,
+        "get_last_booked_date_for_doctor": lambda: repository.get_last_booked_date_for_doctor(
+            sample.doctor_id
+        ),
+    }
+
+
+def _capture_statements(engine, cases):
+    """Run each case once and record the SELECTs it sends to the DB."""
+    captured = {}
+    current = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            current.append((statement, parameters))
+
+    try:
+        for name, run in cases.items():
+            current.clear()
+            run()
+            for i, stmt in enumerate(current):
+                label = name if len(current) == 1 else f"{name}[{i + 1}]"
+                captured[label] = stmt
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    return captured
+
+
+def _scan_nodes(plan) -> list[str]:
+    nodes = []
+    node_type = plan["Node Type"]
+    if "Scan" in node_type:
+        index = plan.get("Index Name")
+        nodes.append(f"{node_type} ({index})" if index else f"{node_type} on {plan.get('Relation Name')}")
+    for child in plan.get("Plans", []):
+        nodes.extend(_scan_nodes(child))
+    return nodes
+
+
+def _explain(conn, statement, parameters, runs: int):
+    timings = []
+    plan = None
+    for _ in range(runs):
+        result = conn.exec_driver_sql(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement,
+            parameters,
+        ).scalar()
+        if isinstance(result, str):
+            result = json.loads(result)
+        plan = result[0]
+        timings.append(plan["Execution Time"])
+    return statistics.median(timings), _scan_nodes(plan["Plan"])
+
+
+def _explain_all(engine, statements, runs):
+    results = {}
+    with engine.connect() as conn:
+        for label, (statement, parameters) in statements.items():
+            results[label] = _explain(conn, statement, parameters, runs)
+        conn.rollback()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--appointments", type=int, default=500_000)
+    parser.add_argument("--runs", type=int, default=5, help="EXPLAIN runs per query (median)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema")
+    args = parser.parse_args()
+
+    from db.database import engine
+    from db.models import Base
+    from db.partitions import ensure_appointment_partitions
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("query_plans needs a PostgreSQL DATABASE_URL")
+
+    _use_schema(engine)
+    indexes = _secondary_indexes()
+
+    try:
+        with engine.begin() as conn:
+            Base.metadata.drop_all(conn)
+            Base.metadata.create_all(conn)
+            for index in indexes:
+                index.drop(conn)
+
+        # Monthly partitions over the seeded two years (see db.partitions)
+        ensure_appointment_partitions(months_ahead=25, start=date.today() - timedelta(days=365))
+
+        with engine.begin() as conn:
+            print(
+                f"Seeding {args.doctors} doctors, {args.patients} patients, "
+                f"{args.appointments} appointments ..."
+            )
+            _seed(
+                conn,
+                doctors=args.doctors,
+                patients=args.patients,
+                appointments=args.appointments,
+            )
+
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            for table in MANAGED_TABLES:
+                conn.execute(text(f"VACUUM ANALYZE {table}"))
+            sample = _sample(conn)
+
+        statements = _capture_statements(engine, _query_cases(sample))
+        before = _explain_all(engine, statements, args.runs)
+
+        with engine.begin() as conn:
+            for index in indexes:
+                index.create(conn)
+            for table in MANAGED_TABLES:
+                conn.execute(text(f"ANALYZE {table}"))
+
+        after = _explain_all(engine, statements, args.runs)
+
+        width = max(len(label) for label in statements)
+        print()
+        print(f"{'query':<{width}}  {'no index':>10}  {'indexed':>10}  {'speedup':>8}")
+        for label in statements:
+            before_ms, _ = before[label]
+            after_ms, _ = after[label]
+            speedup = before_ms / after_ms if after_ms else float("inf")
+            print(f"{label:<{width}}  {before_ms:>8.3f}ms  {after_ms:>8.3f}ms  {speedup:>7.1f}x")
+
+        print()
+        for label in statements:
+            print(f"{label}:")
+            print(f"    no index: {', '.join(before[label][1]) or '-'}")
+            print(f"    indexed:  {', '.join(after[label][1]) or '-'}")
+
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
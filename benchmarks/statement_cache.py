@@ -0,0 +1,242 @@
+# benchmarks/statement_cache.py
+
+"""
+Python-side cost of the hot repository queries, per call.
+
+Usage (from the repo root):
+    DATABASE_URL=sqlite:// python -m benchmarks.statement_cache --calls 20000
+
+Runs each hot query through an ORM Session against an empty in-memory
+SQLite database, so the time per call is almost entirely SQLAlchemy
+overhead: building the statement, computing its cache key, looking up
+the compiled SQL and processing parameters. Three variants:
+
+- select()   statement rebuilt on every call (the repository before)
+- lambda     the same wrapped in lambda_stmt()
+- prepared   the statements prepared once in db.repository (current)
+"""
+
+import argparse
+import time
+import uuid
+from datetime import date, time as dtime
+
+from sqlalchemy import create_engine, lambda_stmt, select, tuple_
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.pool import StaticPool
+
+
+def _plain_cases():
+    """The same statements, built from scratch on every call."""
+    from db.models import Appointment, AppointmentStatus, Doctor, Patient
+
+    def doctor_by_slug(slug):
+        return select(Doctor).where(Doctor.slug == slug, Doctor.is_active == True)
+
+    def slot_taken(doctor_id, appointment_date, appointment_time):
+        return (
+            select(Appointment.appointment_id)
+            .where(
+                Appointment.doctor_id == doctor_id,
+                Appointment.appointment_date == appointment_date,
+                Appointment.appointment_time == appointment_time,
+                Appointment.status == AppointmentStatus.BOOKED,
+            )
+            .limit(1)
+        )
+
+    def active_by_phone(phone, doctor_id, from_date):
+        return (
+            select(
+                Appointment.appointment_id,
+                Appointment.appointment_date,
+                Appointment.appointment_time,
+                Appointment.calendar_event_id,
+                Patient.name.label("patient_name"),
+            )
+            .join(Patient, Patient.patient_id == Appointment.patient_id)
+            .where(
+                Patient.phone == phone,
+                Appointment.doctor_id == doctor_id,
+                Appointment.status == AppointmentStatus.BOOKED,
+                Appointment.appointment_date >= from_date,
+            )
+            .order_by(Appointment.appointment_date, Appointment.appointment_time)
+        )
+
+    def upcoming(doctor_id, today, limit, after):
+        return (
+            select(Appointment)
+            .options(joinedload(Appointment.patient))
+            .where(
+                Appointment.doctor_id == doctor_id,
+                Appointment.status != AppointmentStatus.CANCELLED,
+                Appointment.appointment_date >= today,
+                tuple_(
+                    Appointment.appointment_date,
+                    Appointment.appointment_time,
+                    Appointment.appointment_id,
+                ) > tuple_(*after),
+            )
+            .order_by(
+                Appointment.appointment_date,
+                Appointment.appointment_time,
+                Appointment.appointment_id,
+            )
+            .limit(limit)
+        )
+
+    return doctor_by_slug, slot_taken, active_by_phone, upcoming
+
+
+def _lambda_cases():
+    from db.models import Appointment, AppointmentStatus, Doctor, Patient
+
+    # Enum members aren't SQL elements; lambda_stmt() needs them bound
+    # outside the lambdas (as plain values it tracks as parameters)
+    booked = AppointmentStatus.BOOKED.value
+    cancelled = AppointmentStatus.CANCELLED.value
+
+    def doctor_by_slug(slug):
+        return lambda_stmt(
+            lambda: select(Doctor).where(Doctor.slug == slug, Doctor.is_active == True)
+        )
+
+    def slot_taken(doctor_id, appointment_date, appointment_time):
+        return lambda_stmt(
+            lambda: select(Appointment.appointment_id)
+            .where(
+                Appointment.doctor_id == doctor_id,
+                Appointment.appointment_date == appointment_date,
+                Appointment.appointment_time == appointment_time,
+                Appointment.status == booked,
+            )
+            .limit(1)
+        )
+
+    def active_by_phone(phone, doctor_id, from_date):
+        return lambda_stmt(
+            lambda: select(
+                Appointment.appointment_id,
+                Appointment.appointment_date,
+                Appointment.appointment_time,
+                Appointment.calendar_event_id,
+                Patient.name.label("patient_name"),
+            )
+            .join(Patient, Patient.patient_id == Appointment.patient_id)
+            .where(
+                Patient.phone == phone,
+                Appointment.doctor_id == doctor_id,
+                Appointment.status == booked,
+                Appointment.appointment_date >= from_date,
+            )
+            .order_by(Appointment.appointment_date, Appointment.appointment_time)
+        )
+
+    def upcoming(doctor_id, today, limit, after):
+        after_date, after_time, after_id = after
+        return lambda_stmt(
+            lambda: select(Appointment)
+            .options(joinedload(Appointment.patient))
+            .where(
+                Appointment.doctor_id == doctor_id,
+                Appointment.status != cancelled,
+                Appointment.appointment_date >= today,
+                tuple_(
+                    Appointment.appointment_date,
+                    Appointment.appointment_time,
+                    Appointment.appointment_id,
+                ) > tuple_(after_date, after_time, after_id),
+            )
+            .order_by(
+                Appointment.appointment_date,
+                Appointment.appointment_time,
+                Appointment.appointment_id,
+            )
+            .limit(limit)
+        )
+
+    return doctor_by_slug, slot_taken, active_by_phone, upcoming
+
+
+def _prepared_cases():
+    from db import repository
+
+    return (
+        lambda slug: (repository.DOCTOR_BY_SLUG, {"slug": slug}),
+        repository.slot_taken_query,
+        lambda phone, doctor_id, from_date: (
+            repository.ACTIVE_APPOINTMENTS_BY_PHONE,
+            {"phone": phone, "doctor_id": doctor_id, "from_date": from_date},
+        ),
+        lambda doctor_id, today, limit, after: repository.upcoming_appointments_query(
+            doctor_id, today=today, limit=limit, after=after
+        ),
+    )
+
+
+def _queries(cases, prepared: bool = False):
+    """name -> build(i) returning (statement, params)."""
+    if not prepared:
+        cases = [
+            (lambda build: lambda *args: (build(*args), {}))(build)
+            for build in cases
+        ]
+    doctor_by_slug, slot_taken, active_by_phone, upcoming = cases
+    # Fresh values every call, like real traffic
+    return {
+        "doctor_by_slug": lambda i: doctor_by_slug(f"doc-{i}"),
+        "slot_taken": lambda i: slot_taken(uuid.uuid4(), date(2026, 1, 1 + i % 28), dtime(9 + i % 8)),
+        "active_appointments_by_phone": lambda i: active_by_phone(
+            f"{9000000000 + i}", uuid.uuid4(), date(2026, 1, 1)
+        ),
+        "upcoming_appointments": lambda i: upcoming(
+            uuid.uuid4(), date(2026, 1, 1), 51, (date(2026, 1, 2), dtime(10), uuid.uuid4())
+        ),
+    }
+
+
+def _time_calls(session, build, calls: int) -> float:
+    # Warm up: the first call populates the statement / compiled caches
+    for i in range(50):
+        session.execute(*build(i)).all()
+
+    started = time.perf_counter()
+    for i in range(calls):
+        session.execute(*build(i)).all()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=10_000, help="Calls per query and variant")
+    args = parser.parse_args()
+
+    from db.models import Base
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+
+    variants = {
+        "select()": _queries(_plain_cases()),
+        "lambda": _queries(_lambda_cases()),
+        "prepared": _queries(_prepared_cases(), prepared=True),
+    }
+
+    header = "".join(f"  {name:>10}" for name in variants)
+    print(f"{'query':<30}{header}  {'speedup':>8}")
+    with Session(engine) as session:
+        for query in variants["select()"]:
+            timings = {
+                name: _time_calls(session, queries[query], args.calls)
+                for name, queries in variants.items()
+            }
+            cells = "".join(f"  {t * 1e6:>8.1f}us" for t in timings.values())
+            speedup = timings["select()"] / timings["prepared"]
+            print(f"{query:<30}{cells}  {speedup:>7.2f}x")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
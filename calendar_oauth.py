@@ -1,8 +1,11 @@
 # calendar_oauth.py
 
 import os
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
 
 SCOPES = [
     "https://www.googleapis.com/auth/calendar"
@@ -12,6 +15,13 @@ CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
 
+# Local stand-in for Google Calendar (see fake_calendar.py).
+# When set, every calendar call goes to this server instead of Google.
+FAKE_CALENDAR_URL = os.getenv("FAKE_CALENDAR_URL")
+
+# Socket timeout for every calendar HTTP call (seconds)
+CALENDAR_TIMEOUT_SECONDS = float(os.getenv("CALENDAR_TIMEOUT_SECONDS", "10"))
+
 
 def get_oauth_flow():
     if not CLIENT_ID or not CLIENT_SECRET or not REDIRECT_URI:
@@ -38,5 +48,39 @@ def get_oauth_flow():
 def build_calendar_service(credentials):
     """
     Build Google Calendar service safely.
+    Uses the fake calendar server when FAKE_CALENDAR_URL is set.
+    """
+    if FAKE_CALENDAR_URL:
+        # Credentials are ignored: the fake server does no auth
+        return build(
+            "calendar",
+            "v3",
+            http=httplib2.Http(timeout=CALENDAR_TIMEOUT_SECONDS),
+            client_options={
+                "api_endpoint": FAKE_CALENDAR_URL.rstrip("/") + "/calendar/v3/"
+            },
+            cache_discovery=False,
+        )
+
+    # Same as credentials=..., but with a bounded socket timeout
+    http = AuthorizedHttp(
+        credentials,
+        http=httplib2.Http(timeout=CALENDAR_TIMEOUT_SECONDS),
+    )
+    return build("calendar", "v3", http=http)
+
+
+
+def new_calendar_batch(service, callback=None):
     """
-    return build("calendar", "v3", credentials=credentials)
+    Batch request for the given calendar service.
+    The discovery document hardcodes Google's batch URL, so the fake
+    server needs its own.
+    """
+    if FAKE_CALENDAR_URL:
+        return BatchHttpRequest(
+            callback=callback,
+            batch_uri=FAKE_CALENDAR_URL.rstrip("/") + "/batch/calendar/v3",
+        )
+
+    return service.new_batch_http_request(callback=callback)
@@ -1,12 +1,14 @@
 # channels/web.py
 
-from typing import Dict
 from agent import run_agent
-from state import BookingState
+from state import BookingState, dump_state, load_state
 from fastapi import HTTPException
+from db.repository import get_doctor_by_slug
+from services import metrics
+from services.state_store import create_state_store
 
 # session_id -> BookingState
-state_store: Dict[str, BookingState] = {}
+state_store = create_state_store("web", dump=dump_state, load=load_state)
 
 
 def init_session(
@@ -19,45 +21,62 @@ def init_session(
     Initialize or reset a booking session for web flow.
     Behavior must match existing main.py exactly.
     """
-    if session_id not in state_store:
-        state_store[session_id] = BookingState()
+    with state_store.edit(session_id, BookingState) as state:
+        state.reset_flow()
+        state.doctor_id = doctor_id
+        state.doctor_name = doctor_name
+        state.greeted = False
+
+
+def restarted_session(doctor_slug: str | None):
+    """
+    Factory for the state of a session the store no longer has (idle
+    eviction, restart): a fresh one for the page's doctor, so the
+    patient gets the greeting again instead of an error.
+    """
+    def factory():
+        doctor = get_doctor_by_slug(doctor_slug) if doctor_slug else None
+        if not doctor:
+            return None
 
-    state = state_store[session_id]
-    state.reset_flow()
-    state.doctor_id = doctor_id
-    state.doctor_name = doctor_name
-    state.greeted = False
+        metrics.inc("web_sessions_restarted_total")
+        state = BookingState()
+        state.doctor_id = doctor.doctor_id
+        state.doctor_name = doctor.name
+        return state
+
+    return factory
 
 
 def handle_web_message(
     *,
     session_id: str,
-    user_message: str
+    user_message: str,
+    doctor_slug: str | None = None
 ) -> str:
     """
     Handle a single web chat message.
     Pure logic — no FastAPI, no cookies, no responses.
     """
-    if session_id not in state_store:
-        raise HTTPException(
-            status_code=400,
-            detail="Session missing. Please start booking from the doctor's page."
-        )
-
-    state = state_store[session_id]
-
-    if not state.doctor_id:
-        raise HTTPException(
-            status_code=400,
-            detail="Doctor context is missing. Please start booking via the doctor's booking link."
-        )
-
-    try:
-        reply = run_agent(user_message, state)
-    except Exception as e:
-        print("AGENT ERROR:", e)
-        state.reset_flow()
-        reply = "⚠ Something went wrong on our side."
+    with state_store.edit(session_id, restarted_session(doctor_slug)) as state:
+        if state is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Session missing. Please start booking from the doctor's page."
+            )
+
+        if not state.doctor_id:
+            raise HTTPException(
+                status_code=400,
+                detail="Doctor context is missing. Please start booking via the doctor's booking link."
+            )
+
+        try:
+            reply = run_agent(user_message, state)
+        except Exception as e:
+            print("AGENT ERROR:", e)
+            state.reset_flow()
+            reply = "⚠ Something went wrong on our side."
 
 
     return reply
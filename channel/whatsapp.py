@@ -1,10 +1,10 @@
 from enum import Enum
-from typing import Dict
 
 
 from agent import run_agent
-from state import BookingState
-from db.database import SessionLocal
+from state import BookingState, dump_state, load_state
+from services.state_store import create_state_store
+from db.database import session_scope
 from db.repository import get_doctor_by_whatsapp_number, get_doctor_by_id,upsert_patient_doctor_link,get_doctor_id_by_phone
 from datetime import datetime
 import pytz
@@ -28,8 +28,27 @@ class WhatsAppSession:
         self.booking_state: BookingState | None = None
 
 
+def dump_whatsapp_session(session: WhatsAppSession) -> bytes:
+    return dump_state({"stage": session.stage.value, "booking_state": session.booking_state})
+
+
+def load_whatsapp_session(data: bytes) -> WhatsAppSession:
+    values = load_state(data)
+    session = WhatsAppSession()
+    session.stage = WhatsAppStage(values["stage"])
+    session.booking_state = values["booking_state"]
+    if session.booking_state is None:
+        # Nothing to continue from (or stored by another state format)
+        session.stage = WhatsAppStage.START
+    return session
+
+
 # phone_number -> WhatsAppSession
-whatsapp_state_store: Dict[str, WhatsAppSession] = {}
+whatsapp_state_store = create_state_store(
+    "whatsapp",
+    dump=dump_whatsapp_session,
+    load=load_whatsapp_session,
+)
 
 
 # --------------------------------------------------
@@ -71,10 +90,16 @@ def handle_whatsapp_message(*, from_number: str, to_number: str, message_body: s
     if from_number:
         from_number = from_number.replace("whatsapp:", "").strip()
 
-    if from_number not in whatsapp_state_store:
-        whatsapp_state_store[from_number] = WhatsAppSession()
+    with whatsapp_state_store.edit(from_number, WhatsAppSession) as session:
+        return _handle_session_message(
+            session,
+            from_number=from_number,
+            message_body=message_body,
+        )
+
 
-    session = whatsapp_state_store[from_number]
+def _handle_session_message(session: WhatsAppSession, *, from_number: str, message_body: str) -> str:
+    """One message against the sender's session (changed in place)."""
     msg = message_body.strip()
     
     logger.info(
@@ -103,11 +128,8 @@ def handle_whatsapp_message(*, from_number: str, to_number: str, message_body: s
         if message_body.startswith("START_"):
             doctor_id = message_body.replace("START_", "").strip()
 
-            db = SessionLocal()
-            try:
+            with session_scope() as db:
                 doctor = get_doctor_by_id(db, doctor_id)
-            finally:
-                db.close()
 
             if not doctor:
                 return "⚠️ Invalid clinic link."
@@ -132,11 +154,8 @@ def handle_whatsapp_message(*, from_number: str, to_number: str, message_body: s
         doctor_id = get_doctor_id_by_phone(from_number)
 
         if doctor_id:
-            db = SessionLocal()
-            try:
+            with session_scope() as db:
                 doctor = get_doctor_by_id(db, doctor_id)
-            finally:
-                db.close()
 
             if doctor:
                 state = BookingState()
@@ -0,0 +1,147 @@
+# db/async_database.py
+
+"""
+Async engine for the hot request handlers.
+
+Uses the same DATABASE_URL with the driver swapped for an async one
+(asyncpg for Postgres, aiosqlite for SQLite), or ASYNC_DATABASE_URL if
+set. The two engines keep separate pools: the async one is sized by
+DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW (main logs the combined
+per-process ceiling at startup); timeout, recycle and pre-ping follow
+the sync DB_POOL_* settings, and SQLite gets the same pragmas. DATABASE_REPLICA_URL
+(or ASYNC_DATABASE_REPLICA_URL) gets a matching async replica engine.
+Writes are tracked like on the sync engine, so get_async_read_db()
+honours read-your-writes (db.database.READ_YOUR_WRITES_SECONDS).
+"""
+
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from db.database import (
+    DATABASE_REPLICA_URL,
+    DATABASE_URL,
+    DB_ASYNC_MAX_OVERFLOW,
+    DB_ASYNC_POOL_SIZE,
+    CheckoutTimingMixin,
+    configure_engine,
+    engine_options,
+    reads_pinned_to_primary,
+    track_writes,
+)
+
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for {backend!r}")
+
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+
+    # asyncpg spells libpq's sslmode as ssl
+    if backend == "postgresql" and "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+
+    return url
+
+
+class InstrumentedAsyncQueuePool(CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    metric_prefix = "db_async_pool"
+
+
+class InstrumentedAsyncReplicaQueuePool(CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    metric_prefix = "db_async_replica_pool"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+def create_async_db_engine(url, poolclass, metric_prefix: str):
+    """Async twin of db.database.create_db_engine (same pool / SQLite setup)."""
+    engine = create_async_engine(
+        url,
+        **engine_options(
+            url,
+            poolclass,
+            pool_size=DB_ASYNC_POOL_SIZE,
+            max_overflow=DB_ASYNC_MAX_OVERFLOW,
+        ),
+    )
+    configure_engine(engine.sync_engine, metric_prefix=metric_prefix)
+    return engine
+
+
+async_engine = create_async_db_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    metric_prefix="db_async_pool",
+)
+
+class _AsyncPrimarySession(Session):
+    """Sync side of the primary AsyncSessions (events attach here)."""
+
+
+track_writes(_AsyncPrimarySession)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    sync_session_class=_AsyncPrimarySession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+ASYNC_DATABASE_REPLICA_URL = os.getenv("ASYNC_DATABASE_REPLICA_URL") or (
+    to_async_url(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+)
+
+if ASYNC_DATABASE_REPLICA_URL:
+    async_replica_engine = create_async_db_engine(
+        ASYNC_DATABASE_REPLICA_URL,
+        poolclass=InstrumentedAsyncReplicaQueuePool,
+        metric_prefix="db_async_replica_pool",
+    )
+else:
+    async_replica_engine = async_engine
+
+AsyncReplicaSessionLocal = async_sessionmaker(
+    bind=async_replica_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def get_async_db():
+    """FastAPI dependency: one AsyncSession (one connection) per request."""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def get_async_read_db():
+    """
+    FastAPI dependency: read-only AsyncSession, on the replica when one
+    is configured and the caller hasn't written recently. For handlers
+    that never write.
+    """
+    if async_replica_engine is async_engine or reads_pinned_to_primary():
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    async with AsyncReplicaSessionLocal() as db:
+        yield db
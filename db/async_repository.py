@@ -0,0 +1,129 @@
+# db/async_repository.py
+
+"""
+Async counterparts of the db.repository functions used by the hot
+request handlers. The caller passes the AsyncSession (see
+db.async_database.get_async_db); nothing here opens its own.
+"""
+
+from datetime import date, time
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from db import doctor_cache
+from db.models import Doctor, Appointment, AppointmentStatus
+from db.repository import daily_stats_increment, slot_taken_query, upcoming_appointments_query
+
+
+# -------------------------
+# Doctor queries
+# -------------------------
+
+async def get_doctor_by_id(db: AsyncSession, doctor_id) -> doctor_cache.DoctorSnapshot | None:
+    snapshot = doctor_cache.get("id", doctor_id)
+    if snapshot is not None:
+        return snapshot
+    return doctor_cache.put("id", doctor_id, await db.get(Doctor, doctor_id))
+
+
+# -------------------------
+# Daily stats
+# -------------------------
+
+async def _record_daily_stats(db: AsyncSession, doctor_id, **counts) -> None:
+    """Async twin of repository.record_daily_stats (caller's transaction)."""
+    await db.execute(daily_stats_increment(db.get_bind().dialect.name, doctor_id, **counts))
+
+
+# -------------------------
+# Appointment queries
+# -------------------------
+
+async def get_appointment_by_id(db: AsyncSession, appointment_id) -> Appointment | None:
+    return await db.get(
+        Appointment,
+        appointment_id,
+        options=[joinedload(Appointment.patient)],
+    )
+
+
+async def get_upcoming_appointments_for_doctor(
+    db: AsyncSession,
+    doctor_id,
+    limit: int = 50,
+    after: tuple | None = None,
+) -> list[Appointment]:
+    """Keyset-paged like repository.get_upcoming_appointments_for_doctor."""
+    stmt, params = upcoming_appointments_query(
+        doctor_id, today=date.today(), limit=limit, after=after
+    )
+    return (await db.execute(stmt, params)).scalars().all()
+
+
+async def is_slot_free(
+    db: AsyncSession,
+    *,
+    doctor_id,
+    appointment_date: date,
+    appointment_time: time,
+    exclude_appointment_id=None,
+) -> bool:
+    """Async twin of tools.check_availability_db."""
+    stmt, params = slot_taken_query(
+        doctor_id,
+        appointment_date,
+        appointment_time,
+        exclude_appointment_id=exclude_appointment_id,
+    )
+    return (await db.execute(stmt, params)).first() is None
+
+
+async def cancel_appointment(db: AsyncSession, appointment_id) -> bool:
+    """
+    Mark a BOOKED appointment CANCELLED.
+    Returns False if it was not BOOKED any more.
+    """
+    doctor_id = (await db.execute(
+        update(Appointment)
+        .where(
+            Appointment.appointment_id == appointment_id,
+            Appointment.status == AppointmentStatus.BOOKED,
+        )
+        .values(status=AppointmentStatus.CANCELLED, updated_at=func.now())
+        .returning(Appointment.doctor_id)
+        .execution_options(synchronize_session="fetch")
+    )).scalar()
+
+    if doctor_id is None:
+        await db.rollback()
+        return False
+
+    await _record_daily_stats(db, doctor_id, cancelled=1)
+    await db.commit()
+    return True
+
+
+async def reschedule_appointment(
+    db: AsyncSession,
+    *,
+    appointment_id,
+    new_date: date,
+    new_time: time,
+) -> Appointment:
+    appt = await get_appointment_by_id(db, appointment_id)
+    if not appt:
+        raise RuntimeError("Appointment not found")
+
+    moved = (appt.appointment_date, appt.appointment_time) != (new_date, new_time)
+
+    appt.appointment_date = new_date
+    appt.appointment_time = new_time
+    appt.updated_at = func.now()
+    if moved:
+        await _record_daily_stats(db, appt.doctor_id, rescheduled=1)
+
+    await db.commit()
+    await db.refresh(appt, ["updated_at"])
+    return appt
@@ -0,0 +1,154 @@
+# db/doctor_cache.py
+
+"""
+Read-through cache of doctor rows.
+
+Every booking page, chat turn and dashboard call looks its doctor up
+(by slug, id, email or WhatsApp number), while a doctor row only
+changes at onboarding. The repository lookups go through here and get
+a DoctorSnapshot: an immutable copy of the row, safe to share between
+threads and to keep after the Session is gone.
+
+- entries live DOCTOR_CACHE_TTL_SECONDS, which bounds how stale another
+  worker process can be after an edit
+- code that writes doctors calls invalidate_doctor() after commit, which
+  drops every key of that doctor in this process
+- misses are not cached: a doctor onboarded a second ago is found
+- inside primary_reads() the cache is skipped (and refreshed), so
+  uniqueness checks see the database
+
+Metrics: doctor_cache_requests_total{key, result} counters and a
+doctor_cache_hit_ratio{key} gauge.
+"""
+
+import os
+import threading
+import uuid
+from dataclasses import dataclass, fields
+from datetime import datetime, time
+
+from cachetools import TTLCache
+
+from db.database import primary_reads_active
+from services import metrics
+
+
+DOCTOR_CACHE_TTL_SECONDS = float(os.getenv("DOCTOR_CACHE_TTL_SECONDS", "300"))
+DOCTOR_CACHE_SIZE = int(os.getenv("DOCTOR_CACHE_SIZE", "4096"))
+
+KEYS = ("id", "slug", "email", "whatsapp")
+
+
+@dataclass(frozen=True, slots=True)
+class DoctorSnapshot:
+    """Column values of a Doctor row (no relationships)."""
+
+    doctor_id: uuid.UUID
+    slug: str
+    name: str
+    email: str
+    clinic_email: str
+    doctor_whatsapp_number: str | None
+    clinic_phone_number: str | None
+    notifications_enabled: bool | None
+    calendar_id: str
+    working_days: str
+    work_start_time: time
+    work_end_time: time
+    avg_consult_minutes: int | None
+    buffer_minutes: int | None
+    is_active: bool | None
+    created_at: datetime | None
+
+    @classmethod
+    def from_model(cls, doctor) -> "DoctorSnapshot":
+        return cls(**{f.name: getattr(doctor, f.name) for f in fields(cls)})
+
+
+_lock = threading.Lock()
+
+# (key, value) -> DoctorSnapshot
+_cache: TTLCache = TTLCache(maxsize=DOCTOR_CACHE_SIZE, ttl=DOCTOR_CACHE_TTL_SECONDS)
+
+# key -> [hits, misses], for the hit ratio gauge
+_counts = {key: [0, 0] for key in KEYS}
+
+
+def _normalize(key: str, value):
+    if key == "id":
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            return str(value)
+    return value
+
+
+def get(key: str, value) -> DoctorSnapshot | None:
+    """Cached snapshot, or None (counted as a miss)."""
+    if not primary_reads_active():
+        with _lock:
+            snapshot = _cache.get((key, _normalize(key, value)))
+            if snapshot is not None:
+                _counts[key][0] += 1
+        if snapshot is not None:
+            metrics.inc("doctor_cache_requests_total", key=key, result="hit")
+            return snapshot
+
+    with _lock:
+        _counts[key][1] += 1
+    metrics.inc("doctor_cache_requests_total", key=key, result="miss")
+    return None
+
+
+def put(key: str, value, doctor) -> DoctorSnapshot | None:
+    """
+    Snapshot a freshly loaded Doctor (None passes through) and cache it
+    under its id and the key it was looked up by.
+    """
+    if doctor is None:
+        return None
+
+    snapshot = doctor if isinstance(doctor, DoctorSnapshot) else DoctorSnapshot.from_model(doctor)
+    with _lock:
+        _cache[("id", snapshot.doctor_id)] = snapshot
+        _cache[(key, _normalize(key, value))] = snapshot
+    return snapshot
+
+
+def read_through(key: str, value, load) -> DoctorSnapshot | None:
+    """Cached snapshot for (key, value), else load() -> Doctor | None."""
+    snapshot = get(key, value)
+    if snapshot is not None:
+        return snapshot
+    return put(key, value, load())
+
+
+def invalidate_doctor(doctor_id) -> int:
+    """
+    Drop every cached key of a doctor. Call after committing a change
+    to the doctors row. Returns the number of entries removed.
+    """
+    doctor_id = _normalize("id", doctor_id)
+    with _lock:
+        stale = [k for k, s in _cache.items() if s.doctor_id == doctor_id]
+        for k in stale:
+            del _cache[k]
+    return len(stale)
+
+
+def clear() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def _collect_doctor_cache_metrics():
+    with _lock:
+        size = len(_cache)
+        counts = {key: tuple(c) for key, c in _counts.items()}
+    metrics.set_gauge("doctor_cache_entries", size)
+    for key, (hits, misses) in counts.items():
+        if hits + misses:
+            metrics.set_gauge("doctor_cache_hit_ratio", round(hits / (hits + misses), 4), key=key)
+
+
+metrics.register_collector(_collect_doctor_cache_metrics)
@@ -0,0 +1,266 @@
+# db/importer.py
+
+"""
+Bulk import of a clinic's existing patients and appointments (PostgreSQL only).
+
+The CSV is streamed through COPY into a temporary staging table and
+merged from there with a few set-based statements, all in one
+transaction: either the whole file goes in or nothing does. Memory
+stays at one COPY chunk however large the file is.
+
+CSV columns (header required, any order):
+- name, phone, appointment_date (YYYY-MM-DD), appointment_time (HH:MM)
+- optional: status (BOOKED / CANCELLED, default BOOKED), calendar_event_id
+
+Merging:
+- patients are deduplicated by normalized phone; existing patients
+  are left as they are, new ones take the name of their last row
+- a BOOKED row whose slot is already booked for the doctor (in the
+  database or earlier in the file) is skipped, and so is a CANCELLED
+  row already present, so re-running an import adds nothing
+- rows without name, phone, date or time are skipped
+
+Appointments imported without calendar_event_id show up as
+no_event_id in services.reconciliation. Imports are not bookings and
+don't count towards doctor_daily_stats.
+
+Usage:
+    python -m db.importer appointments.csv --doctor-slug dr-sharma
+"""
+
+import argparse
+import csv
+import logging
+import time
+
+from sqlalchemy import text
+
+from db.database import engine
+from db.models import AppointmentStatus
+from db.partitions import ensure_appointment_partitions
+from services import metrics
+
+
+logger = logging.getLogger("medschedule")
+
+STAGING_TABLE = "appointment_import_staging"
+
+REQUIRED_COLUMNS = ("name", "phone", "appointment_date", "appointment_time")
+OPTIONAL_COLUMNS = ("status", "calendar_event_id")
+
+# Bytes handed to COPY per read
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Same rules as db.repository.normalize_patient_phone
+NORMALIZED_PHONE = """
+    CASE
+        WHEN regexp_replace(phone, '\\D', '', 'g') ~ '^91[0-9]{10}$'
+            THEN substr(regexp_replace(phone, '\\D', '', 'g'), 3)
+        WHEN regexp_replace(phone, '\\D', '', 'g') ~ '^0[0-9]{10}$'
+            THEN substr(regexp_replace(phone, '\\D', '', 'g'), 2)
+        ELSE regexp_replace(phone, '\\D', '', 'g')
+    END
+"""
+
+
+class AppointmentImportError(ValueError):
+    """The file can't be imported as it is (header, values)."""
+
+
+def is_supported() -> bool:
+    return engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+
+def _read_header(file) -> list[str]:
+    """Consume the header line; the rest of the stream goes to COPY."""
+    line = file.readline()
+    if isinstance(line, bytes):
+        line = line.decode("utf-8-sig")
+    columns = [c.strip().lower() for c in next(csv.reader([line]), [])]
+
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    unknown = [c for c in columns if c not in REQUIRED_COLUMNS + OPTIONAL_COLUMNS]
+    if missing or unknown or len(set(columns)) != len(columns):
+        raise AppointmentImportError(
+            f"Bad CSV header {columns}: needs {', '.join(REQUIRED_COLUMNS)}, "
+            f"may have {', '.join(OPTIONAL_COLUMNS)}"
+        )
+    return columns
+
+
+def _copy_into_staging(conn, file, columns: list[str]) -> int:
+    import psycopg2
+
+    copy_sql = (
+        f"COPY {STAGING_TABLE} ({', '.join(columns)}) "
+        f"FROM STDIN WITH (FORMAT csv)"
+    )
+    # Same connection, same transaction as the SQLAlchemy statements
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(copy_sql, file, size=COPY_CHUNK_SIZE)
+        return cursor.rowcount
+    except psycopg2.DataError as e:
+        # e.g. 'invalid input syntax for type date: "31/12/2025"' plus
+        # the COPY line (data lines, header not counted)
+        raise AppointmentImportError(str(e).strip()) from e
+    finally:
+        cursor.close()
+
+
+def import_appointments_csv(file, doctor_id) -> dict:
+    """
+    Import a CSV (binary or text file object, positioned at the header)
+    for one doctor. Returns counts of what happened to the rows.
+    """
+    if not is_supported():
+        raise RuntimeError("Bulk import needs a PostgreSQL (psycopg2) DATABASE_URL")
+
+    started = time.perf_counter()
+    columns = _read_header(file)
+    params = {"doctor_id": str(doctor_id)}
+
+    with engine.begin() as conn:
+        # 1️⃣ Stream the file into staging (untouched by other sessions,
+        #    dropped at commit)
+        conn.execute(text(f"""
+            CREATE TEMP TABLE {STAGING_TABLE} (
+                line bigserial,
+                name text,
+                phone text,
+                appointment_date date,
+                appointment_time time,
+                status text,
+                calendar_event_id text
+            ) ON COMMIT DROP
+        """))
+        rows = _copy_into_staging(conn, file, columns)
+
+        # 2️⃣ Normalize, drop unusable rows, refuse unknown statuses
+        conn.execute(text(f"""
+            UPDATE {STAGING_TABLE}
+            SET name = btrim(name),
+                phone = {NORMALIZED_PHONE},
+                status = upper(coalesce(nullif(btrim(status), ''), 'BOOKED')),
+                calendar_event_id = nullif(btrim(calendar_event_id), '')
+        """))
+        invalid = conn.execute(text(f"""
+            DELETE FROM {STAGING_TABLE}
+            WHERE coalesce(name, '') = '' OR coalesce(phone, '') = ''
+               OR appointment_date IS NULL OR appointment_time IS NULL
+        """)).rowcount
+
+        statuses = [status.value for status in AppointmentStatus]
+        unknown = conn.execute(
+            text(f"SELECT DISTINCT status FROM {STAGING_TABLE} WHERE status <> ALL(:statuses)"),
+            {"statuses": statuses},
+        ).scalars().all()
+        if unknown:
+            raise AppointmentImportError(f"Unknown status values: {unknown}")
+
+        # Temp tables are never auto-analyzed
+        conn.execute(text(f"ANALYZE {STAGING_TABLE}"))
+
+        # 3️⃣ Months the file covers get their partitions first, so the
+        #    rows don't pile up in appointments_default
+        first_day, last_day = conn.execute(text(
+            f"SELECT min(appointment_date), max(appointment_date) FROM {STAGING_TABLE}"
+        )).one()
+        if first_day:
+            months = (last_day.year - first_day.year) * 12 + last_day.month - first_day.month
+            ensure_appointment_partitions(months_ahead=months, start=first_day)
+
+        # 4️⃣ One patient per phone; the latest row names new patients
+        patients_created = conn.execute(text(f"""
+            INSERT INTO patients (patient_id, name, phone, first_seen_at, last_seen_at)
+            SELECT gen_random_uuid(), name, phone, now(), now()
+            FROM (
+                SELECT DISTINCT ON (phone) name, phone
+                FROM {STAGING_TABLE}
+                ORDER BY phone, line DESC
+            ) latest
+            ON CONFLICT (phone) DO NOTHING
+        """)).rowcount
+
+        # 5️⃣ Appointments: first BOOKED row per slot, nothing that is
+        #    already there
+        appointments_created = conn.execute(text(f"""
+            INSERT INTO appointments (
+                appointment_id, doctor_id, patient_id,
+                appointment_date, appointment_time,
+                status, calendar_event_id, created_at, updated_at
+            )
+            SELECT
+                gen_random_uuid(), CAST(:doctor_id AS uuid), p.patient_id,
+                s.appointment_date, s.appointment_time,
+                CAST(s.status AS appointment_status), s.calendar_event_id, now(), now()
+            FROM (
+                SELECT
+                    *,
+                    row_number() OVER (
+                        PARTITION BY status, appointment_date, appointment_time
+                        ORDER BY line
+                    ) AS slot_rank
+                FROM {STAGING_TABLE}
+            ) s
+            JOIN patients p ON p.phone = s.phone
+            WHERE (s.status <> 'BOOKED' OR s.slot_rank = 1)
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM appointments a
+                  WHERE a.doctor_id = CAST(:doctor_id AS uuid)
+                    AND a.appointment_date = s.appointment_date
+                    AND a.appointment_time = s.appointment_time
+                    AND (
+                        (a.status = 'BOOKED' AND s.status = 'BOOKED')
+                        OR (a.patient_id = p.patient_id
+                            AND a.status = CAST(s.status AS appointment_status))
+                    )
+              )
+        """), params).rowcount
+
+    summary = {
+        "rows": rows,
+        "invalid": invalid,
+        "skipped": rows - invalid - appointments_created,
+        "patients_created": patients_created,
+        "appointments_created": appointments_created,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+    metrics.inc("import_rows_total", rows)
+    metrics.inc("import_appointments_created_total", appointments_created)
+    logger.info(f"📥 Imported appointments | doctor_id={doctor_id} | {summary}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import patients and appointments from CSV")
+    parser.add_argument("csv_path")
+    parser.add_argument("--doctor-slug", required=True)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+    if not is_supported():
+        raise SystemExit("Bulk import needs a PostgreSQL DATABASE_URL")
+
+    with engine.connect() as conn:
+        doctor_id = conn.execute(
+            text("SELECT doctor_id FROM doctors WHERE slug = :slug"),
+            {"slug": args.doctor_slug},
+        ).scalar()
+    if not doctor_id:
+        raise SystemExit(f"No doctor with slug {args.doctor_slug!r}")
+
+    with open(args.csv_path, "rb") as file:
+        try:
+            summary = import_appointments_csv(file, doctor_id)
+        except AppointmentImportError as e:
+            raise SystemExit(f"Import failed: {e}")
+
+    for key, value in summary.items():
+        print(f"{key + ':':<22}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,37 @@
 
 from sqlalchemy import (
     Column, String, Boolean, Integer, Time, Date, Text,
-    ForeignKey, TIMESTAMP, DateTime, ForeignKey
+    ForeignKey, TIMESTAMP, DateTime, ForeignKey, Index, text, DDL, event, Enum,
+    Uuid, TypeDecorator, LargeBinary,
 )
-from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+import enum
 import uuid
 from datetime import datetime   
 from .database import Base
 
 
+class UUIDType(TypeDecorator):
+    """
+    Native uuid on PostgreSQL, CHAR(32) on SQLite.
+    Also takes ids as strings (path params, session state), which
+    psycopg2 accepts but the generic Uuid type does not.
+    """
+
+    impl = Uuid
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value
+
+
 class Doctor(Base):
     __tablename__ = "doctors"
 
-    doctor_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    doctor_id = Column(UUIDType, primary_key=True, default=uuid.uuid4)
     slug = Column(String, unique=True, nullable=False)
     name = Column(String, nullable=False)
     email = Column(String, nullable=False)
@@ -40,13 +57,29 @@ class Doctor(Base):
 
     appointments = relationship("Appointment", back_populates="doctor")
 
+    # Login / WhatsApp lookups only ever look at active doctors
+    __table_args__ = (
+        Index(
+            "ix_doctors_email_active",
+            "email",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active"),
+        ),
+        Index(
+            "ix_doctors_whatsapp_active",
+            "doctor_whatsapp_number",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active"),
+        ),
+    )
+
 
 
 
 class Patient(Base):
     __tablename__ = "patients"
 
-    patient_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    patient_id = Column(UUIDType, primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     phone = Column(String,  nullable=False)
 
@@ -55,20 +88,39 @@ class Patient(Base):
 
     appointments = relationship("Appointment", back_populates="patient")
 
+    # One row per normalized phone (see repository.upsert_patient)
+    __table_args__ = (
+        Index("ux_patients_phone", "phone", unique=True),
+    )
+
+
+
+class AppointmentStatus(str, enum.Enum):
+    """Stored as the Postgres ENUM appointment_status (4 bytes)."""
+
+    BOOKED = "BOOKED"
+    CANCELLED = "CANCELLED"
+
+    def __str__(self):
+        return self.value
 
 
 class Appointment(Base):
     __tablename__ = "appointments"
 
-    appointment_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    appointment_id = Column(UUIDType, primary_key=True, default=uuid.uuid4)
 
-    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.doctor_id"))
-    patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.patient_id"))
+    doctor_id = Column(UUIDType, ForeignKey("doctors.doctor_id"))
+    patient_id = Column(UUIDType, ForeignKey("patients.patient_id"))
 
-    appointment_date = Column(Date, nullable=False)
+    # Partition key, so part of the table's primary key (see db.partitions)
+    appointment_date = Column(Date, primary_key=True, nullable=False)
     appointment_time = Column(Time, nullable=False)
 
-    status = Column(String, default="BOOKED")
+    status = Column(
+        Enum(AppointmentStatus, name="appointment_status"),
+        default=AppointmentStatus.BOOKED,
+    )
     calendar_event_id = Column(String)
 
     created_at = Column(TIMESTAMP, server_default=func.now())
@@ -77,19 +129,60 @@ class Appointment(Base):
     doctor = relationship("Doctor", back_populates="appointments")
     patient = relationship("Patient", back_populates="appointments")
 
+    # Mirrors alembic revision 8c2f4e1a9b73 (hot query indexes)
+    __table_args__ = (
+        # Availability checks, day / range listings, keyset pages
+        Index(
+            "ix_appointments_doctor_booked_slot",
+            "doctor_id", "appointment_date", "appointment_time", "appointment_id",
+            postgresql_include=["calendar_event_id", "patient_id"],
+            postgresql_where=text("status = 'BOOKED'"),
+            sqlite_where=text("status = 'BOOKED'"),
+        ),
+        # Upcoming list (status != 'CANCELLED' can't use the partial index)
+        Index(
+            "ix_appointments_doctor_date",
+            "doctor_id", "appointment_date", "appointment_time",
+        ),
+        # A patient's active appointments with one doctor
+        Index(
+            "ix_appointments_patient_booked",
+            "patient_id", "doctor_id", "appointment_date", "appointment_time",
+            postgresql_where=text("status = 'BOOKED'"),
+            sqlite_where=text("status = 'BOOKED'"),
+        ),
+        Index("ix_appointments_patient_id", "patient_id"),
+        Index("ix_appointments_calendar_event_id", "calendar_event_id"),
+        {"postgresql_partition_by": "RANGE (appointment_date)"},
+    )
+
+    # Rows are still identified by appointment_id alone
+    __mapper_args__ = {"primary_key": [appointment_id]}
+
+
+# Catch-all partition for create_all(); alembic / db.partitions add the
+# monthly ones
+event.listen(
+    Appointment.__table__,
+    "after_create",
+    DDL("CREATE TABLE appointments_default PARTITION OF appointments DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
+
 
 
 class DoctorCalendarCredential(Base):
     __tablename__ = "doctor_calendar_credentials"
 
     id = Column(
-        UUID(as_uuid=True),
+        UUIDType,
         primary_key=True,
         default=uuid.uuid4
     )
 
     doctor_id = Column(
-        UUID(as_uuid=True),
+        UUIDType,
         ForeignKey("doctors.doctor_id", ondelete="CASCADE"),
         nullable=False,
         unique=True
@@ -121,10 +214,10 @@ class DoctorCalendarCredential(Base):
 class DoctorAuth(Base):
     __tablename__ = "doctor_auth"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUIDType, primary_key=True, default=uuid.uuid4)
 
     doctor_id = Column(
-        UUID(as_uuid=True),
+        UUIDType,
         ForeignKey("doctors.doctor_id"),
         nullable=False,
         unique=True
@@ -144,12 +237,12 @@ class DoctorAuth(Base):
 class PatientDoctorLink(Base):
     __tablename__ = "patient_doctor_links"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUIDType, primary_key=True, default=uuid.uuid4)
 
     phone_number = Column(String, nullable=False, unique=True)
 
     doctor_id = Column(
-        UUID(as_uuid=True),
+        UUIDType,
         ForeignKey("doctors.doctor_id", ondelete="CASCADE"),
         nullable=False
     )
@@ -157,3 +250,44 @@ class PatientDoctorLink(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     doctor = relationship("Doctor")
+
+
+class DoctorDailyStats(Base):
+    """
+    Per doctor, per day counters, kept up to date by the repository
+    functions that book / cancel / reschedule (repository.record_daily_stats).
+    day is when the change happened, not the appointment date.
+    """
+
+    __tablename__ = "doctor_daily_stats"
+
+    doctor_id = Column(
+        UUIDType,
+        ForeignKey("doctors.doctor_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day = Column(Date, primary_key=True)
+
+    booked = Column(Integer, nullable=False, default=0, server_default="0")
+    cancelled = Column(Integer, nullable=False, default=0, server_default="0")
+    rescheduled = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class ConversationState(Base):
+    """
+    Serialized conversation / login state for services.state_store's
+    database backend, one row per (namespace, key), e.g. ("web", session
+    cookie). Disposable by design: UNLOGGED on PostgreSQL (see migration
+    2b6f0d9c4e17), so it skips the WAL and is emptied after a crash.
+    """
+
+    __tablename__ = "conversation_state"
+
+    namespace = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    updated_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_conversation_state_updated_at", "updated_at"),
+    )
@@ -0,0 +1,215 @@
+# db/partitions.py
+
+"""
+Monthly range partitions of the appointments table (PostgreSQL only).
+
+appointments is partitioned by appointment_date (alembic revision
+b41e7d2c9a60). Each calendar month is its own partition named
+appointments_yYYYYmMM; appointments_default catches anything outside
+the created months. The hot queries all filter on appointment_date, so
+the planner only touches the current / upcoming partitions and their
+(small) indexes.
+
+- ensure_appointment_partitions() creates the months ahead. It runs at
+  app startup and from /internal/ensure-partitions (daily cron).
+- archive_appointment_partitions() detaches old months from
+  appointments and attaches them to appointments_archive, which has the
+  same columns and partition key but is never read by the app.
+
+Usage:
+    python -m db.partitions ensure [--months-ahead 12] [--start 2025-01-01]
+    python -m db.partitions archive --before 2025-01-01
+"""
+
+import argparse
+import logging
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from db.database import engine
+
+
+logger = logging.getLogger("medschedule")
+
+PARENT_TABLE = "appointments"
+ARCHIVE_TABLE = "appointments_archive"
+DEFAULT_PARTITION = "appointments_default"
+
+APPOINTMENT_PARTITION_MONTHS_AHEAD = int(
+    os.getenv("APPOINTMENT_PARTITION_MONTHS_AHEAD", "12")
+)
+
+# Serializes partition DDL between app workers starting at the same time
+_ADVISORY_LOCK_KEY = 0x61707074  # "appt"
+
+_PARTITION_NAME = re.compile(r"^appointments_y(\d{4})m(\d{2})$")
+
+
+def is_partition_table(name: str) -> bool:
+    """True for the partition / archive tables, which no model declares."""
+    return (
+        name in (ARCHIVE_TABLE, DEFAULT_PARTITION)
+        or _PARTITION_NAME.match(name) is not None
+    )
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"appointments_y{month.year:04d}m{month.month:02d}"
+
+
+def _partition_month(name: str) -> date | None:
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _child_tables(conn, parent: str) -> list[str]:
+    return conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:parent)
+    """), {"parent": parent}).scalars().all()
+
+
+def _create_partition(conn, month: date) -> None:
+    name = partition_name(month)
+    bounds = {"start": month, "end": add_months(month, 1)}
+
+    # Build the month as a plain table, move any rows the default
+    # partition caught for it, then ATTACH. Unlike CREATE TABLE ...
+    # PARTITION OF this only takes SHARE UPDATE EXCLUSIVE on appointments,
+    # so bookings keep going; ATTACH also clones the parent's indexes.
+    conn.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    moved = conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE appointment_date >= :start AND appointment_date < :end
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds).rowcount
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    ))
+
+    logger.info(f"📅 Created partition {name} ({moved} rows from {DEFAULT_PARTITION})")
+
+
+def ensure_appointment_partitions(
+    months_ahead: int = APPOINTMENT_PARTITION_MONTHS_AHEAD,
+    start: date | None = None,
+) -> list[str]:
+    """
+    Make sure every month from start (default: this month) through
+    months_ahead months later has its own partition.
+    Returns the names of the partitions created. No-op off PostgreSQL.
+    """
+    if not _is_postgres():
+        return []
+
+    first = month_start(start or date.today())
+    months = [add_months(first, i) for i in range(months_ahead + 1)]
+
+    created = []
+    for month in months:
+        name = partition_name(month)
+
+        # One short transaction per month
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+
+            # Also skips months already moved to the archive
+            exists = conn.execute(
+                text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+            ).scalar()
+            if exists:
+                continue
+
+            _create_partition(conn, month)
+            created.append(name)
+
+    return created
+
+
+def archive_appointment_partitions(before: date) -> list[str]:
+    """
+    Move every monthly partition that ends on or before `before` from
+    appointments to appointments_archive. Returns the names moved.
+    """
+    if not _is_postgres():
+        return []
+
+    with engine.connect() as conn:
+        names = sorted(
+            name
+            for name in _child_tables(conn, PARENT_TABLE)
+            if (month := _partition_month(name)) and add_months(month, 1) <= before
+        )
+
+    archived = []
+    for name in names:
+        month = _partition_month(name)
+        bounds = f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+
+        # DETACH (not CONCURRENTLY: not allowed next to a default
+        # partition) holds an exclusive lock on appointments, but only
+        # for the catalog update
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            conn.execute(text(f"ALTER TABLE {ARCHIVE_TABLE} ATTACH PARTITION {name} {bounds}"))
+
+        logger.info(f"🗄️ Archived partition {name}")
+        archived.append(name)
+
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage appointments partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ensure = commands.add_parser("ensure", help="Create upcoming monthly partitions")
+    ensure.add_argument("--months-ahead", type=int, default=APPOINTMENT_PARTITION_MONTHS_AHEAD)
+    ensure.add_argument("--start", type=date.fromisoformat, default=None)
+
+    archive = commands.add_parser("archive", help="Move old partitions to appointments_archive")
+    archive.add_argument("--before", type=date.fromisoformat, required=True)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+    if not _is_postgres():
+        raise SystemExit("Partitioning needs a PostgreSQL DATABASE_URL")
+
+    if args.command == "ensure":
+        names = ensure_appointment_partitions(args.months_ahead, start=args.start)
+    else:
+        names = archive_appointment_partitions(args.before)
+
+    print("\n".join(names) or "nothing to do")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, desc, func
+import re
+from collections import Counter
+
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import Integer, bindparam, select, desc, func, update, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from datetime import date, time, datetime
 
-from db.database import SessionLocal
-from db.models import Doctor, Patient, Appointment , DoctorCalendarCredential, DoctorAuth
+from db import doctor_cache
+from db.database import SessionLocal, read_session_scope, session_scope
+from db.models import Doctor, Patient, Appointment , AppointmentStatus, DoctorCalendarCredential, DoctorAuth, DoctorDailyStats
 from services.notification_service import notify_doctor_via_whatsapp
 
 
@@ -12,31 +17,145 @@ from services.notification_service import notify_doctor_via_whatsapp
 # -------------------------
 
 def get_db_session() -> Session:
+    """
+    A standalone Session the caller must close.
+    Repository functions use session_scope() instead, which joins the
+    current request's Session when there is one.
+    """
     return SessionLocal()
 
 
+# -------------------------
+# Prepared hot-path statements
+# -------------------------
+#
+# Built once at import with bindparam() placeholders and executed with a
+# parameter dict. Constructing a select() is most of the Python cost of
+# these queries; reusing the same object also reuses its cache key, so
+# SQLAlchemy goes straight to the compiled SQL. (lambda_stmt() measured
+# slower: the ORM rebuilds the statement from the lambda on every
+# execute.) See benchmarks/statement_cache.py.
+
+DOCTOR_BY_SLUG = select(Doctor).where(
+    Doctor.slug == bindparam("slug"),
+    Doctor.is_active == True
+)
+
+SLOT_TAKEN = (
+    select(Appointment.appointment_id)
+    .where(
+        Appointment.doctor_id == bindparam("doctor_id"),
+        Appointment.appointment_date == bindparam("appointment_date"),
+        Appointment.appointment_time == bindparam("appointment_time"),
+        Appointment.status == AppointmentStatus.BOOKED,
+    )
+    .limit(1)
+)
+
+SLOT_TAKEN_EXCLUDING = SLOT_TAKEN.where(
+    Appointment.appointment_id != bindparam("exclude_appointment_id")
+)
+
+ACTIVE_APPOINTMENTS_BY_PHONE = (
+    select(
+        Appointment.appointment_id,
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Appointment.calendar_event_id,
+        Patient.name.label("patient_name"),
+    )
+    .join(Patient, Patient.patient_id == Appointment.patient_id)
+    .where(
+        Patient.phone == bindparam("phone"),
+        Appointment.doctor_id == bindparam("doctor_id"),
+        Appointment.status == AppointmentStatus.BOOKED,
+        Appointment.appointment_date >= bindparam("from_date"),
+    )
+    .order_by(Appointment.appointment_date, Appointment.appointment_time)
+)
+
+UPCOMING_APPOINTMENTS = (
+    select(Appointment)
+    .options(joinedload(Appointment.patient))
+    .where(
+        Appointment.doctor_id == bindparam("doctor_id"),
+        Appointment.status != AppointmentStatus.CANCELLED,
+        Appointment.appointment_date >= bindparam("today")
+    )
+    .order_by(
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Appointment.appointment_id,
+    )
+    .limit(bindparam("limit", type_=Integer))
+)
+
+# Keyset page: rows after (after_date, after_time, after_id)
+UPCOMING_APPOINTMENTS_AFTER = UPCOMING_APPOINTMENTS.where(
+    tuple_(
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Appointment.appointment_id,
+    ) > tuple_(
+        bindparam("after_date", type_=Appointment.appointment_date.type),
+        bindparam("after_time", type_=Appointment.appointment_time.type),
+        bindparam("after_id", type_=Appointment.appointment_id.type),
+    )
+)
+
+
+def slot_taken_query(
+    doctor_id,
+    appointment_date: date,
+    appointment_time: time,
+    exclude_appointment_id=None,
+):
+    """(statement, params) selecting a BOOKED appointment in the slot."""
+    params = {
+        "doctor_id": doctor_id,
+        "appointment_date": appointment_date,
+        "appointment_time": appointment_time,
+    }
+    if exclude_appointment_id:
+        params["exclude_appointment_id"] = exclude_appointment_id
+        return SLOT_TAKEN_EXCLUDING, params
+    return SLOT_TAKEN, params
+
+
+def upcoming_appointments_query(
+    doctor_id,
+    *,
+    today: date,
+    limit: int,
+    after: tuple | None = None,
+):
+    """(statement, params) for one keyset page of upcoming appointments."""
+    params = {"doctor_id": doctor_id, "today": today, "limit": limit}
+    if after is None:
+        return UPCOMING_APPOINTMENTS, params
+
+    params["after_date"], params["after_time"], params["after_id"] = after
+    return UPCOMING_APPOINTMENTS_AFTER, params
+
+
 # -------------------------
 # Doctor queries
 # -------------------------
+#
+# Lookups return db.doctor_cache.DoctorSnapshot (read-only, cached);
+# load the Doctor through a Session to change it, then invalidate.
 
-def get_doctor_by_slug(slug: str) -> Doctor | None:
-    db = get_db_session()
-    try:
-        stmt = select(Doctor).where(
-            Doctor.slug == slug,
-            Doctor.is_active == True
-        )
-        return db.execute(stmt).scalars().first()
-    finally:
-        db.close()
+def get_doctor_by_slug(slug: str) -> doctor_cache.DoctorSnapshot | None:
+    def load():
+        with read_session_scope() as db:
+            return db.execute(DOCTOR_BY_SLUG, {"slug": slug}).scalars().first()
+
+    return doctor_cache.read_through("slug", slug, load)
 
 
 def doctor_exists() -> bool:
-    db = get_db_session()
-    try:
+    with session_scope() as db:
         return db.execute(select(Doctor).limit(1)).first() is not None
-    finally:
-        db.close()
 
 
 def create_doctor(
@@ -53,8 +172,7 @@ def create_doctor(
     avg_consult_minutes: int,
     buffer_minutes: int,
 ) -> Doctor:
-    db = get_db_session()
-    try:
+    with session_scope() as db:
         doctor = Doctor(
             slug=slug,
             name=name,
@@ -73,62 +191,137 @@ def create_doctor(
         db.add(doctor)
         db.commit()
         db.refresh(doctor)
-        return doctor
-    finally:
-        db.close()
+
+    doctor_cache.invalidate_doctor(doctor.doctor_id)
+    return doctor
 
 
 # -------------------------
 # Patient queries
 # -------------------------
 
-def get_or_create_patient(name: str, phone: str) -> Patient:
-    db = get_db_session()
-    try:
-        patient = db.execute(
-            select(Patient).where(Patient.phone == phone)
-        ).scalars().first()
+def normalize_patient_phone(phone: str) -> str:
+    """
+    Canonical form stored in patients.phone: digits only, Indian numbers
+    reduced to their 10-digit national form (+91 / 0 prefixes dropped).
+    Keep in sync with the SQL in alembic revision 3d7a9c5e21f4.
+    """
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 12 and digits.startswith("91"):
+        return digits[2:]
+    if len(digits) == 11 and digits.startswith("0"):
+        return digits[1:]
+    return digits
 
-        if patient:
-            patient.last_seen_at = func.now()
-            db.commit()
-            db.refresh(patient)
-            return patient
 
-        patient = Patient(name=name, phone=phone)
-        db.add(patient)
-        db.commit()
-        db.refresh(patient)
-        return patient
-    finally:
-        db.close()
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
 
-def create_patient(
+def upsert_patient(
     db: Session,
     *,
     name: str,
     phone: str
 ) -> Patient:
-    patient = Patient(
+    """
+    One patient per phone: INSERT ... ON CONFLICT (phone) DO UPDATE.
+    A returning patient keeps the stored name (a parent may book for a
+    child from the same phone; past appointments must not change name)
+    and only gets last_seen_at bumped, like db.importer.
+    Runs in the caller's transaction (row stays locked until commit).
+    """
+    insert = _UPSERT_INSERTS[db.get_bind().dialect.name]
+
+    stmt = insert(Patient).values(
         name=name,
-        phone=phone,
+        phone=normalize_patient_phone(phone),
     )
-    db.add(patient)
-    db.flush()  # ensures patient.id is available
-    return patient
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Patient.phone],
+        set_={"last_seen_at": func.now()},
+    ).returning(Patient)
+
+    return db.execute(
+        stmt,
+        execution_options={"populate_existing": True},
+    ).scalars().one()
+
+
+def get_or_create_patient(name: str, phone: str) -> Patient:
+    with session_scope() as db:
+        patient = upsert_patient(db, name=name, phone=phone)
+        db.commit()
+        return patient
 
 
 # 🔹 NEW (Phase 6.5): fetch patient WITHOUT creating
 def get_patients_by_phone(phone: str) -> list[Patient]:
-    db = get_db_session()
-    try:
-        stmt = select(Patient).where(Patient.phone == phone)
+    with session_scope() as db:
+        stmt = select(Patient).where(Patient.phone == normalize_patient_phone(phone))
         return db.execute(stmt).scalars().all()
-    finally:
-        db.close()
 
 
 
+# -------------------------
+# Daily stats
+# -------------------------
+#
+# doctor_daily_stats holds one row per doctor and day with running
+# counters. Every status change below bumps them in its own
+# transaction, so reading a month of stats touches ~30 rows however
+# many appointments there are.
+
+def daily_stats_increment(
+    dialect_name: str,
+    doctor_id,
+    *,
+    booked: int = 0,
+    cancelled: int = 0,
+    rescheduled: int = 0,
+    day: date | None = None,
+):
+    """INSERT ... ON CONFLICT DO UPDATE adding to one (doctor, day) row."""
+    insert = _UPSERT_INSERTS[dialect_name]
+
+    stmt = insert(DoctorDailyStats).values(
+        doctor_id=doctor_id,
+        day=day or date.today(),
+        booked=booked,
+        cancelled=cancelled,
+        rescheduled=rescheduled,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[DoctorDailyStats.doctor_id, DoctorDailyStats.day],
+        set_={
+            "booked": DoctorDailyStats.booked + stmt.excluded.booked,
+            "cancelled": DoctorDailyStats.cancelled + stmt.excluded.cancelled,
+            "rescheduled": DoctorDailyStats.rescheduled + stmt.excluded.rescheduled,
+        },
+    )
+
+
+def record_daily_stats(db: Session, doctor_id, **counts) -> None:
+    """Bump today's counters in the caller's transaction."""
+    db.execute(daily_stats_increment(db.get_bind().dialect.name, doctor_id, **counts))
+
+
+def get_doctor_daily_stats(doctor_id, start_date: date, end_date: date) -> list[DoctorDailyStats]:
+    """Stored rows for start_date..end_date (inclusive); days without activity have none."""
+    with read_session_scope() as db:
+        return db.execute(
+            select(DoctorDailyStats)
+            .where(
+                DoctorDailyStats.doctor_id == doctor_id,
+                DoctorDailyStats.day >= start_date,
+                DoctorDailyStats.day <= end_date,
+            )
+            .order_by(DoctorDailyStats.day)
+        ).scalars().all()
+
+
 # -------------------------
 # Appointment queries
 # -------------------------
@@ -153,34 +346,37 @@ def create_appointment(
     )
     db.add(appointment)
     db.flush()
+
+    if status == AppointmentStatus.BOOKED:
+        record_daily_stats(db, doctor_id, booked=1)
     return appointment
 
 
 
 def get_appointment_by_event_id(event_id: str) -> Appointment | None:
-    db = get_db_session()
-    try:
+    with session_scope() as db:
         stmt = select(Appointment).where(
             Appointment.calendar_event_id == event_id,
-            Appointment.status == "BOOKED"
+            Appointment.status == AppointmentStatus.BOOKED
         )
         return db.execute(stmt).scalars().first()
-    finally:
-        db.close()
 
 def cancel_appointment_db(appointment_id) -> None:
-    db = get_db_session()
-    try:
+    with session_scope() as db:
         appt = db.get(Appointment, appointment_id)
         if not appt:
             return
 
-        appt.status = "CANCELLED"
+        was_booked = appt.status == AppointmentStatus.BOOKED
+
+        appt.status = AppointmentStatus.CANCELLED
         appt.updated_at = func.now()
+        if was_booked:
+            record_daily_stats(db, appt.doctor_id, cancelled=1)
         db.commit()
 
         # 🔹 Explicitly fetch doctor
-        doctor = get_doctor_by_id(appt.doctor_id)
+        doctor = get_doctor_by_id(db, appt.doctor_id)
 
         # 🔔 Doctor Notification (Cancel)
         try:
@@ -188,7 +384,7 @@ def cancel_appointment_db(appointment_id) -> None:
                 doctor=doctor,
                 message=(
                     f"❌ Appointment Cancelled\n\n"
-                    f"Patient: {appt.patient_name}\n"
+                    f"Patient: {appt.patient.name if appt.patient else '-'}\n"
                     f"Date: {appt.appointment_date}\n"
                     f"Time: {appt.appointment_time.strftime('%H:%M')}"
                 )
@@ -196,9 +392,6 @@ def cancel_appointment_db(appointment_id) -> None:
         except Exception:
             pass
 
-    finally:
-        db.close()
-
 
 def reschedule_appointment_db(
     *,
@@ -207,8 +400,14 @@ def reschedule_appointment_db(
     new_time: time,
     new_calendar_event_id: str | None,
 ) -> Appointment:
-    db = get_db_session()
-    try:
+    # The chat flow passes "YYYY-MM-DD" / "HH:MM" strings; only
+    # PostgreSQL would take those as they are
+    if isinstance(new_date, str):
+        new_date = date.fromisoformat(new_date)
+    if isinstance(new_time, str):
+        new_time = time.fromisoformat(new_time)
+
+    with session_scope() as db:
         appt = db.get(Appointment, appointment_id)
         if not appt:
             raise RuntimeError("Appointment not found")
@@ -217,6 +416,8 @@ def reschedule_appointment_db(
         old_date = appt.appointment_date
         old_time = appt.appointment_time.strftime("%H:%M")
 
+        moved = (appt.appointment_date, appt.appointment_time) != (new_date, new_time)
+
         # 🔹 Apply new values
         appt.appointment_date = new_date
         appt.appointment_time = new_time
@@ -224,6 +425,8 @@ def reschedule_appointment_db(
             appt.calendar_event_id = new_calendar_event_id
 
         appt.updated_at = func.now()
+        if moved:
+            record_daily_stats(db, appt.doctor_id, rescheduled=1)
 
         db.commit()
         db.refresh(appt)
@@ -231,10 +434,10 @@ def reschedule_appointment_db(
         # 🔔 Doctor Notification (Reschedule)
         try:
             notify_doctor_via_whatsapp(
-                doctor = get_doctor_by_id(appt.doctor_id),
+                doctor = get_doctor_by_id(db, appt.doctor_id),
                 message=(
                     f"🔁 Appointment Rescheduled\n\n"
-                    f"Patient: {appt.patient_name}\n"
+                    f"Patient: {appt.patient.name if appt.patient else '-'}\n"
                     f"Old: {old_date} – {old_time}\n"
                     f"New: {appt.appointment_date} – "
                     f"{appt.appointment_time.strftime('%H:%M')}"
@@ -245,9 +448,6 @@ def reschedule_appointment_db(
 
         return appt
 
-    finally:
-        db.close()
-
 
 
 # 🔹 NEW (Phase 6.5): get all ACTIVE appointments for patient
@@ -255,35 +455,27 @@ def get_active_appointments_by_phone(
     *,
     phone,
     doctor_id,
-) -> list[Appointment]:
-
-    db = get_db_session()
-    try:
-        # 1️⃣ get all patients with this phone
-        patients = db.execute(
-            select(Patient).where(Patient.phone == phone)
-        ).scalars().all()
-
-        if not patients:
-            return []
-
-        patient_ids = [p.patient_id for p in patients]
-
-        # 2️⃣ fetch appointments for all those IDs
-        stmt = (
-            select(Appointment)
-            .where(
-                Appointment.patient_id.in_(patient_ids),
-                Appointment.doctor_id == doctor_id,
-                Appointment.status == "BOOKED",
-            )
-            .order_by(Appointment.appointment_date, Appointment.appointment_time)
-        )
+    from_date: date | None = None,
+) -> list:
+    """
+    Upcoming BOOKED appointments of a phone number with one doctor.
 
-        return db.execute(stmt).scalars().all()
+    One JOIN over every patient row sharing the phone; returns plain rows
+    (appointment_id, appointment_date, appointment_time,
+    calendar_event_id, patient_name) ordered by date and time.
+    Past appointments are skipped, so long histories stay cheap.
+    """
+    from_date = from_date or date.today()
 
-    finally:
-        db.close()
+    with session_scope() as db:
+        return db.execute(
+            ACTIVE_APPOINTMENTS_BY_PHONE,
+            {
+                "phone": normalize_patient_phone(phone),
+                "doctor_id": doctor_id,
+                "from_date": from_date,
+            },
+        ).all()
 
 
 
@@ -294,68 +486,219 @@ def get_active_appointments_by_date(
     doctor_id,
     appointment_date: date,
 ) -> list[Appointment]:
-    db = get_db_session()
-    try:
+    with session_scope() as db:
         stmt = (
             select(Appointment)
             .where(
                 Appointment.patient_id == patient_id,
                 Appointment.doctor_id == doctor_id,
-                Appointment.status == "BOOKED",
+                Appointment.status == AppointmentStatus.BOOKED,
                 Appointment.appointment_date == appointment_date,
             )
             .order_by(Appointment.appointment_time)
         )
         return db.execute(stmt).scalars().all()
-    finally:
-        db.close()
 
 
-def get_doctor_by_email(email: str) -> Doctor | None:
-    db = get_db_session()
-    try:
-        stmt = select(Doctor).where(
-            Doctor.email == email,
-            Doctor.is_active == True
-        )
-        return db.execute(stmt).scalars().first()
-    finally:
-        db.close()
+def get_doctor_by_email(email: str) -> doctor_cache.DoctorSnapshot | None:
+    def load():
+        with read_session_scope() as db:
+            stmt = select(Doctor).where(
+                Doctor.email == email,
+                Doctor.is_active == True
+            )
+            return db.execute(stmt).scalars().first()
+
+    return doctor_cache.read_through("email", email, load)
 
 
 
 def get_upcoming_appointments_for_doctor(
     doctor_id,
-    limit: int = 50
+    limit: int = 50,
+    after: tuple | None = None,
 ):
-    db = get_db_session()
-    try:
+    """
+    Upcoming (not cancelled) appointments in (date, time, id) order.
+    after: the (appointment_date, appointment_time, appointment_id) of
+    the last row already seen, to fetch the next page (keyset).
+    """
+    with read_session_scope() as db:
+        stmt, params = upcoming_appointments_query(
+            doctor_id, today=date.today(), limit=limit, after=after
+        )
+        return db.execute(stmt, params).scalars().all()
+
+
+
+def get_booked_appointments_in_range(
+    *,
+    doctor_id,
+    start_date: date,
+    end_date: date,
+    start_time: time | None = None,
+    end_time: time | None = None,
+) -> list[Appointment]:
+    """
+    BOOKED appointments for a doctor between two dates (inclusive).
+    Optional start/end times narrow the window on every day.
+    """
+    with session_scope() as db:
         stmt = (
             select(Appointment)
-            .options(joinedload(Appointment.patient))  
+            .options(joinedload(Appointment.patient))
             .where(
                 Appointment.doctor_id == doctor_id,
-                Appointment.status != "CANCELLED",
-                Appointment.appointment_date >= date.today()
+                Appointment.status == AppointmentStatus.BOOKED,
+                Appointment.appointment_date >= start_date,
+                Appointment.appointment_date <= end_date,
             )
             .order_by(
                 Appointment.appointment_date,
                 Appointment.appointment_time
             )
-            .limit(limit)
         )
+
+        if start_time is not None:
+            stmt = stmt.where(Appointment.appointment_time >= start_time)
+        if end_time is not None:
+            stmt = stmt.where(Appointment.appointment_time < end_time)
+
         return db.execute(stmt).scalars().all()
-    finally:
-        db.close()
 
 
+def bulk_cancel_appointments_db(appointment_ids) -> list:
+    """
+    Cancel many appointments in a single UPDATE.
+    Returns the ids that actually changed (were still BOOKED).
+    """
+    if not appointment_ids:
+        return []
+
+    with session_scope() as db:
+        stmt = (
+            update(Appointment)
+            .where(
+                Appointment.appointment_id.in_(appointment_ids),
+                Appointment.status == AppointmentStatus.BOOKED,
+            )
+            .values(status=AppointmentStatus.CANCELLED, updated_at=func.now())
+            .returning(Appointment.appointment_id, Appointment.doctor_id)
+            .execution_options(synchronize_session="fetch")
+        )
+        rows = db.execute(stmt).all()
+
+        for doctor_id, count in Counter(row.doctor_id for row in rows).items():
+            record_daily_stats(db, doctor_id, cancelled=count)
+        db.commit()
+        return [row.appointment_id for row in rows]
+
+
+def iter_booked_appointment_pages(
+    *,
+    doctor_id,
+    start_date: date,
+    end_date: date,
+    page_size: int = 500,
+):
+    """
+    Stream BOOKED appointments of a doctor in [start_date, end_date)
+    as pages of lightweight rows
+    (appointment_id, appointment_date, appointment_time, calendar_event_id).
+
+    Keyset-paged on (date, time, id): each page is a fresh short query,
+    so memory stays bounded however long the history is.
+    """
+    after = None
+    while True:
+        with session_scope() as db:
+            stmt = (
+                select(
+                    Appointment.appointment_id,
+                    Appointment.appointment_date,
+                    Appointment.appointment_time,
+                    Appointment.calendar_event_id,
+                )
+                .where(
+                    Appointment.doctor_id == doctor_id,
+                    Appointment.status == AppointmentStatus.BOOKED,
+                    Appointment.appointment_date >= start_date,
+                    Appointment.appointment_date < end_date,
+                )
+                .order_by(
+                    Appointment.appointment_date,
+                    Appointment.appointment_time,
+                    Appointment.appointment_id,
+                )
+                .limit(page_size)
+            )
+
+            if after is not None:
+                stmt = stmt.where(
+                    tuple_(
+                        Appointment.appointment_date,
+                        Appointment.appointment_time,
+                        Appointment.appointment_id,
+                    ) > tuple_(*after)
+                )
+
+            rows = db.execute(stmt).all()
+
+        if not rows:
+            return
+
+        yield rows
+
+        if len(rows) < page_size:
+            return
+
+        last = rows[-1]
+        after = (last.appointment_date, last.appointment_time, last.appointment_id)
+
+
+def set_appointment_calendar_event_id(appointment_id, calendar_event_id: str) -> None:
+    with session_scope() as db:
+        appt = db.get(Appointment, appointment_id)
+        if not appt:
+            return
+
+        appt.calendar_event_id = calendar_event_id
+        appt.updated_at = func.now()
+        db.commit()
+
+
+def get_last_booked_date_for_doctor(doctor_id) -> date | None:
+    with session_scope() as db:
+        return db.execute(
+            select(func.max(Appointment.appointment_date)).where(
+                Appointment.doctor_id == doctor_id,
+                Appointment.status == AppointmentStatus.BOOKED,
+            )
+        ).scalar()
+
+
+def get_calendar_connected_doctor_ids() -> list:
+    with session_scope() as db:
+        return db.execute(
+            select(DoctorCalendarCredential.doctor_id)
+            .join(Doctor, Doctor.doctor_id == DoctorCalendarCredential.doctor_id)
+            .where(Doctor.is_active == True)
+        ).scalars().all()
+
 
 def get_appointment_by_id(appointment_id):
-    db = get_db_session()
-    try:
+    with session_scope() as db:
         return db.get(Appointment, appointment_id)
-    finally:
-        db.close()
+
+
+
+def get_appointment_with_patient(appointment_id):
+    with session_scope() as db:
+        return db.get(
+            Appointment,
+            appointment_id,
+            options=[joinedload(Appointment.patient)],
+        )
 
 
 
@@ -376,8 +719,7 @@ def save_doctor_calendar_credentials(
     Insert or update calendar credentials for a doctor.
     One doctor = one active calendar connection.
     """
-    db = get_db_session()
-    try:
+    with session_scope() as db:
         creds = db.execute(
             select(DoctorCalendarCredential).where(
                 DoctorCalendarCredential.doctor_id == doctor_id
@@ -405,8 +747,6 @@ def save_doctor_calendar_credentials(
         db.commit()
         db.refresh(creds)
         return creds
-    finally:
-        db.close()
 
 
 def get_doctor_calendar_credentials(doctor_id):
@@ -414,19 +754,16 @@ def get_doctor_calendar_credentials(doctor_id):
     Fetch calendar credentials for a doctor.
     Returns None if not connected.
     """
-    db = get_db_session()
-    try:
+    with session_scope() as db:
         return db.execute(
             select(DoctorCalendarCredential).where(
                 DoctorCalendarCredential.doctor_id == doctor_id
             )
         ).scalars().first()
-    finally:
-        db.close()
 
 
-def get_doctor_by_id(db, doctor_id):
-    return db.get(Doctor, doctor_id)
+def get_doctor_by_id(db, doctor_id) -> doctor_cache.DoctorSnapshot | None:
+    return doctor_cache.read_through("id", doctor_id, lambda: db.get(Doctor, doctor_id))
 
 
 from datetime import date
@@ -434,38 +771,31 @@ from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 
 def get_todays_appointments_for_doctor(doctor_id):
-    db = get_db_session()
-    try:
+    with read_session_scope() as db:
         return (
             db.query(Appointment)
             .options(joinedload(Appointment.patient))
             .filter(
                 Appointment.doctor_id == doctor_id,
                 Appointment.appointment_date == date.today(),
-                Appointment.status == "BOOKED"
+                Appointment.status == AppointmentStatus.BOOKED
             )
             .order_by(Appointment.appointment_time)
             .all()
         )
-    finally:
-        db.close()
 
 
 def get_doctor_auth_by_email(email: str):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         return (
             db.query(DoctorAuth)
             .filter(DoctorAuth.email == email, DoctorAuth.is_active == True)
             .first()
         )
-    finally:
-        db.close()
 
 
 def create_doctor_auth(doctor_id, email: str, password_hash: str):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         auth = DoctorAuth(
             doctor_id=doctor_id,
             email=email,
@@ -475,24 +805,18 @@ def create_doctor_auth(doctor_id, email: str, password_hash: str):
         db.commit()
         db.refresh(auth)
         return auth
-    finally:
-        db.close()
 
 
 def update_doctor_last_login(auth_id):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         auth = db.get(DoctorAuth, auth_id)
         if auth:
             auth.last_login_at = datetime.utcnow()
             db.commit()
-    finally:
-        db.close()
 
 
 def get_doctor_auth_by_doctor_id(doctor_id):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         return (
             db.query(DoctorAuth)
             .filter(
@@ -501,18 +825,20 @@ def get_doctor_auth_by_doctor_id(doctor_id):
             )
             .first()
         )
-    finally:
-        db.close()
 
 
 def get_doctor_by_whatsapp_number(db: Session, whatsapp_number: str):
-    return (
-        db.query(Doctor)
-        .filter(
-            Doctor.whatsapp_number == whatsapp_number,
-            Doctor.is_active == True
-        )
-        .first()
+    return doctor_cache.read_through(
+        "whatsapp",
+        whatsapp_number,
+        lambda: (
+            db.query(Doctor)
+            .filter(
+                Doctor.doctor_whatsapp_number == whatsapp_number,
+                Doctor.is_active == True
+            )
+            .first()
+        ),
     )
 
 from db.models import PatientDoctorLink
@@ -520,8 +846,7 @@ from db.models import PatientDoctorLink
 
 
 def get_doctor_id_by_phone(phone_number: str):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         link = db.query(PatientDoctorLink).filter(
             PatientDoctorLink.phone_number == phone_number
         ).first()
@@ -530,13 +855,10 @@ def get_doctor_id_by_phone(phone_number: str):
             return link.doctor_id
 
         return None
-    finally:
-        db.close()
 
 
 def upsert_patient_doctor_link(phone_number: str, doctor_id):
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         existing = db.query(PatientDoctorLink).filter(
             PatientDoctorLink.phone_number == phone_number
         ).first()
@@ -551,5 +873,73 @@ def upsert_patient_doctor_link(phone_number: str, doctor_id):
             db.add(new_link)
 
         db.commit()
-    finally:
-        db.close()
+
+
+# -------------------------
+# Conversation state (services.state_store)
+# -------------------------
+#
+# Always the primary: the table is UNLOGGED, so replicas never see it.
+# Writes here don't pin the caller's later reads to the primary
+# (track_write=False, see db.database read-your-writes).
+
+from db.models import ConversationState
+
+
+def load_conversation_state(namespace: str, key: str) -> tuple[bytes, datetime] | None:
+    """(data, updated_at) of a state, or None."""
+    with session_scope() as db:
+        row = db.execute(
+            select(ConversationState.data, ConversationState.updated_at).where(
+                ConversationState.namespace == namespace,
+                ConversationState.key == key,
+            )
+        ).first()
+        return tuple(row) if row is not None else None
+
+
+def save_conversation_state(namespace: str, key: str, data: bytes) -> None:
+    with session_scope() as db:
+        insert = _UPSERT_INSERTS[db.get_bind().dialect.name]
+        stmt = insert(ConversationState).values(
+            namespace=namespace,
+            key=key,
+            data=data,
+            # Python clock, like the sweep cutoff (delete_idle_conversation_states)
+            updated_at=datetime.utcnow(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ConversationState.namespace, ConversationState.key],
+            set_={"data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at},
+        )
+        db.execute(stmt, execution_options={"track_write": False})
+        db.commit()
+
+
+def touch_conversation_state(namespace: str, key: str) -> None:
+    """Mark a state active now without rewriting its data."""
+    with session_scope() as db:
+        db.query(ConversationState).execution_options(track_write=False).filter(
+            ConversationState.namespace == namespace,
+            ConversationState.key == key,
+        ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+
+
+def delete_conversation_state(namespace: str, key: str) -> None:
+    with session_scope() as db:
+        db.query(ConversationState).execution_options(track_write=False).filter(
+            ConversationState.namespace == namespace,
+            ConversationState.key == key,
+        ).delete(synchronize_session=False)
+        db.commit()
+
+
+def delete_idle_conversation_states(namespace: str, updated_before: datetime) -> int:
+    with session_scope() as db:
+        removed = db.query(ConversationState).execution_options(track_write=False).filter(
+            ConversationState.namespace == namespace,
+            ConversationState.updated_at < updated_before,
+        ).delete(synchronize_session=False)
+        db.commit()
+        return removed
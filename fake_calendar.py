@@ -0,0 +1,413 @@
+# fake_calendar.py
+
+"""
+Local stand-in for the Google Calendar v3 API.
+
+Implements only the endpoints this app uses:
+- calendarList.list
+- events.list / insert / get / patch / delete
+- freebusy.query
+- batch requests (multipart/mixed) over the above
+
+Run it with:
+    python fake_calendar.py              # listens on 127.0.0.1:8765
+
+and point the app at it:
+    FAKE_CALENDAR_URL=http://127.0.0.1:8765
+
+Latency and error injection come from the environment and can be
+changed at runtime via POST /_fake/config:
+- FAKE_CALENDAR_LATENCY_MS   fixed delay added to every call (default 0)
+- FAKE_CALENDAR_JITTER_MS    random extra delay, 0..N ms (default 0)
+- FAKE_CALENDAR_ERROR_RATE   probability 0..1 of failing a call (default 0)
+- FAKE_CALENDAR_ERROR_STATUS HTTP status used for injected errors (default 503)
+"""
+
+import asyncio
+import email.parser
+import os
+import random
+import threading
+import uuid
+from datetime import datetime
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+API_PREFIX = "/calendar/v3"
+PRIMARY_CALENDAR_ID = "primary@fake.calendar"
+
+
+class FakeCalendarConfig:
+    def __init__(self):
+        self.latency_ms = float(os.getenv("FAKE_CALENDAR_LATENCY_MS", "0"))
+        self.jitter_ms = float(os.getenv("FAKE_CALENDAR_JITTER_MS", "0"))
+        self.error_rate = float(os.getenv("FAKE_CALENDAR_ERROR_RATE", "0"))
+        self.error_status = int(os.getenv("FAKE_CALENDAR_ERROR_STATUS", "503"))
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+        }
+
+
+config = FakeCalendarConfig()
+
+# calendar_id -> event_id -> event
+_events: dict[str, dict[str, dict]] = {}
+_lock = threading.Lock()
+
+# Simple call counters, handy when reading benchmark results
+_stats = {"calls": 0, "injected_errors": 0}
+
+
+app = FastAPI(title="Fake Google Calendar")
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+
+def _google_error(status: int, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={
+            "error": {
+                "code": status,
+                "message": message,
+                "errors": [{"domain": "global", "reason": "fake", "message": message}],
+            }
+        },
+    )
+
+
+async def _simulate() -> JSONResponse | None:
+    """
+    Apply configured latency, then maybe inject an error.
+    Returns an error response if one was injected.
+    """
+    _stats["calls"] += 1
+
+    delay_ms = config.latency_ms
+    if config.jitter_ms:
+        delay_ms += random.uniform(0, config.jitter_ms)
+    if delay_ms > 0:
+        await asyncio.sleep(delay_ms / 1000)
+
+    if config.error_rate and random.random() < config.error_rate:
+        _stats["injected_errors"] += 1
+        return _google_error(config.error_status, "Injected backend error")
+
+    return None
+
+
+def _parse_dt(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _calendar(calendar_id: str) -> dict[str, dict]:
+    return _events.setdefault(calendar_id, {})
+
+
+# -------------------------------
+# calendarList
+# -------------------------------
+
+@app.get(API_PREFIX + "/users/me/calendarList")
+async def calendar_list():
+    if error := await _simulate():
+        return error
+
+    return {
+        "kind": "calendar#calendarList",
+        "items": [
+            {
+                "kind": "calendar#calendarListEntry",
+                "id": PRIMARY_CALENDAR_ID,
+                "summary": "Fake primary calendar",
+                "timeZone": "Asia/Kolkata",
+                "primary": True,
+                "accessRole": "owner",
+            }
+        ],
+    }
+
+
+# -------------------------------
+# events
+# -------------------------------
+
+@app.post(API_PREFIX + "/calendars/{calendar_id}/events")
+async def insert_event(calendar_id: str, request: Request):
+    if error := await _simulate():
+        return error
+
+    body = await request.json()
+    event_id = uuid.uuid4().hex
+
+    event = {
+        **body,
+        "kind": "calendar#event",
+        "id": event_id,
+        "status": "confirmed",
+        "created": datetime.utcnow().isoformat() + "Z",
+        "updated": datetime.utcnow().isoformat() + "Z",
+    }
+
+    with _lock:
+        _calendar(calendar_id)[event_id] = event
+
+    return event
+
+
+@app.get(API_PREFIX + "/calendars/{calendar_id}/events")
+async def list_events(
+    calendar_id: str,
+    timeMin: str | None = None,
+    timeMax: str | None = None,
+    showDeleted: bool = False,
+    maxResults: int = 250,
+    pageToken: str | None = None,
+):
+    if error := await _simulate():
+        return error
+
+    time_min = _parse_dt(timeMin) if timeMin else None
+    time_max = _parse_dt(timeMax) if timeMax else None
+
+    with _lock:
+        events = list(_calendar(calendar_id).values())
+
+    matching = []
+    for event in events:
+        if event["status"] == "cancelled" and not showDeleted:
+            continue
+
+        start = _parse_dt(event["start"]["dateTime"])
+        end = _parse_dt(event["end"]["dateTime"])
+
+        if time_min and end <= time_min:
+            continue
+        if time_max and start >= time_max:
+            continue
+
+        matching.append(event)
+
+    matching.sort(key=lambda e: (_parse_dt(e["start"]["dateTime"]), e["id"]))
+
+    # pageToken is just an offset here
+    offset = int(pageToken or 0)
+    page = matching[offset:offset + maxResults]
+
+    response = {"kind": "calendar#events", "items": page}
+    if offset + maxResults < len(matching):
+        response["nextPageToken"] = str(offset + maxResults)
+
+    return response
+
+
+@app.get(API_PREFIX + "/calendars/{calendar_id}/events/{event_id}")
+async def get_event(calendar_id: str, event_id: str):
+    if error := await _simulate():
+        return error
+
+    with _lock:
+        event = _calendar(calendar_id).get(event_id)
+
+    if not event:
+        return _google_error(404, "Not Found")
+
+    return event
+
+
+@app.patch(API_PREFIX + "/calendars/{calendar_id}/events/{event_id}")
+async def patch_event(calendar_id: str, event_id: str, request: Request):
+    if error := await _simulate():
+        return error
+
+    body = await request.json()
+
+    with _lock:
+        event = _calendar(calendar_id).get(event_id)
+        if not event or event["status"] == "cancelled":
+            return _google_error(404, "Not Found")
+
+        for key in ("id", "kind", "created"):
+            body.pop(key, None)
+
+        event.update(body)
+        event["updated"] = datetime.utcnow().isoformat() + "Z"
+
+    return event
+
+
+@app.delete(API_PREFIX + "/calendars/{calendar_id}/events/{event_id}")
+async def delete_event(calendar_id: str, event_id: str):
+    if error := await _simulate():
+        return error
+
+    with _lock:
+        event = _calendar(calendar_id).get(event_id)
+        if not event:
+            return _google_error(404, "Not Found")
+
+        # Google keeps deleted events around as "cancelled"
+        if event["status"] == "cancelled":
+            return _google_error(410, "Resource has been deleted")
+
+        event["status"] = "cancelled"
+        event["updated"] = datetime.utcnow().isoformat() + "Z"
+
+    return Response(status_code=204)
+
+
+# -------------------------------
+# freebusy
+# -------------------------------
+
+@app.post(API_PREFIX + "/freeBusy")
+async def freebusy(request: Request):
+    if error := await _simulate():
+        return error
+
+    body = await request.json()
+    time_min = _parse_dt(body["timeMin"])
+    time_max = _parse_dt(body["timeMax"])
+
+    calendars = {}
+    with _lock:
+        for item in body.get("items", []):
+            busy = []
+            for event in _calendar(item["id"]).values():
+                if event["status"] == "cancelled":
+                    continue
+
+                start = _parse_dt(event["start"]["dateTime"])
+                end = _parse_dt(event["end"]["dateTime"])
+
+                if start < time_max and end > time_min:
+                    busy.append({
+                        "start": event["start"]["dateTime"],
+                        "end": event["end"]["dateTime"],
+                    })
+
+            busy.sort(key=lambda b: _parse_dt(b["start"]))
+            calendars[item["id"]] = {"busy": busy}
+
+    return {
+        "kind": "calendar#freeBusy",
+        "timeMin": body["timeMin"],
+        "timeMax": body["timeMax"],
+        "calendars": calendars,
+    }
+
+
+# -------------------------------
+# batch
+# -------------------------------
+
+def _parse_http_part(raw: str) -> tuple[str, str, dict, str]:
+    """Split an application/http part into method, path, headers, body."""
+    head, _, body = raw.replace("\r\n", "\n").partition("\n\n")
+    request_line, *header_lines = head.split("\n")
+    method, path, _ = request_line.split(" ", 2)
+
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+
+    return method, path, headers, body
+
+
+@app.post("/batch/calendar/v3")
+async def batch(request: Request):
+    content_type = request.headers["content-type"]
+    raw = await request.body()
+
+    message = email.parser.BytesParser().parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + raw
+    )
+
+    parts = []
+    for part in message.get_payload():
+        method, path, headers, body = _parse_http_part(part.get_payload())
+        parts.append((part["Content-ID"], method, path, headers, body))
+
+    # Sub-requests hit this same app, so latency/errors apply to each
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://fake") as client:
+        responses = await asyncio.gather(*(
+            client.request(method, path, headers=headers, content=body or None)
+            for _, method, path, headers, body in parts
+        ))
+
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for (content_id, *_), response in zip(parts, responses):
+        # Undo RFC 2822 header folding before echoing the id back
+        content_id = " ".join(content_id.split()).strip("<>")
+        chunks.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <response-{content_id}>\r\n\r\n"
+            f"HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n"
+            "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{response.text}\r\n"
+        )
+    chunks.append(f"--{boundary}--\r\n")
+
+    return Response(
+        content="".join(chunks),
+        media_type=f"multipart/mixed; boundary={boundary}",
+    )
+
+
+# -------------------------------
+# Control endpoints (not part of Google's API)
+# -------------------------------
+
+@app.get("/_fake/config")
+def get_config():
+    return {**config.as_dict(), **_stats}
+
+
+@app.post("/_fake/config")
+async def update_config(request: Request):
+    body = await request.json()
+
+    if "latency_ms" in body:
+        config.latency_ms = float(body["latency_ms"])
+    if "jitter_ms" in body:
+        config.jitter_ms = float(body["jitter_ms"])
+    if "error_rate" in body:
+        config.error_rate = float(body["error_rate"])
+    if "error_status" in body:
+        config.error_status = int(body["error_status"])
+
+    return config.as_dict()
+
+
+@app.post("/_fake/reset")
+def reset():
+    with _lock:
+        _events.clear()
+    _stats["calls"] = 0
+    _stats["injected_errors"] = 0
+    return {"status": "reset"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=os.getenv("FAKE_CALENDAR_HOST", "127.0.0.1"),
+        port=int(os.getenv("FAKE_CALENDAR_PORT", "8765")),
+        log_level="warning",
+    )
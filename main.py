@@ -1,38 +1,60 @@
 import os
+import anyio
+import asyncio
+import json
 from pydoc import html
 import re
 import pytz
 import qrcode
 import io
 import base64
+import hashlib
+import tempfile
 
 from typing import Dict
+from functools import lru_cache
 from datetime import time
-from datetime import datetime, timedelta
-from fastapi import FastAPI, Request, HTTPException,Response
+from datetime import date, datetime, timedelta
+from fastapi import FastAPI, Request, HTTPException,Response, BackgroundTasks, Depends, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse,HTMLResponse, Response, JSONResponse
+from fastapi.responses import FileResponse, RedirectResponse,HTMLResponse, Response, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 import uuid
-from schema import ChatRequest, ChatResponse, DoctorRescheduleRequest
+from schema import ChatRequest, ChatResponse, DoctorRescheduleRequest, DoctorBulkCancelRequest, encode_appointment_cursor, decode_appointment_cursor
 from agent import run_agent
 from state import BookingState
 from channel.web import init_session, handle_web_message
-from channel.whatsapp import handle_whatsapp_message, whatsapp_state_store
+from channel.whatsapp import handle_whatsapp_message
 from calendar_oauth import get_oauth_flow , build_calendar_service
 from auth_store import oauth_store
 from twilio.twiml.messaging_response import MessagingResponse
 from doctor_config import DOCTORS
-from db.database import SessionLocal
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from db.database import (DBSessionMiddleware, check_connection_ceiling, check_pool_capacity, engine,
+                         get_db, get_read_db, init_local_schema, primary_reads, replica_engine)
+from db.partitions import ensure_appointment_partitions
+from db import importer
+from db.async_database import async_engine, async_replica_engine, get_async_db, get_async_read_db
+from db import async_repository
+from db.models import AppointmentStatus
 from db.repository import (create_doctor, doctor_exists, get_doctor_by_slug,get_doctor_by_email, 
                            get_upcoming_appointments_for_doctor,
                            get_appointment_by_id, cancel_appointment_db , reschedule_appointment_db,
                            get_todays_appointments_for_doctor,get_doctor_auth_by_email,update_doctor_last_login, get_doctor_by_id,
-                           get_doctor_auth_by_doctor_id,create_doctor_auth)
+                           get_doctor_auth_by_doctor_id,create_doctor_auth,get_doctor_daily_stats)
 
 
-from tools import cancel_appointment_by_id, check_availability, update_calendar_event
+from tools import cancel_appointment_by_id, check_availability, update_calendar_event, cancel_appointments_in_range, delete_appointment_event
+from services.notification_service import notify_doctor_via_whatsapp
 from email_service import send_daily_appointments_email
+from services.calendar_client import CalendarUnavailable, execute_calendar_request, retry_after_seconds
+from services import metrics
+from services.agent_executor import AGENT_WORKERS, AgentBusy, run_agent_turn
+from services import turn_events
+from services.state_store import create_state_store, sweep_idle_states
 
 from auth_utils import hash_password, verify_password
 
@@ -49,9 +71,130 @@ logger = logging.getLogger("medschedule")
 
 app = FastAPI()
 
+# One DB connection / Session per request (see db.database.request_scope)
+app.add_middleware(DBSessionMiddleware)
 
 
-doctor_sessions = {}
+# -------------------------------
+# Threads vs DB connections
+# -------------------------------
+# Sync endpoints and run_in_threadpool calls share this many threads;
+# agent turns get AGENT_WORKERS more. Each may hold a pooled connection
+# from the sync engine; async handlers use the separate async pool.
+HTTP_THREADPOOL_SIZE = int(os.getenv("HTTP_THREADPOOL_SIZE", "16"))
+
+
+@app.on_event("startup")
+async def size_threadpool_and_db_pools():
+    anyio.to_thread.current_default_thread_limiter().total_tokens = HTTP_THREADPOOL_SIZE
+    check_pool_capacity(engine.pool, AGENT_WORKERS + HTTP_THREADPOOL_SIZE)
+    if replica_engine is not engine:
+        check_pool_capacity(replica_engine.pool, AGENT_WORKERS + HTTP_THREADPOOL_SIZE)
+
+    # Sync + async pools together, per server: size max_connections by this
+    check_connection_ceiling("primary", engine, async_engine)
+    replicas = [e for e in (replica_engine, async_replica_engine) if e not in (engine, async_engine)]
+    if replicas:
+        check_connection_ceiling("replica", *replicas)
+
+
+@app.on_event("startup")
+def create_upcoming_partitions():
+    # Daily cron hits /internal/ensure-partitions too; this covers deploys
+    try:
+        ensure_appointment_partitions()
+    except Exception:
+        logger.exception("Could not create appointment partitions")
+
+
+@app.on_event("startup")
+def create_local_schema():
+    # SQLite dev / benchmark databases have no alembic history
+    if init_local_schema():
+        logger.info("🗃️ SQLite database: tables created")
+
+
+# -------------------------------
+# Idle session sweeper (services.state_store)
+# -------------------------------
+STATE_SWEEP_INTERVAL_SECONDS = float(os.getenv("STATE_SWEEP_INTERVAL_SECONDS", "60"))
+
+
+async def sweep_idle_sessions_forever():
+    while True:
+        await asyncio.sleep(STATE_SWEEP_INTERVAL_SECONDS)
+        try:
+            removed = await run_in_threadpool(sweep_idle_states)
+            if removed:
+                logger.info(f"🧹 Evicted {removed} idle sessions")
+        except Exception:
+            logger.exception("Idle session sweep failed")
+
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    app.state.session_sweeper = asyncio.create_task(sweep_idle_sessions_forever())
+
+
+@app.on_event("shutdown")
+async def stop_session_sweeper():
+    app.state.session_sweeper.cancel()
+
+
+
+# -------------------------------
+# Dashboard logins
+# -------------------------------
+# A login lasts a working day from when it was made, whatever the
+# STATE_STORE backend: the expiry is stored with the session and checked
+# on every lookup. The store's idle TTL only clears abandoned entries.
+DOCTOR_SESSION_TTL_SECONDS = float(os.getenv("DOCTOR_SESSION_TTL_SECONDS", "43200"))
+
+
+def _dump_doctor_session(value) -> bytes:
+    doctor_id, expires_at = value
+    return f"{doctor_id}|{expires_at}".encode()
+
+
+def _load_doctor_session(data: bytes):
+    doctor_id, _, expires_at = data.decode().partition("|")
+    if not expires_at:
+        # Written before logins expired from login time
+        return None
+    return uuid.UUID(doctor_id), float(expires_at)
+
+
+# doctor_session cookie -> (doctor_id, expires_at epoch seconds)
+doctor_sessions = create_state_store(
+    "doctor",
+    dump=_dump_doctor_session,
+    load=_load_doctor_session,
+    idle_ttl=DOCTOR_SESSION_TTL_SECONDS,
+)
+
+
+def start_doctor_session(doctor_id) -> str:
+    """New dashboard session for doctor_id; returns the cookie value."""
+    session_id = str(uuid.uuid4())
+    expires_at = datetime.now().timestamp() + DOCTOR_SESSION_TTL_SECONDS
+    doctor_sessions.set(session_id, (doctor_id, expires_at))
+    return session_id
+
+
+def doctor_for_session(session_id: str | None):
+    """doctor_id of a live session, or None (expired ones are deleted)."""
+    if not session_id:
+        return None
+
+    session = doctor_sessions.get(session_id)
+    if session is None:
+        return None
+
+    doctor_id, expires_at = session
+    if datetime.now().timestamp() >= expires_at:
+        doctor_sessions.delete(session_id)
+        return None
+    return doctor_id
 
 
 TIMEZONE = "Asia/Kolkata"
@@ -75,12 +218,19 @@ def require_doctor(request: Request):
     if not session_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    doctor_id = doctor_sessions.get(session_id)
+    doctor_id = doctor_for_session(session_id)
     if not doctor_id:
         raise HTTPException(status_code=401, detail="Invalid session")
 
     return doctor_id
 
+
+async def require_doctor_async(request: Request):
+    """require_doctor() for async handlers, off the event loop if the session store does I/O."""
+    if doctor_sessions.blocking:
+        return await run_in_threadpool(require_doctor, request)
+    return require_doctor(request)
+
 # Serve static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -143,6 +293,38 @@ def resolve_doctor_or_404(doctor_slug: str):
 # Doctor-specific booking URL
 # -------------------------------
 
+# Compiled once at import; restart to pick up edits to index.html
+_templates = Environment(
+    loader=FileSystemLoader("static"),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+)
+BOOKING_PAGE_TEMPLATE = _templates.get_template("index.html")
+
+# Pages differ only by slug; slugs are checked against the DB first,
+# so this holds at most one entry per doctor
+BOOKING_PAGE_CACHE_SIZE = int(os.getenv("BOOKING_PAGE_CACHE_SIZE", "1024"))
+
+
+@lru_cache(maxsize=BOOKING_PAGE_CACHE_SIZE)
+def render_booking_page(doctor_slug: str) -> tuple[bytes, str]:
+    """(page, ETag) for a doctor's booking page."""
+    body = BOOKING_PAGE_TEMPLATE.render(DOCTOR_SLUG=doctor_slug).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return body, etag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match specifies
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
 @app.get("/book/{doctor_slug}")
 def serve_doctor_ui(doctor_slug: str, request: Request):
     doctor = resolve_doctor_or_404(doctor_slug)
@@ -158,12 +340,15 @@ def serve_doctor_ui(doctor_slug: str, request: Request):
     doctor_name=doctor["name"]
     )
 
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        html = f.read()
-
-    html = html.replace("{{DOCTOR_SLUG}}", doctor_slug)
+    body, etag = render_booking_page(doctor["slug"])
 
-    response = HTMLResponse(html)
+    # Revalidated on every visit (the session cookie is set either way),
+    # but a matching ETag costs no body
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        response = Response(status_code=304, headers=headers)
+    else:
+        response = HTMLResponse(body, headers=headers)
 
     response.set_cookie(
         key="session_id",
@@ -178,7 +363,7 @@ def serve_doctor_ui(doctor_slug: str, request: Request):
 # Chat endpoint
 # -------------------------------
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest, request: Request):
+async def chat(req: ChatRequest, request: Request):
     session_id = request.cookies.get("session_id")
     if not session_id:
         raise HTTPException(
@@ -187,14 +372,120 @@ def chat(req: ChatRequest, request: Request):
         )
 
 
-    reply = handle_web_message(
-        session_id=session_id,
-        user_message=req.message
-    )
-        
+    # The agent (LLM + calendar clients) is blocking; it runs on its own
+    # bounded pool so it can't take the threads other endpoints need
+    try:
+        reply = await run_agent_turn(
+            handle_web_message,
+            session_id=session_id,
+            user_message=req.message,
+            doctor_slug=req.doctor_slug
+        )
+    except AgentBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail="We're handling a lot of conversations right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
     return ChatResponse(reply=reply)
 
 
+# -------------------------------
+# Streaming chat (server-sent events)
+# -------------------------------
+#
+# Same turn as /chat, but the patient sees something at once:
+#   ack     request received
+#   typing  the agent is working
+#   status  progress pushed from inside the turn (services.turn_events)
+#   delta   a piece of the reply
+#   done    the full reply; the stream ends
+#   error   {detail, retry_after?}; the stream ends
+
+CHAT_STREAM_KEEPALIVE_SECONDS = 15
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def reply_chunks(reply: str) -> list[str]:
+    # Line by line, so multi-line replies (menus, summaries) build up
+    return reply.splitlines(keepends=True) or [reply]
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, request: Request):
+    session_id = request.cookies.get("session_id")
+    if not session_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Session missing. Please start booking from the doctor's page."
+        )
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def publish(event: str, data: dict) -> None:
+        # Called from the agent's worker thread
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def run_turn():
+        try:
+            with turn_events.publishing_to(publish):
+                reply = await run_agent_turn(
+                    handle_web_message,
+                    session_id=session_id,
+                    user_message=req.message,
+                    doctor_slug=req.doctor_slug
+                )
+            for chunk in reply_chunks(reply):
+                events.put_nowait(("delta", {"text": chunk}))
+            events.put_nowait(("done", {"reply": reply}))
+        except AgentBusy as e:
+            events.put_nowait(("error", {
+                "detail": "We're handling a lot of conversations right now. Please try again shortly.",
+                "retry_after": e.retry_after,
+            }))
+        except HTTPException as e:
+            events.put_nowait(("error", {"detail": e.detail}))
+        except Exception:
+            logger.exception(f"Streaming chat turn failed | session_id={session_id}")
+            events.put_nowait(("error", {"detail": "⚠ Something went wrong on our side."}))
+        finally:
+            events.put_nowait(None)
+
+    async def stream():
+        yield sse_event("ack", {})
+        yield sse_event("typing", {})
+
+        turn = asyncio.create_task(run_turn())
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(events.get(), CHAT_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    break
+                yield sse_event(*item)
+        finally:
+            # Client gone: the turn stops if it hasn't started, and is
+            # waited for if it has (it uses this request's DB scope)
+            if not turn.done():
+                turn.cancel()
+                await asyncio.gather(turn, return_exceptions=True)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 
 
 # -------------------------------
@@ -202,7 +493,9 @@ def chat(req: ChatRequest, request: Request):
 # -------------------------------
 @app.get("/connect-calendar/{doctor_slug}")
 def connect_calendar(doctor_slug: str):
-    doctor = get_doctor_by_slug(doctor_slug)
+    # Opened right after onboarding; the replica may not have the doctor yet
+    with primary_reads():
+        doctor = get_doctor_by_slug(doctor_slug)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
@@ -261,7 +554,18 @@ def oauth_callback(request: Request):
 
     service = build_calendar_service(credentials)
 
-    calendar_list = service.calendarList().list().execute()
+    try:
+        calendar_list = execute_calendar_request(
+            service.calendarList().list(),
+            doctor_id=doctor_id,
+            operation="calendar_list",
+        )
+    except CalendarUnavailable:
+        raise HTTPException(
+            status_code=503,
+            detail="Google Calendar is not responding. Please try again shortly.",
+            headers={"Retry-After": str(retry_after_seconds(doctor_id))},
+        )
     primary_calendar = None
 
     for cal in calendar_list.get("items", []):
@@ -356,13 +660,18 @@ def onboard_doctor(payload: DoctorOnboardRequest):
 
     slug = payload.slug or normalize_slug(payload.name)
 
-    if get_doctor_by_slug(slug):
+    # Uniqueness checks can't trust a lagging replica
+    with primary_reads():
+        slug_taken = get_doctor_by_slug(slug)
+        email_taken = get_doctor_by_email(payload.email)
+
+    if slug_taken:
         raise HTTPException(
             status_code=400,
             detail=f"Doctor slug '{slug}' already exists"
         )
     
-    if get_doctor_by_email(payload.email):
+    if email_taken:
         raise HTTPException(
         status_code=400,
         detail=f"Doctor with email '{payload.email}' already exists"
@@ -398,27 +707,61 @@ def onboard_doctor(payload: DoctorOnboardRequest):
 
 
 
+# -------------------------------
+# Keyset pagination (appointment listings)
+# -------------------------------
+APPOINTMENTS_PAGE_MAX = 200
+
+
+def parse_appointment_cursor(cursor: str | None):
+    if cursor is None:
+        return None
+    try:
+        return decode_appointment_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def appointment_page(appointments, limit: int, serialize) -> dict:
+    """appointments was fetched with limit + 1 to see if more follow."""
+    page = appointments[:limit]
+    next_cursor = None
+    if len(appointments) > limit:
+        last = page[-1]
+        next_cursor = encode_appointment_cursor(
+            last.appointment_date, last.appointment_time, last.appointment_id
+        )
+
+    return {
+        "items": [serialize(a) for a in page],
+        "next_cursor": next_cursor,
+    }
+
+
 @app.get("/doctor/{doctor_id}/appointments")
 def list_doctor_appointments(
     doctor_id: str,
-    limit: int = 50
+    limit: int = Query(50, ge=1, le=APPOINTMENTS_PAGE_MAX),
+    cursor: str | None = None,
 ):
     appointments = get_upcoming_appointments_for_doctor(
         doctor_id=doctor_id,
-        limit=limit
+        limit=limit + 1,
+        after=parse_appointment_cursor(cursor),
     )
 
-    return [
-        {
+    return appointment_page(
+        appointments,
+        limit,
+        lambda a: {
             "appointment_id": str(a.appointment_id),
             "patient_name": a.patient.name,
             "patient_phone": a.patient.phone,
             "date": a.appointment_date.isoformat(),
             "time": a.appointment_time.strftime("%H:%M"),
             "status": a.status,
-        }
-        for a in appointments
-    ]
+        },
+    )
 
 
 
@@ -528,11 +871,9 @@ def doctor_reschedule_appointment(
 
 
 @app.post("/internal/send-daily-emails")
-def send_daily_emails():
-    from db.database import SessionLocal
+def send_daily_emails(db: Session = Depends(get_read_db)):
     from db.models import Doctor
 
-    db = SessionLocal()
     doctors = db.query(Doctor).filter(Doctor.is_active == True).all()
 
     for d in doctors:
@@ -549,6 +890,17 @@ def send_daily_emails():
     return {"status": "Emails processed"}
 
 
+@app.post("/internal/ensure-partitions")
+def ensure_partitions():
+    created = ensure_appointment_partitions()
+    return {"status": "Partitions ensured", "created": created}
+
+
+@app.get("/internal/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render())
+
+
 
 from pydantic import BaseModel
 
@@ -566,8 +918,7 @@ def doctor_login(payload: DoctorLoginRequest, response: Response):
     if not verify_password(payload.password, auth.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    session_id = str(uuid.uuid4())
-    doctor_sessions[session_id] = auth.doctor_id
+    session_id = start_doctor_session(auth.doctor_id)
 
     update_doctor_last_login(auth.id)
 
@@ -575,7 +926,8 @@ def doctor_login(payload: DoctorLoginRequest, response: Response):
         key="doctor_session",
         value=session_id,
         httponly=True,
-        samesite="lax"
+        samesite="lax",
+        max_age=int(DOCTOR_SESSION_TTL_SECONDS),
     )
 
     return {"status": "logged_in"}
@@ -586,102 +938,271 @@ def doctor_login(payload: DoctorLoginRequest, response: Response):
 def doctor_logout(request: Request, response: Response):
     session_id = request.cookies.get("doctor_session")
     if session_id:
-        doctor_sessions.pop(session_id, None)
+        doctor_sessions.delete(session_id)
 
     response.delete_cookie("doctor_session")
     return {"status": "logged_out"}
 
 
 @app.get("/auth/doctor/me")
-def doctor_me(request: Request):
+def doctor_me(request: Request, db: Session = Depends(get_db)):
     session_id = request.cookies.get("doctor_session")
 
     if not session_id:
         return JSONResponse(status_code=401, content={"error": "Not logged in"})
 
-    doctor_id = doctor_sessions.get(session_id)
+    doctor_id = doctor_for_session(session_id)
 
     if not doctor_id:
         return JSONResponse(status_code=401, content={"error": "Invalid session"})
 
-    db = SessionLocal()
-    try:
-        doctor = get_doctor_by_id(db, doctor_id)
-        if not doctor:
-            return JSONResponse(status_code=404, content={"error": "Doctor not found"})
+    doctor = get_doctor_by_id(db, doctor_id)
+    if not doctor:
+        return JSONResponse(status_code=404, content={"error": "Doctor not found"})
 
-        return {
-            "doctor_id": doctor.doctor_id,
-            "name": doctor.name,
-            "email": doctor.email,
-        }
-    finally:
-        db.close()
+    return {
+        "doctor_id": doctor.doctor_id,
+        "name": doctor.name,
+        "email": doctor.email,
+    }
 
 
 
 @app.post("/api/doctor/appointments/{appointment_id}/cancel")
-def cancel_appointment_secure(
-    appointment_id: str,
-    request: Request
+async def cancel_appointment_secure(
+    appointment_id: uuid.UUID,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    
-    
     # 1️⃣ Identify logged-in doctor (SESSION BASED)
-    doctor_id = require_doctor(request)
+    doctor_id = await require_doctor_async(request)
 
     # 2️⃣ Fetch appointment
-    appt = get_appointment_by_id(appointment_id)
+    appt = await async_repository.get_appointment_by_id(db, appointment_id)
     if not appt:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
-    # ✅ ADD THIS BLOCK HERE
-    if appt.status == "CANCELLED":
+    if appt.status == AppointmentStatus.CANCELLED:
         raise HTTPException(
             status_code=400,
             detail="Appointment already cancelled"
         )
 
-
     # 3️⃣ Authorization check (CRITICAL)
     if appt.doctor_id != doctor_id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    cancel_appointment_by_id(
-    appointment_id=appointment_id,
-    doctor_id=doctor_id
-    )
+    # 4️⃣ Calendar first (blocking Google client, so in a thread)
+    try:
+        await run_in_threadpool(
+            delete_appointment_event,
+            doctor_id,
+            appt.calendar_event_id,
+        )
+    except CalendarUnavailable:
+        raise HTTPException(
+            status_code=503,
+            detail="Calendar is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(retry_after_seconds(doctor_id))},
+        )
 
+    # 5️⃣ Then the DB
+    if await async_repository.cancel_appointment(db, appointment_id):
+        doctor = await async_repository.get_doctor_by_id(db, doctor_id)
+        background_tasks.add_task(
+            notify_cancellation,
+            doctor,
+            {
+                "patient_name": appt.patient.name if appt.patient else "-",
+                "date": appt.appointment_date.isoformat(),
+                "time": appt.appointment_time.strftime("%H:%M"),
+            },
+        )
 
     print(
     f"[AUDIT] doctor={doctor_id} "
     f"action=cancel "
     f"appointment={appointment_id}"
 )
-    
 
     return {"status": "cancelled"}
 
 
 
+BULK_CANCEL_MAX_DAYS = 31
+
+
+def notify_cancellation(doctor, appointment):
+    notify_doctor_via_whatsapp(
+        doctor=doctor,
+        message=(
+            f"❌ Appointment Cancelled\n\n"
+            f"Patient: {appointment['patient_name']}\n"
+            f"Date: {appointment['date']}\n"
+            f"Time: {appointment['time']}"
+        )
+    )
+
+
+def notify_reschedule(doctor, appointment):
+    notify_doctor_via_whatsapp(
+        doctor=doctor,
+        message=(
+            f"🔁 Appointment Rescheduled\n\n"
+            f"Patient: {appointment['patient_name']}\n"
+            f"Old: {appointment['old_date']} – {appointment['old_time']}\n"
+            f"New: {appointment['date']} – {appointment['time']}"
+        )
+    )
+
+
+@app.post("/api/doctor/appointments/bulk-cancel")
+def bulk_cancel_appointments_secure(
+    payload: DoctorBulkCancelRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    # 1️⃣ Identify logged-in doctor
+    doctor_id = require_doctor(request)
+
+    # 2️⃣ Validate range
+    end_date = payload.end_date or payload.start_date
+
+    if end_date < payload.start_date:
+        raise HTTPException(
+            status_code=400,
+            detail="end_date must not be before start_date"
+        )
+
+    if (end_date - payload.start_date).days >= BULK_CANCEL_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range cannot exceed {BULK_CANCEL_MAX_DAYS} days"
+        )
+
+    if (
+        payload.start_time and payload.end_time
+        and payload.start_time >= payload.end_time
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="start_time must be before end_time"
+        )
+
+    # 3️⃣ Calendar (batched) + one DB update
+    try:
+        results, cancelled = cancel_appointments_in_range(
+            doctor_id=doctor_id,
+            start_date=payload.start_date,
+            end_date=end_date,
+            start_time=payload.start_time,
+            end_time=payload.end_time,
+        )
+    except CalendarUnavailable:
+        raise HTTPException(
+            status_code=503,
+            detail="Calendar is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(retry_after_seconds(doctor_id))},
+        )
+
+    # 4️⃣ Notifications after the response (fan-out)
+    if cancelled:
+        doctor = get_doctor_by_id(db, doctor_id)
+
+        for a in cancelled:
+            background_tasks.add_task(
+                notify_cancellation,
+                doctor,
+                {
+                    "patient_name": a.patient.name if a.patient else "-",
+                    "date": a.appointment_date.isoformat(),
+                    "time": a.appointment_time.strftime("%H:%M"),
+                },
+            )
+
+    print(
+        f"[AUDIT] doctor={doctor_id} "
+        f"action=bulk_cancel "
+        f"start_date={payload.start_date} "
+        f"end_date={end_date} "
+        f"cancelled={len(cancelled)}/{len(results)}"
+    )
+
+    return {
+        "requested": len(results),
+        "cancelled": len(cancelled),
+        "results": results,
+    }
+
+
+# Raw CSV body (Content-Type: text/csv), see db.importer for the columns
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+@app.post("/api/doctor/import")
+async def import_appointments(request: Request):
+    # 1️⃣ Identify logged-in doctor
+    doctor_id = await require_doctor_async(request)
+
+    if not importer.is_supported():
+        raise HTTPException(status_code=501, detail="Bulk import needs PostgreSQL")
+
+    # 2️⃣ Spool the body (to disk past IMPORT_SPOOL_BYTES); COPY reads
+    #    it back in chunks
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as upload:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Import files are limited to {IMPORT_MAX_BYTES} bytes",
+                )
+            upload.write(chunk)
+        upload.seek(0)
+
+        # 3️⃣ COPY + merge, one transaction
+        try:
+            summary = await run_in_threadpool(
+                importer.import_appointments_csv, upload, doctor_id
+            )
+        except importer.AppointmentImportError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    print(
+        f"[AUDIT] doctor={doctor_id} "
+        f"action=import "
+        f"rows={summary['rows']} "
+        f"appointments_created={summary['appointments_created']}"
+    )
+
+    return summary
+
+
+
 from tools import is_working_day, check_availability
 
 @app.post("/api/doctor/appointments/{appointment_id}/reschedule")
-def reschedule_appointment_secure(
-    appointment_id: str,
+async def reschedule_appointment_secure(
+    appointment_id: uuid.UUID,
     payload: DoctorRescheduleRequest,
-    request: Request
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
 ):
     # 1️⃣ Identify logged-in doctor
-    doctor_id = require_doctor(request)
+    doctor_id = await require_doctor_async(request)
 
     # 2️⃣ Fetch appointment
-    appt = get_appointment_by_id(appointment_id)
+    appt = await async_repository.get_appointment_by_id(db, appointment_id)
     if not appt:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
     # 3️⃣ Status guard
-    if appt.status != "BOOKED":
+    if appt.status != AppointmentStatus.BOOKED:
         raise HTTPException(
             status_code=400,
             detail="Only booked appointments can be rescheduled"
@@ -702,20 +1223,17 @@ def reschedule_appointment_secure(
     # 🔒 STRICT VALIDATIONS BEGIN
     # ---------------------------
 
+    doctor = await async_repository.get_doctor_by_id(db, doctor_id)
+
     # 6️⃣ Working day validation
-    if not is_working_day(str(payload.new_date), doctor_id):
+    working_days = list(map(int, doctor.working_days.split(",")))
+    if payload.new_date.weekday() not in working_days:
         raise HTTPException(
             status_code=400,
             detail="Doctor is not available on the selected day"
         )
-#
-    # 7️⃣ Working hour validation
-    db = SessionLocal()
-    try:
-        doctor = get_doctor_by_id(db, doctor_id)
-    finally:
-        db.close()
 
+    # 7️⃣ Working hour validation
     new_time = payload.new_time
 
     if not (doctor.work_start_time <= new_time < doctor.work_end_time):
@@ -725,11 +1243,12 @@ def reschedule_appointment_secure(
         )
 
     # 8️⃣ Availability check (exclude current appointment)
-    if not check_availability(
-        str(payload.new_date),
-        new_time.strftime("%H:%M"),
-        doctor_id,
-        exclude_appointment_id=appointment_id
+    if not await async_repository.is_slot_free(
+        db,
+        doctor_id=doctor_id,
+        appointment_date=payload.new_date,
+        appointment_time=new_time,
+        exclude_appointment_id=appointment_id,
     ):
         raise HTTPException(
             status_code=400,
@@ -741,12 +1260,19 @@ def reschedule_appointment_secure(
     # ---------------------------
 
     try:
-        update_calendar_event(
+        await run_in_threadpool(
+            update_calendar_event,
             doctor_id=doctor_id,
             event_id=appt.calendar_event_id,
             new_date=str(payload.new_date),
             new_time=new_time.strftime("%H:%M"),
         )
+    except CalendarUnavailable:
+        raise HTTPException(
+            status_code=503,
+            detail="Calendar is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(retry_after_seconds(doctor_id))},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=502,
@@ -757,11 +1283,26 @@ def reschedule_appointment_secure(
     # ✅ STATE UPDATE (IDENTITY PRESERVED)
     # ---------------------------
 
-    reschedule_appointment_db(
+    old_date = appt.appointment_date.isoformat()
+    old_time = appt.appointment_time.strftime("%H:%M")
+
+    appt = await async_repository.reschedule_appointment(
+        db,
         appointment_id=appointment_id,
         new_date=payload.new_date,
         new_time=new_time,
-        new_calendar_event_id=appt.calendar_event_id
+    )
+
+    background_tasks.add_task(
+        notify_reschedule,
+        doctor,
+        {
+            "patient_name": appt.patient.name if appt.patient else "-",
+            "old_date": old_date,
+            "old_time": old_time,
+            "date": appt.appointment_date.isoformat(),
+            "time": appt.appointment_time.strftime("%H:%M"),
+        },
     )
 
     print(
@@ -778,33 +1319,79 @@ def reschedule_appointment_secure(
 
 
 @app.get("/api/doctor/appointments")
-def list_doctor_appointments(request: Request):
-    doctor_id = require_doctor(request)
+async def list_doctor_appointments(
+    request: Request,
+    limit: int = Query(50, ge=1, le=APPOINTMENTS_PAGE_MAX),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    doctor_id = await require_doctor_async(request)
+    after = parse_appointment_cursor(cursor)
 
-    appointments = get_upcoming_appointments_for_doctor(doctor_id)
+    appointments = await async_repository.get_upcoming_appointments_for_doctor(
+        db, doctor_id, limit=limit + 1, after=after
+    )
 
-    return [
-        {
+    return appointment_page(
+        appointments,
+        limit,
+        lambda a: {
             "appointment_id": str(a.appointment_id),
             "date": a.appointment_date.isoformat(),
             "time": a.appointment_time.strftime("%H:%M"),
             "status": a.status,
             "patient_name": a.patient.name if a.patient else None,
             "patient_phone": a.patient.phone if a.patient else None,
+        },
+    )
+
+
+STATS_MAX_DAYS = 366
+STATS_DEFAULT_DAYS = 30
+
+
+@app.get("/api/doctor/stats")
+def doctor_daily_stats(
+    request: Request,
+    start_date: date | None = None,
+    end_date: date | None = None,
+):
+    """Bookings / cancellations / reschedules per day (doctor_daily_stats)."""
+    doctor_id = require_doctor(request)
+
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=STATS_DEFAULT_DAYS - 1)
+
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days >= STATS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {STATS_MAX_DAYS} days")
+
+    stored = {row.day: row for row in get_doctor_daily_stats(doctor_id, start_date, end_date)}
+
+    # Every day in the range, zeros where nothing happened
+    days = []
+    totals = {"booked": 0, "cancelled": 0, "rescheduled": 0}
+    for offset in range((end_date - start_date).days + 1):
+        day = start_date + timedelta(days=offset)
+        row = stored.get(day)
+        counts = {
+            "booked": row.booked if row else 0,
+            "cancelled": row.cancelled if row else 0,
+            "rescheduled": row.rescheduled if row else 0,
         }
-        for a in appointments
-    ]
+        for key, value in counts.items():
+            totals[key] += value
+        days.append({"day": day.isoformat(), **counts})
+
+    return {"days": days, "totals": totals}
 
 
 @app.post("/auth/doctor/signup")
-def doctor_signup(payload: DoctorSignupRequest):
+def doctor_signup(payload: DoctorSignupRequest, db: Session = Depends(get_db)):
     # 1️⃣ Validate doctor exists
-    db = SessionLocal()
-    try:
-        doctor = get_doctor_by_id(db, payload.doctor_id)
-    finally:
-        db.close()
-        
+    doctor = get_doctor_by_id(db, payload.doctor_id)
+
     if not doctor:
         raise HTTPException(
             status_code=400,
@@ -893,18 +1480,14 @@ def generate_whatsapp_qr(platform_number: str, doctor_id: str):
 
 
 @app.get("/api/doctor/whatsapp-qr")
-def get_doctor_whatsapp_qr(request: Request):
+def get_doctor_whatsapp_qr(request: Request, db: Session = Depends(get_db)):
     session_id = request.cookies.get("doctor_session")
-    doctor_id = doctor_sessions.get(session_id)
+    doctor_id = doctor_for_session(session_id)
 
     if not doctor_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    db = SessionLocal()
-    try:
-        doctor = get_doctor_by_id(db, doctor_id)
-    finally:
-        db.close()
+    doctor = get_doctor_by_id(db, doctor_id)
 
     if not doctor:
         raise HTTPException(
@@ -949,7 +1532,7 @@ import logging
 logger = logging.getLogger("medschedule")
 
 
-def process_whatsapp_message(from_number, to_number, body):
+async def process_whatsapp_message(from_number, to_number, body):
     start_time = time.time()
 
     try:
@@ -957,11 +1540,22 @@ def process_whatsapp_message(from_number, to_number, body):
             f"Processing started | from={from_number} | body='{body}'"
         )
 
-        reply_text = handle_whatsapp_message(
-            from_number=from_number,
-            to_number=to_number,
-            message_body=body
-        )
+        # Agent turn and Twilio client are blocking: run them in threads
+        # (the agent on its own bounded pool) so the event loop keeps
+        # accepting webhooks meanwhile
+        try:
+            reply_text = await run_agent_turn(
+                handle_whatsapp_message,
+                from_number=from_number,
+                to_number=to_number,
+                message_body=body
+            )
+        except AgentBusy:
+            logger.warning(f"Agent busy, asking to retry | from={from_number}")
+            reply_text = (
+                "⏳ We're handling a lot of messages right now.\n"
+                "Please send your message again in a minute."
+            )
 
         duration = round(time.time() - start_time, 3)
 
@@ -969,7 +1563,8 @@ def process_whatsapp_message(from_number, to_number, body):
             f"Reply generated | from={from_number} | duration={duration}s"
         )
 
-        twilio_client.messages.create(
+        await run_in_threadpool(
+            twilio_client.messages.create,
             body=reply_text,
             from_=f"whatsapp:{TWILIO_WHATSAPP_NUMBER}",
             to=from_number,
@@ -985,7 +1580,8 @@ def process_whatsapp_message(from_number, to_number, body):
         )
 
         try:
-            twilio_client.messages.create(
+            await run_in_threadpool(
+                twilio_client.messages.create,
                 body="⚠️ Sorry, something went wrong.\nPlease type 0 to restart.",
                 from_=TWILIO_WHATSAPP_NUMBER,
                 to=from_number,
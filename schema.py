@@ -1,9 +1,14 @@
+import base64
+import uuid
+
 from pydantic import BaseModel
 from datetime import date, time
 
 class ChatRequest(BaseModel):
     
     message: str
+    # Booking page's doctor: restarts a session the server has dropped
+    doctor_slug: str | None = None
     
 
 
@@ -13,3 +18,28 @@ class ChatResponse(BaseModel):
 class DoctorRescheduleRequest(BaseModel):
     new_date: date
     new_time: time
+
+
+class DoctorBulkCancelRequest(BaseModel):
+    start_date: date
+    end_date: date | None = None      # defaults to start_date
+    start_time: time | None = None    # optional window applied on every day
+    end_time: time | None = None
+
+
+# Opaque cursor for keyset-paged appointment listings:
+# the (appointment_date, appointment_time, appointment_id) of the last
+# row of the previous page
+def encode_appointment_cursor(appointment_date: date, appointment_time: time, appointment_id) -> str:
+    raw = f"{appointment_date.isoformat()}|{appointment_time.isoformat()}|{appointment_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_appointment_cursor(cursor: str) -> tuple[date, time, uuid.UUID]:
+    """Raises ValueError for anything encode_appointment_cursor didn't produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, at, appointment_id = raw.split("|")
+        return date.fromisoformat(day), time.fromisoformat(at), uuid.UUID(appointment_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
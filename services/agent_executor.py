@@ -0,0 +1,138 @@
+# services/agent_executor.py
+
+"""
+Dedicated, bounded thread pool for agent turns.
+
+An agent turn blocks on Gemini, Postgres and Google Calendar for up to
+several seconds. Run in the default threadpool (run_in_threadpool), a
+burst of them takes every thread and the dashboard / auth endpoints
+queue behind them. run_agent_turn() runs them on their own pool
+instead:
+
+- AGENT_WORKERS threads run turns
+- up to AGENT_QUEUE_SIZE more wait for a thread
+- anything beyond that, or anything that waited AGENT_QUEUE_TIMEOUT_SECONDS
+  without starting, fails fast with AgentBusy (-> 503 + Retry-After)
+
+Turns run in a copy of the caller's context, so the request's DB scope
+(db.database.request_scope) carries over like with run_in_threadpool.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services import metrics
+
+
+logger = logging.getLogger("medschedule")
+
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "8"))
+AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "32"))
+AGENT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AGENT_QUEUE_TIMEOUT_SECONDS", "10"))
+AGENT_RETRY_AFTER_SECONDS = int(os.getenv("AGENT_RETRY_AFTER_SECONDS", "5"))
+
+
+class AgentBusy(RuntimeError):
+    """
+    No agent worker free and the queue is full (or too slow).
+    Callers should ask the user to try again shortly.
+    """
+
+    retry_after = AGENT_RETRY_AFTER_SECONDS
+
+
+_executor = ThreadPoolExecutor(max_workers=AGENT_WORKERS, thread_name_prefix="agent")
+
+_lock = threading.Lock()
+_in_flight = 0  # running + queued
+
+
+def _admit() -> bool:
+    global _in_flight
+    with _lock:
+        if _in_flight >= AGENT_WORKERS + AGENT_QUEUE_SIZE:
+            return False
+        _in_flight += 1
+        return True
+
+
+def _release(_future=None) -> None:
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def _timed(submitted_at: float, fn, args, kwargs):
+    metrics.observe("agent_queue_wait_seconds", time.perf_counter() - submitted_at)
+    return fn(*args, **kwargs)
+
+
+async def _wait_until_done(waiter):
+    """
+    Await a turn that has started, even through cancellation: it uses
+    the request's DB scope, which is closed once the handler returns
+    (run_in_threadpool waits the same way).
+    """
+    cancelled = False
+    while True:
+        try:
+            result = await asyncio.shield(waiter)
+            break
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                raise
+            cancelled = True
+    if cancelled:
+        raise asyncio.CancelledError()
+    return result
+
+
+async def run_agent_turn(fn, *args, **kwargs):
+    """
+    Await fn(*args, **kwargs) on the agent pool.
+    Raises AgentBusy instead of queueing without bound.
+    """
+    if not _admit():
+        metrics.inc("agent_rejected_total", reason="queue_full")
+        logger.warning(f"Agent queue full ({AGENT_WORKERS} running, {AGENT_QUEUE_SIZE} waiting)")
+        raise AgentBusy()
+
+    context = contextvars.copy_context()
+    future = _executor.submit(context.run, _timed, time.perf_counter(), fn, args, kwargs)
+    # Fires when the turn finishes or is cancelled before starting
+    future.add_done_callback(_release)
+    waiter = asyncio.wrap_future(future)
+
+    try:
+        return await asyncio.wait_for(asyncio.shield(waiter), AGENT_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # Never got a thread: give up on it
+        if future.cancel():
+            metrics.inc("agent_rejected_total", reason="queue_timeout")
+            raise AgentBusy()
+    except asyncio.CancelledError:
+        # Client went away; don't start work nobody will read
+        if not future.cancel():
+            try:
+                await _wait_until_done(waiter)
+            except Exception:
+                pass
+        raise
+
+    # Running past the timeout: a slow turn, not an overload
+    return await _wait_until_done(waiter)
+
+
+def _collect_agent_metrics():
+    with _lock:
+        in_flight = _in_flight
+    metrics.set_gauge("agent_in_flight", in_flight)
+    metrics.set_gauge("agent_workers", AGENT_WORKERS)
+
+
+metrics.register_collector(_collect_agent_metrics)
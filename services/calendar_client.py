@@ -0,0 +1,221 @@
+# services/calendar_client.py
+
+"""
+Guarded execution of Google Calendar requests.
+
+Every calendar call goes through execute_calendar_request(), which:
+- relies on the socket timeout set in build_calendar_service()
+- keeps a circuit breaker per doctor plus a global one
+- fails fast with CalendarUnavailable while a breaker is open
+
+4xx responses (404, 410, ...) are the caller's problem, not an outage,
+so they are re-raised untouched and do not trip the breakers.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+from httplib2 import HttpLib2Error
+
+from services import metrics
+
+
+logger = logging.getLogger("medschedule")
+
+BREAKER_FAILURES = int(os.getenv("CALENDAR_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("CALENDAR_BREAKER_RESET_SECONDS", "30"))
+GLOBAL_BREAKER_FAILURES = int(os.getenv("CALENDAR_GLOBAL_BREAKER_FAILURES", "20"))
+
+
+class CalendarUnavailable(RuntimeError):
+    """
+    Calendar is slow, failing or short-circuited.
+    Callers should ask the user to try again shortly.
+    """
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        True if a call may go through.
+        After reset_seconds an open breaker lets exactly one trial call in.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            # HALF_OPEN
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def release(self) -> None:
+        """Give back a trial slot that was granted but not used."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Calendar breaker closed | breaker={self.name}")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        f"Calendar breaker opened | breaker={self.name} | "
+                        f"failures={self.failures}"
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def retry_after(self) -> int:
+        """Seconds until an open breaker lets a trial call through."""
+        if self.state != self.OPEN:
+            return 0
+        remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+        return max(1, int(remaining + 0.999))
+
+
+global_breaker = CircuitBreaker("global", GLOBAL_BREAKER_FAILURES, BREAKER_RESET_SECONDS)
+
+# doctor_id (str) -> CircuitBreaker
+_doctor_breakers: dict[str, CircuitBreaker] = {}
+_doctor_breakers_lock = threading.Lock()
+
+
+def get_doctor_breaker(doctor_id) -> CircuitBreaker:
+    key = str(doctor_id)
+    with _doctor_breakers_lock:
+        breaker = _doctor_breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(key, BREAKER_FAILURES, BREAKER_RESET_SECONDS)
+            _doctor_breakers[key] = breaker
+        return breaker
+
+
+def _is_outage(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        return error.resp.status >= 500 or error.resp.status == 429
+    return isinstance(error, (socket.timeout, TimeoutError, OSError, HttpLib2Error))
+
+
+def execute_calendar_request(request, *, doctor_id, operation: str = "call"):
+    """
+    Execute a googleapiclient request behind the circuit breakers.
+
+    Raises CalendarUnavailable on open breakers, timeouts and 5xx/429.
+    Other errors are re-raised unchanged.
+    """
+    doctor_breaker = get_doctor_breaker(doctor_id)
+
+    granted = []
+    for breaker in (global_breaker, doctor_breaker):
+        if not breaker.allow():
+            for other in granted:
+                other.release()
+            metrics.inc("calendar_calls_total", operation=operation, outcome="rejected")
+            raise CalendarUnavailable(
+                f"Calendar temporarily unavailable (breaker={breaker.name})"
+            )
+        granted.append(breaker)
+
+    started = time.perf_counter()
+    try:
+        result = request.execute()
+    except Exception as e:
+        metrics.observe("calendar_call_seconds", time.perf_counter() - started, operation=operation)
+
+        if not _is_outage(e):
+            # Calendar answered; the request itself was bad
+            doctor_breaker.record_success()
+            global_breaker.record_success()
+            metrics.inc("calendar_calls_total", operation=operation, outcome="client_error")
+            raise
+
+        doctor_breaker.record_failure()
+        global_breaker.record_failure()
+        metrics.inc("calendar_calls_total", operation=operation, outcome="error")
+
+        logger.warning(
+            f"Calendar call failed | doctor_id={doctor_id} | "
+            f"operation={operation} | error={e!r}"
+        )
+        raise CalendarUnavailable(f"Calendar call failed: {e}") from e
+
+    metrics.observe("calendar_call_seconds", time.perf_counter() - started, operation=operation)
+    metrics.inc("calendar_calls_total", operation=operation, outcome="ok")
+
+    doctor_breaker.record_success()
+    global_breaker.record_success()
+    return result
+
+
+def retry_after_seconds(doctor_id=None) -> int:
+    """Hint for Retry-After headers while breakers are open."""
+    seconds = global_breaker.retry_after()
+    if doctor_id is not None:
+        seconds = max(seconds, get_doctor_breaker(doctor_id).retry_after())
+    return seconds or int(BREAKER_RESET_SECONDS)
+
+
+def _collect_breaker_metrics():
+    metrics.set_gauge(
+        "calendar_breaker_state",
+        CircuitBreaker.STATE_CODES[global_breaker.state],
+        scope="global",
+    )
+
+    with _doctor_breakers_lock:
+        breakers = list(_doctor_breakers.values())
+
+    for breaker in breakers:
+        metrics.set_gauge(
+            "calendar_breaker_state",
+            CircuitBreaker.STATE_CODES[breaker.state],
+            scope="doctor",
+            doctor_id=breaker.name,
+        )
+
+    metrics.set_gauge(
+        "calendar_breakers_open",
+        sum(1 for b in breakers if b.state == CircuitBreaker.OPEN),
+    )
+
+
+metrics.register_collector(_collect_breaker_metrics)
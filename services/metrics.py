@@ -0,0 +1,89 @@
+# services/metrics.py
+
+"""
+Minimal in-process metrics registry.
+
+Counters, gauges and summaries (count / sum / max) keyed by name and
+labels, rendered in Prometheus text format by /internal/metrics.
+Collectors registered here are called at render time, so live values
+(pool usage, breaker state, cache sizes) are read only when scraped.
+"""
+
+import threading
+from typing import Callable
+
+
+_lock = threading.Lock()
+
+# (name, labels) -> value
+_counters: dict[tuple, float] = {}
+_gauges: dict[tuple, float] = {}
+
+# (name, labels) -> [count, sum, max]
+_summaries: dict[tuple, list[float]] = {}
+
+_collectors: list[Callable[[], None]] = []
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        summary = _summaries.setdefault(key, [0, 0.0, 0.0])
+        summary[0] += 1
+        summary[1] += value
+        summary[2] = max(summary[2], value)
+
+
+def register_collector(collector: Callable[[], None]) -> None:
+    """
+    Register a callable that refreshes gauges right before rendering.
+    """
+    _collectors.append(collector)
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render() -> str:
+    """
+    Render every metric in Prometheus text exposition format.
+    """
+    for collector in list(_collectors):
+        try:
+            collector()
+        except Exception:
+            pass
+
+    lines = []
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), value in sorted(_gauges.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), (count, total, peak) in sorted(_summaries.items()):
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_max{_format_labels(labels)} {peak}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,440 @@
+# services/reconciliation.py
+
+"""
+DB-versus-calendar reconciliation.
+
+Walks a doctor's schedule in fixed time windows. For each window the
+BOOKED appointments are streamed from the DB in keyset pages and the
+calendar events are listed page by page, so memory is bounded by one
+window, not by the length of the history.
+
+Mismatch kinds:
+- orphan_event   event created by this app with no BOOKED appointment
+- missing_event  BOOKED appointment whose event is gone
+- time_drift     event start differs from the appointment slot
+- no_event_id    BOOKED appointment never linked to an event
+
+With repair=True the DB is treated as the source of truth:
+- orphan_event  -> delete the event
+- missing_event -> recreate the event and relink the appointment
+- time_drift    -> move the event back to the appointment slot
+- no_event_id   -> report only
+
+Usage:
+    python -m services.reconciliation --all [--repair]
+    python -m services.reconciliation --doctor-id <uuid> --since 2026-01-01
+"""
+
+import argparse
+import json
+import logging
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytz
+from googleapiclient.errors import HttpError
+
+from calendar_oauth import build_calendar_service
+from db.models import AppointmentStatus
+from db.repository import (
+    iter_booked_appointment_pages,
+    get_appointment_by_event_id,
+    get_appointment_with_patient,
+    get_last_booked_date_for_doctor,
+    get_calendar_connected_doctor_ids,
+    set_appointment_calendar_event_id,
+)
+from services.calendar_client import execute_calendar_request
+from tools import (
+    TIMEZONE,
+    build_appointment_event,
+    get_calendar_id_for_doctor,
+    get_credentials_for_doctor,
+    get_doctor_from_db,
+    is_app_event,
+    update_calendar_event,
+)
+
+
+logger = logging.getLogger("medschedule")
+
+DEFAULT_WINDOW_DAYS = 7
+DEFAULT_PAGE_SIZE = 500
+EVENTS_PAGE_SIZE = 250
+
+# Keep the report itself bounded too
+MAX_REPORTED_DETAILS = 200
+
+
+class ReconciliationReport:
+    def __init__(self, doctor_id):
+        self.doctor_id = str(doctor_id)
+        self.appointments_checked = 0
+        self.events_checked = 0
+        self.counts = {
+            "orphan_event": 0,
+            "missing_event": 0,
+            "time_drift": 0,
+            "no_event_id": 0,
+        }
+        self.repaired = 0
+        self.repair_failures = 0
+        self.details = []
+
+    def add(self, kind: str, **info):
+        self.counts[kind] += 1
+        logger.warning(
+            f"Reconciliation mismatch | doctor_id={self.doctor_id} | "
+            f"kind={kind} | {info}"
+        )
+        if len(self.details) < MAX_REPORTED_DETAILS:
+            self.details.append({"kind": kind, **info})
+
+    def as_dict(self) -> dict:
+        return {
+            "doctor_id": self.doctor_id,
+            "appointments_checked": self.appointments_checked,
+            "events_checked": self.events_checked,
+            "mismatches": self.counts,
+            "repaired": self.repaired,
+            "repair_failures": self.repair_failures,
+            "details": self.details,
+        }
+
+
+def _event_slot(event, tz):
+    """(date, "HH:MM") of an event start in clinic time, or None."""
+    start = event.get("start", {}).get("dateTime")
+    if not start:
+        return None
+    start_dt = datetime.fromisoformat(start.replace("Z", "+00:00")).astimezone(tz)
+    return start_dt.date(), start_dt.strftime("%H:%M")
+
+
+def _iter_events(service, *, doctor_id, calendar_id, time_min, time_max):
+    page_token = None
+    while True:
+        response = execute_calendar_request(
+            service.events().list(
+                calendarId=calendar_id,
+                timeMin=time_min.isoformat(),
+                timeMax=time_max.isoformat(),
+                singleEvents=True,
+                maxResults=EVENTS_PAGE_SIZE,
+                pageToken=page_token,
+            ),
+            doctor_id=doctor_id,
+            operation="list",
+        )
+
+        yield from response.get("items", [])
+
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def _get_event(service, *, doctor_id, calendar_id, event_id):
+    """The live event, or None if it is deleted / cancelled."""
+    try:
+        event = execute_calendar_request(
+            service.events().get(calendarId=calendar_id, eventId=event_id),
+            doctor_id=doctor_id,
+            operation="get",
+        )
+    except HttpError as e:
+        if e.resp.status in (404, 410):
+            return None
+        raise
+
+    if event.get("status") == "cancelled":
+        return None
+    return event
+
+
+def _recreate_event(service, *, doctor, calendar_id, appointment_id, tz):
+    appt = get_appointment_with_patient(appointment_id)
+    if not appt or appt.status != AppointmentStatus.BOOKED:
+        return
+
+    start_dt = tz.localize(
+        datetime.combine(appt.appointment_date, appt.appointment_time)
+    )
+    end_dt = start_dt + timedelta(minutes=doctor.avg_consult_minutes)
+
+    created = execute_calendar_request(
+        service.events().insert(
+            calendarId=calendar_id,
+            body=build_appointment_event(
+                doctor_email=doctor.email,
+                patient_name=appt.patient.name if appt.patient else "-",
+                patient_phone=appt.patient.phone if appt.patient else "-",
+                start_dt=start_dt,
+                end_dt=end_dt,
+            ),
+            sendUpdates="all",
+        ),
+        doctor_id=doctor.doctor_id,
+        operation="insert",
+    )
+
+    set_appointment_calendar_event_id(appointment_id, created["id"])
+
+
+def _repair(report: ReconciliationReport, action, *args, **kwargs):
+    try:
+        action(*args, **kwargs)
+        report.repaired += 1
+    except Exception:
+        report.repair_failures += 1
+        logger.exception(f"Reconciliation repair failed | doctor_id={report.doctor_id}")
+
+
+def _reconcile_window(
+    *,
+    report,
+    service,
+    doctor,
+    calendar_id,
+    window_start: date,
+    window_end: date,
+    page_size: int,
+    repair: bool,
+    tz,
+):
+    doctor_id = doctor.doctor_id
+
+    # event_id -> (appointment_id, date, "HH:MM") for this window only
+    expected = {}
+
+    for page in iter_booked_appointment_pages(
+        doctor_id=doctor_id,
+        start_date=window_start,
+        end_date=window_end,
+        page_size=page_size,
+    ):
+        for row in page:
+            report.appointments_checked += 1
+
+            if not row.calendar_event_id:
+                report.add(
+                    "no_event_id",
+                    appointment_id=str(row.appointment_id),
+                    date=row.appointment_date.isoformat(),
+                )
+                continue
+
+            expected[row.calendar_event_id] = (
+                row.appointment_id,
+                row.appointment_date,
+                row.appointment_time.strftime("%H:%M"),
+            )
+
+    time_min = tz.localize(datetime.combine(window_start, datetime.min.time()))
+    time_max = tz.localize(datetime.combine(window_end, datetime.min.time()))
+
+    for event in _iter_events(
+        service,
+        doctor_id=doctor_id,
+        calendar_id=calendar_id,
+        time_min=time_min,
+        time_max=time_max,
+    ):
+        if not is_app_event(event):
+            continue
+
+        slot = _event_slot(event, tz)
+        if not slot or not (window_start <= slot[0] < window_end):
+            # Overlaps the window but belongs to a neighbouring one
+            continue
+
+        report.events_checked += 1
+        match = expected.pop(event["id"], None)
+
+        if match is None:
+            # Its appointment may sit in another window (drifted event)
+            if get_appointment_by_event_id(event["id"]):
+                continue
+
+            report.add(
+                "orphan_event",
+                event_id=event["id"],
+                date=slot[0].isoformat(),
+                time=slot[1],
+            )
+            if repair:
+                _repair(
+                    report,
+                    execute_calendar_request,
+                    service.events().delete(
+                        calendarId=calendar_id,
+                        eventId=event["id"],
+                        sendUpdates="none",
+                    ),
+                    doctor_id=doctor_id,
+                    operation="delete",
+                )
+            continue
+
+        appointment_id, appt_date, appt_time = match
+        if slot != (appt_date, appt_time):
+            report.add(
+                "time_drift",
+                appointment_id=str(appointment_id),
+                event_id=event["id"],
+                db_slot=f"{appt_date} {appt_time}",
+                calendar_slot=f"{slot[0]} {slot[1]}",
+            )
+            if repair:
+                _repair(
+                    report,
+                    update_calendar_event,
+                    doctor_id=doctor_id,
+                    event_id=event["id"],
+                    new_date=appt_date.isoformat(),
+                    new_time=appt_time,
+                )
+
+    # Appointments whose event did not show up in this window
+    for event_id, (appointment_id, appt_date, appt_time) in expected.items():
+        event = _get_event(
+            service,
+            doctor_id=doctor_id,
+            calendar_id=calendar_id,
+            event_id=event_id,
+        )
+
+        if event is None:
+            report.add(
+                "missing_event",
+                appointment_id=str(appointment_id),
+                event_id=event_id,
+                date=appt_date.isoformat(),
+                time=appt_time,
+            )
+            if repair:
+                _repair(
+                    report,
+                    _recreate_event,
+                    service,
+                    doctor=doctor,
+                    calendar_id=calendar_id,
+                    appointment_id=appointment_id,
+                    tz=tz,
+                )
+            continue
+
+        slot = _event_slot(event, tz)
+        report.add(
+            "time_drift",
+            appointment_id=str(appointment_id),
+            event_id=event_id,
+            db_slot=f"{appt_date} {appt_time}",
+            calendar_slot=f"{slot[0]} {slot[1]}" if slot else None,
+        )
+        if repair:
+            _repair(
+                report,
+                update_calendar_event,
+                doctor_id=doctor_id,
+                event_id=event_id,
+                new_date=appt_date.isoformat(),
+                new_time=appt_time,
+            )
+
+
+def reconcile_doctor(
+    doctor_id,
+    *,
+    since: date | None = None,
+    until: date | None = None,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    repair: bool = False,
+) -> dict:
+    """
+    Reconcile one doctor's BOOKED appointments against their calendar
+    for dates in [since, until). Returns a report dict.
+    """
+    tz = pytz.timezone(TIMEZONE)
+    report = ReconciliationReport(doctor_id)
+
+    doctor = get_doctor_from_db(doctor_id)
+    if not doctor:
+        raise RuntimeError(f"Doctor {doctor_id} not found")
+
+    credentials = get_credentials_for_doctor(doctor_id)
+    if not credentials:
+        raise RuntimeError("Doctor calendar is not connected")
+
+    calendar_id = get_calendar_id_for_doctor(doctor_id)
+    service = build_calendar_service(credentials)
+
+    since = since or datetime.now(tz).date()
+    if until is None:
+        last_booked = get_last_booked_date_for_doctor(doctor_id)
+        until = since + timedelta(days=window_days)
+        if last_booked and last_booked >= until:
+            until = last_booked + timedelta(days=1)
+
+    window_start = since
+    while window_start < until:
+        window_end = min(window_start + timedelta(days=window_days), until)
+
+        _reconcile_window(
+            report=report,
+            service=service,
+            doctor=doctor,
+            calendar_id=calendar_id,
+            window_start=window_start,
+            window_end=window_end,
+            page_size=page_size,
+            repair=repair,
+            tz=tz,
+        )
+
+        window_start = window_end
+
+    logger.info(
+        f"Reconciliation done | doctor_id={doctor_id} | "
+        f"appointments={report.appointments_checked} | "
+        f"events={report.events_checked} | mismatches={report.counts} | "
+        f"repaired={report.repaired}"
+    )
+
+    return report.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile appointments with Google Calendar")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--doctor-id", action="append", type=uuid.UUID, help="Doctor UUID (repeatable)")
+    target.add_argument("--all", action="store_true", help="Every doctor with a connected calendar")
+    parser.add_argument("--since", type=date.fromisoformat, help="First date (default: today)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last date, exclusive")
+    parser.add_argument("--window-days", type=int, default=DEFAULT_WINDOW_DAYS)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--repair", action="store_true", help="Fix mismatches (DB wins)")
+    args = parser.parse_args()
+
+    doctor_ids = args.doctor_id or get_calendar_connected_doctor_ids()
+
+    for doctor_id in doctor_ids:
+        try:
+            report = reconcile_doctor(
+                doctor_id,
+                since=args.since,
+                until=args.until,
+                window_days=args.window_days,
+                page_size=args.page_size,
+                repair=args.repair,
+            )
+        except Exception as e:
+            logger.exception(f"Reconciliation failed | doctor_id={doctor_id}")
+            report = {"doctor_id": str(doctor_id), "error": str(e)}
+
+        print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# services/state_store.py
+
+"""
+Where per-conversation state lives between requests.
+
+Web booking sessions (channel.web), WhatsApp sessions (channel.whatsapp)
+and dashboard logins (main.doctor_sessions) each get a StateStore from
+create_state_store(). The backend is picked by STATE_STORE:
+
+- memory    (default) live objects in this process; one uvicorn worker
+            only, and a restart forgets every conversation
+- database  serialized rows in conversation_state (UNLOGGED on
+            PostgreSQL), shared by every worker and node and kept
+            across deploys
+
+Neither keeps a state forever. Each store has an idle TTL
+(STATE_STORE_IDLE_TTL_SECONDS unless the store sets its own), and
+sweep_idle_states(), run periodically by main, drops what has been idle
+longer. The memory backend also caps entries per store
+(STATE_STORE_MAX_ENTRIES) and evicts the least recently active one when
+full. Idle time is since the last access on both backends. A channel
+that finds no state starts the conversation over.
+
+Handlers change state inside edit():
+
+    with state_store.edit(session_id, BookingState) as state:
+        state.intent = "BOOK"
+
+The database backend writes the row back on exit only if the
+serialized state differs from what was read, so turns that change
+nothing (most greetings, invalid answers) cost one primary-key read.
+Such reads keep the row alive with a timestamp-only UPDATE, at most
+once per STATE_STORE_TOUCH_FRACTION of the idle TTL.
+Two workers editing the same key at the same time: the last one to
+finish wins (a conversation is one person typing, so this is rare).
+
+Metrics:
+- state_store_writes_total{namespace, result=written|unchanged|touched}
+- state_store_evictions_total{namespace, reason=idle|capacity}
+- state_store_sessions{namespace} (memory backend)
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable
+
+from cachetools import TTLCache
+
+from db.repository import (
+    delete_conversation_state,
+    delete_idle_conversation_states,
+    load_conversation_state,
+    save_conversation_state,
+    touch_conversation_state,
+)
+from services import metrics
+
+
+STATE_STORE_BACKEND = os.getenv("STATE_STORE", "memory")
+
+STATE_STORE_IDLE_TTL_SECONDS = float(os.getenv("STATE_STORE_IDLE_TTL_SECONDS", "7200"))
+STATE_STORE_MAX_ENTRIES = int(os.getenv("STATE_STORE_MAX_ENTRIES", "50000"))
+# Database backend: an unchanged state older than this share of the idle
+# TTL gets its updated_at refreshed
+STATE_STORE_TOUCH_FRACTION = float(os.getenv("STATE_STORE_TOUCH_FRACTION", "0.25"))
+
+
+class StateStore(ABC):
+    """key -> state for one namespace ("web", "whatsapp", ...)."""
+
+    namespace: str
+    idle_ttl: float
+
+    # True when calls do I/O; async handlers run them in a thread
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str):
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def edit(self, key: str, factory: Callable[[], object] | None = None):
+        """
+        Context manager yielding the state for key (created with
+        factory() when missing and a factory is given, else None) and
+        storing it back on exit if it changed. Nothing is stored if the
+        block raises, or if the state is None (factory() may return None).
+        """
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Drop states idle longer than idle_ttl; returns how many."""
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+
+class _IdleCache(TTLCache):
+    """TTLCache counting what it drops, by reason."""
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.namespace = namespace
+
+    def popitem(self):
+        # Full: the least recently active entry goes
+        item = super().popitem()
+        metrics.inc("state_store_evictions_total", namespace=self.namespace, reason="capacity")
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        if expired:
+            metrics.inc(
+                "state_store_evictions_total", len(expired),
+                namespace=self.namespace, reason="idle",
+            )
+        return expired
+
+
+class MemoryStateStore(StateStore):
+    """
+    Live objects, LRU-bounded, each dropped after idle_ttl seconds
+    without a get / set / edit. Edits are visible immediately.
+    """
+
+    def __init__(self, namespace: str, *, idle_ttl: float, max_entries: int):
+        self.namespace = namespace
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._states = _IdleCache(namespace, max_entries, idle_ttl)
+
+    def get(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                # Re-inserting restarts the idle clock
+                self._states[key] = state
+            return state
+
+    def set(self, key, value):
+        with self._lock:
+            self._states[key] = value
+
+    def delete(self, key):
+        with self._lock:
+            self._states.pop(key, None)
+
+    @contextmanager
+    def edit(self, key, factory=None):
+        state = self.get(key)
+        if state is None and factory is not None:
+            state = factory()
+
+        yield state
+
+        if state is not None:
+            # Also brings back a state evicted while the turn ran
+            self.set(key, state)
+
+    def sweep(self):
+        with self._lock:
+            return len(self._states.expire())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._states)
+
+
+class DatabaseStateStore(StateStore):
+    """
+    One conversation_state row per key, holding dump(state) bytes.
+    load(bytes) must give back an equal state, or None for data it no
+    longer understands (treated like a missing key).
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        dump: Callable[[object], bytes],
+        load: Callable[[bytes], object],
+        idle_ttl: float,
+    ):
+        self.namespace = namespace
+        self.dump = dump
+        self.load = load
+        self.idle_ttl = idle_ttl
+
+    def _read(self, key) -> tuple[bytes | None, bool]:
+        """(stored bytes or None, whether the row's idle clock is due a touch)."""
+        row = load_conversation_state(self.namespace, key)
+        if row is None:
+            return None, False
+
+        data, updated_at = row
+        touch_after = timedelta(seconds=self.idle_ttl * STATE_STORE_TOUCH_FRACTION)
+        return data, updated_at is None or datetime.utcnow() - updated_at >= touch_after
+
+    def _touch(self, key) -> None:
+        touch_conversation_state(self.namespace, key)
+        metrics.inc("state_store_writes_total", namespace=self.namespace, result="touched")
+
+    def get(self, key):
+        data, stale = self._read(key)
+        if stale:
+            self._touch(key)
+        return self.load(data) if data is not None else None
+
+    def set(self, key, value):
+        save_conversation_state(self.namespace, key, self.dump(value))
+        metrics.inc("state_store_writes_total", namespace=self.namespace, result="written")
+
+    def delete(self, key):
+        delete_conversation_state(self.namespace, key)
+
+    @contextmanager
+    def edit(self, key, factory=None):
+        before, stale = self._read(key)
+        # load() may also give None (a state it can't read any more)
+        state = self.load(before) if before is not None else None
+        if state is None and factory is not None:
+            state = factory()
+
+        yield state
+
+        after = self.dump(state) if state is not None else None
+        if after is None or after == before:
+            if after is not None:
+                metrics.inc("state_store_writes_total", namespace=self.namespace, result="unchanged")
+            # Still activity: keep the row from being swept as idle
+            if stale:
+                self._touch(key)
+            return
+
+        save_conversation_state(self.namespace, key, after)
+        metrics.inc("state_store_writes_total", namespace=self.namespace, result="written")
+
+    def sweep(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.idle_ttl)
+        removed = delete_idle_conversation_states(self.namespace, cutoff)
+        if removed:
+            metrics.inc("state_store_evictions_total", removed, namespace=self.namespace, reason="idle")
+        return removed
+
+
+_stores: list[StateStore] = []
+
+
+def create_state_store(
+    namespace: str,
+    *,
+    dump: Callable[[object], bytes],
+    load: Callable[[bytes], object],
+    idle_ttl: float | None = None,
+) -> StateStore:
+    """
+    Store for namespace on the configured backend. dump / load are
+    only used by backends that serialize.
+    """
+    idle_ttl = idle_ttl or STATE_STORE_IDLE_TTL_SECONDS
+
+    if STATE_STORE_BACKEND == "memory":
+        store = MemoryStateStore(namespace, idle_ttl=idle_ttl, max_entries=STATE_STORE_MAX_ENTRIES)
+    elif STATE_STORE_BACKEND == "database":
+        store = DatabaseStateStore(namespace, dump=dump, load=load, idle_ttl=idle_ttl)
+    else:
+        raise RuntimeError(f"Unknown STATE_STORE {STATE_STORE_BACKEND!r} (memory | database)")
+
+    _stores.append(store)
+    return store
+
+
+def sweep_idle_states() -> int:
+    """Sweep every store (blocking for the database backend)."""
+    return sum(store.sweep() for store in list(_stores))
+
+
+def _collect_state_store_metrics():
+    for store in list(_stores):
+        if isinstance(store, MemoryStateStore):
+            metrics.set_gauge("state_store_sessions", len(store), namespace=store.namespace)
+
+
+metrics.register_collector(_collect_state_store_metrics)
@@ -0,0 +1,36 @@
+# services/turn_events.py
+
+"""
+Progress events from inside an agent turn.
+
+The streaming chat endpoint (/chat/stream) installs a publisher for
+the turn; anything running in it (agent, tools, on whichever thread)
+can then push an event to the patient while the turn is still going,
+e.g. a status line before a slow calendar call. Outside a streaming
+turn (plain /chat, WhatsApp, jobs) publish() does nothing.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+
+_publisher: ContextVar[Callable[[str, dict], None] | None] = ContextVar(
+    "turn_event_publisher", default=None
+)
+
+
+@contextmanager
+def publishing_to(publisher: Callable[[str, dict], None]):
+    """Send publish() calls made inside the block to publisher(event, data)."""
+    token = _publisher.set(publisher)
+    try:
+        yield
+    finally:
+        _publisher.reset(token)
+
+
+def publish(event: str, **data) -> None:
+    publisher = _publisher.get()
+    if publisher is not None:
+        publisher(event, data)
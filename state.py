@@ -1,6 +1,10 @@
 # state.py
 
+import json
+import uuid
+from datetime import date, time
 from enum import Enum, auto
+from typing import NamedTuple
 
 
 class FlowStage(Enum):
@@ -32,7 +36,54 @@ class FlowStage(Enum):
     CHANGE_CHOICE = auto()  # for changing date/time during confirm stages
 
 
+class CandidateAppointment(NamedTuple):
+    """
+    What a cancel / reschedule flow keeps of an appointment it offered,
+    for as long as the conversation waits for the patient's choice.
+    """
+
+    appointment_id: uuid.UUID
+    appointment_date: date
+    appointment_time: time
+    calendar_event_id: str | None
+
+    @classmethod
+    def from_rows(cls, rows) -> tuple["CandidateAppointment", ...]:
+        """From get_active_appointments_by_phone() rows."""
+        return tuple(
+            cls(r.appointment_id, r.appointment_date, r.appointment_time, r.calendar_event_id)
+            for r in rows
+        )
+
+
 class BookingState:
+    # Tens of thousands of these sit idle in the state store: no
+    # per-instance __dict__. A new attribute must be added here too.
+    __slots__ = (
+        "intent",
+        "stage",
+        "doctor_id",
+        "doctor_name",
+        "date",
+        "time",
+        "patient_name",
+        "patient_phone",
+        "candidate_appointments",
+        "selected_appointment_id",
+        "reschedule_date",
+        "reschedule_time",
+        "last_appointment_id",
+        "last_event_id",
+        "last_doctor_id",
+        "last_date",
+        "last_time",
+        "last_patient_name",
+        "last_patient_phone",
+        "greeted",
+        "pending_intent_switch",
+        "_reschedule_initialized",
+    )
+
     def __init__(self):
         # ------------------
         # Conversation control
@@ -57,7 +108,7 @@ class BookingState:
         # ------------------
         # Cancellation / Reschedule data
         # ------------------
-        self.candidate_appointments = None      # list[Appointment]
+        self.candidate_appointments: tuple[CandidateAppointment, ...] | None = None
         self.selected_appointment_id = None
 
         # Reschedule-specific
@@ -131,3 +182,95 @@ class BookingState:
 
     def is_done(self) -> bool:
         return self.stage == FlowStage.IDLE
+
+
+# -------------------------------------------------
+# Serialization (services.state_store database backend)
+# -------------------------------------------------
+#
+# A BookingState is a JSON list, not an object: a format version, then
+# one value per slot in __slots__ order (stage as its number, candidate
+# appointments as [id, date, time, event id] lists). Other non-JSON
+# values are tagged: {"$uuid": ...}, {"$date": ...}, {"$time": ...}.
+# A state stored by another version loads as None, which the channels
+# treat as a session that has to start again.
+
+STATE_FORMAT_VERSION = 1
+
+
+def _encode(value):
+    if isinstance(value, BookingState):
+        return {"$state": _state_values(value)}
+    if isinstance(value, uuid.UUID):
+        return {"$uuid": str(value)}
+    if isinstance(value, time):
+        return {"$time": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Can't serialize {type(value).__name__} in conversation state")
+
+
+def _state_values(state: BookingState) -> list:
+    values = [STATE_FORMAT_VERSION]
+    for name in BookingState.__slots__:
+        value = getattr(state, name)
+        if name == "stage":
+            value = value.value
+        elif name == "candidate_appointments" and value is not None:
+            value = [
+                [str(a.appointment_id), a.appointment_date.isoformat(),
+                 a.appointment_time.isoformat(), a.calendar_event_id]
+                for a in value
+            ]
+        values.append(value)
+    return values
+
+
+def _load_booking_state(values: list) -> BookingState | None:
+    if not isinstance(values, list) or values[0] != STATE_FORMAT_VERSION:
+        return None
+
+    state = BookingState()
+    for name, value in zip(BookingState.__slots__, values[1:]):
+        if name == "stage":
+            value = FlowStage(value)
+        elif name == "candidate_appointments" and value is not None:
+            value = tuple(
+                CandidateAppointment(
+                    uuid.UUID(appointment_id),
+                    date.fromisoformat(appointment_date),
+                    time.fromisoformat(appointment_time),
+                    calendar_event_id,
+                )
+                for appointment_id, appointment_date, appointment_time, calendar_event_id in value
+            )
+        setattr(state, name, value)
+    return state
+
+
+_DECODERS = {
+    "$state": _load_booking_state,
+    "$uuid": uuid.UUID,
+    "$time": time.fromisoformat,
+    "$date": date.fromisoformat,
+}
+
+
+def _decode(obj: dict):
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag in _DECODERS:
+            return _DECODERS[tag](value)
+    return obj
+
+
+def dump_state(value) -> bytes:
+    """
+    Serialize a BookingState (or plain JSON data holding some).
+    Deterministic, so equal states give equal bytes.
+    """
+    return json.dumps(value, default=_encode, sort_keys=True, separators=(",", ":")).encode()
+
+
+def load_state(data: bytes):
+    return json.loads(data, object_hook=_decode)
@@ -53,11 +53,73 @@ async function ensureLoggedIn() {
 }
 
   // -----------------------------
-  // Load appointments
+  // Load appointments (keyset pages, next page on scroll)
   // -----------------------------
-  async function loadAppointments() {
+  const PAGE_SIZE = 50;
+  const sentinel = document.getElementById("appointmentsSentinel");
+  let nextCursor = null;
+  let loadingPage = false;
+  let listGeneration = 0;   // bumps on reload; stale pages are dropped
+
+  function renderAppointmentRow(a) {
+    const isBooked = a.status === "BOOKED";
+    const statusClass = a.status.toLowerCase();
+
+    const row = document.createElement("tr");
+    row.innerHTML = `
+      <td>${a.date}</td>
+      <td>${a.time}</td>
+      <td>${a.patient_name || "-"}</td>
+      <td>${a.patient_phone || "-"}</td>
+      <td><span class="status-badge ${statusClass}">${a.status}</span></td>
+      <td>
+        <div class="action-buttons">
+          <button 
+            class="btn cancel-btn" 
+            data-id="${a.appointment_id}"
+            data-date="${a.date}"
+            data-time="${a.time}"
+            data-patient="${a.patient_name || 'No patient'}"
+            data-phone="${a.patient_phone || '-'}"
+            ${!isBooked ? "disabled" : ""}>
+            Cancel
+          </button>
+          <button 
+            class="btn reschedule-btn" 
+            data-id="${a.appointment_id}"
+            data-date="${a.date}"
+            data-time="${a.time}"
+            data-patient="${a.patient_name || 'No patient'}"
+            data-phone="${a.patient_phone || '-'}"
+            ${!isBooked ? "disabled" : ""}>
+            Reschedule
+          </button>
+        </div>
+      </td>
+    `;
+    return row;
+  }
+
+  function sentinelInView() {
+    if (!sentinel) return false;
+    return sentinel.getBoundingClientRect().top < window.innerHeight + 200;
+  }
+
+  // reset = true reloads from the first page (after cancel / reschedule)
+  async function loadAppointments({ reset = true } = {}) {
+    if (!reset && (loadingPage || !nextCursor)) return;
+    if (reset) {
+      listGeneration++;
+      nextCursor = null;
+    }
+    const generation = listGeneration;
+    loadingPage = true;
+
     try {
-      const res = await fetch("/api/doctor/appointments", {
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      if (!reset) params.set("cursor", nextCursor);
+
+      const res = await fetch(`/api/doctor/appointments?${params}`, {
         credentials: "include"
       });
 
@@ -70,9 +132,11 @@ async function ensureLoggedIn() {
       }
 
       const data = await res.json();
+      if (generation !== listGeneration) return;
+
       const tbody = document.getElementById("appointments");
 
-      if (data.length === 0) {
+      if (reset && data.items.length === 0) {
         tbody.innerHTML = `
           <tr>
             <td colspan="6" class="empty-state">
@@ -84,52 +148,32 @@ async function ensureLoggedIn() {
         return;
       }
 
-      tbody.innerHTML = "";
-
-      data.forEach(a => {
-        const isBooked = a.status === "BOOKED";
-        const statusClass = a.status.toLowerCase();
-
-        const row = document.createElement("tr");
-        row.innerHTML = `
-          <td>${a.date}</td>
-          <td>${a.time}</td>
-          <td>${a.patient_name || "-"}</td>
-          <td>${a.patient_phone || "-"}</td>
-          <td><span class="status-badge ${statusClass}">${a.status}</span></td>
-          <td>
-            <div class="action-buttons">
-              <button 
-                class="btn cancel-btn" 
-                data-id="${a.appointment_id}"
-                data-date="${a.date}"
-                data-time="${a.time}"
-                data-patient="${a.patient_name || 'No patient'}"
-                data-phone="${a.patient_phone || '-'}"
-                ${!isBooked ? "disabled" : ""}>
-                Cancel
-              </button>
-              <button 
-                class="btn reschedule-btn" 
-                data-id="${a.appointment_id}"
-                data-date="${a.date}"
-                data-time="${a.time}"
-                data-patient="${a.patient_name || 'No patient'}"
-                data-phone="${a.patient_phone || '-'}"
-                ${!isBooked ? "disabled" : ""}>
-                Reschedule
-              </button>
-            </div>
-          </td>
-        `;
-        tbody.appendChild(row);
-      });
+      if (reset) tbody.innerHTML = "";
+
+      data.items.forEach(a => tbody.appendChild(renderAppointmentRow(a)));
+      nextCursor = data.next_cursor;
     } catch (error) {
       console.error("Error loading appointments:", error);
       showAlert("Failed to load appointments. Please try again.", "error");
+    } finally {
+      if (generation === listGeneration) {
+        loadingPage = false;
+        // Short pages may leave the sentinel on screen: keep filling
+        if (nextCursor && sentinelInView()) {
+          loadAppointments({ reset: false });
+        }
+      }
     }
   }
 
+  if (sentinel && "IntersectionObserver" in window) {
+    new IntersectionObserver(entries => {
+      if (entries.some(entry => entry.isIntersecting)) {
+        loadAppointments({ reset: false });
+      }
+    }, { rootMargin: "200px" }).observe(sentinel);
+  }
+
   // -----------------------------
   // Modal helpers
   // -----------------------------
@@ -1,5 +1,83 @@
+function addBotLine(chatBox, className) {
+    const p = document.createElement("p");
+    p.className = className || "bot";
+    p.innerHTML = "<b>Bot:</b> ";
+    const text = document.createElement("span");
+    text.style.whiteSpace = "pre-line";
+    p.appendChild(text);
+    chatBox.appendChild(p);
+    chatBox.scrollTop = chatBox.scrollHeight;
+    return text;
+}
+
+// Server-sent events over a POST body (EventSource can only GET)
+async function readEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) return;
+        buffer += decoder.decode(value, { stream: true });
+
+        let end;
+        while ((end = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+
+            let event = "message";
+            let data = "";
+            for (const line of block.split("\n")) {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            }
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
 
+async function sendMessageStreaming(text, chatBox) {
+    const response = await fetch("/chat/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        credentials: "include",
+        body: JSON.stringify({ message: text, doctor_slug: DOCTOR_SLUG }),
+    });
 
+    if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        addBotLine(chatBox).textContent = `❌ ${data.detail || "Error connecting to server"}`;
+        return;
+    }
+
+    let typing = null;
+    let reply = null;
+
+    await readEvents(response, (event, data) => {
+        if (event === "typing") {
+            typing = addBotLine(chatBox, "bot typing");
+            typing.textContent = "…";
+        } else if (event === "status") {
+            // Progress from the turn, shown in the typing line
+            if (typing) typing.textContent = data.text;
+        } else if (event === "delta") {
+            if (typing) {
+                typing.parentElement.remove();
+                typing = null;
+            }
+            if (!reply) reply = addBotLine(chatBox);
+            reply.textContent += data.text;
+        } else if (event === "error") {
+            if (typing) typing.parentElement.remove();
+            typing = null;
+            addBotLine(chatBox).textContent = `❌ ${data.detail}`;
+        }
+        chatBox.scrollTop = chatBox.scrollHeight;
+    });
+
+    if (typing) typing.parentElement.remove();
+}
 
 async function sendMessage() {
     const input = document.getElementById("message");
@@ -15,6 +93,11 @@ async function sendMessage() {
     input.value = "";
 
     try {
+        if (window.ReadableStream && window.TextDecoder) {
+            await sendMessageStreaming(text, chatBox);
+            return;
+        }
+
         const response = await fetch("/chat", {
             method: "POST",
             headers: {
@@ -23,8 +106,9 @@ async function sendMessage() {
             },
             credentials:"include",
             body: JSON.stringify({
-                
-                message: text                
+
+                message: text,
+                doctor_slug: DOCTOR_SLUG
             }),
         });
 
@@ -1,30 +1,39 @@
 from datetime import datetime, timedelta
+import logging
 import pytz
 import os
+from googleapiclient.errors import HttpError
 
-from calendar_oauth import build_calendar_service
+from calendar_oauth import build_calendar_service, new_calendar_batch
 from auth_store import oauth_store
 
 # LEGACY (fallback only – do not add new logic here)
 from doctor_config import DOCTORS, DEFAULT_DOCTOR_ID
 from sqlalchemy import false, select
-from db.database import SessionLocal
-from db.models import DoctorCalendarCredential
+from db.database import primary_reads, read_session_scope, session_scope
+from db.models import AppointmentStatus, DoctorCalendarCredential
 from services.notification_service import notify_doctor_via_whatsapp
+from services.calendar_client import execute_calendar_request, CalendarUnavailable
+from services import turn_events
 
 
 
 from db.repository import (
-    create_patient,
+    slot_taken_query,
+    upsert_patient,
     create_appointment,
     get_appointment_by_event_id,
     cancel_appointment_db,
     reschedule_appointment_db,
     get_doctor_by_id,
     get_appointment_by_id,
-    get_doctor_by_id
+    get_doctor_by_id,
+    get_booked_appointments_in_range,
+    bulk_cancel_appointments_db,
 )
 
+logger = logging.getLogger("medschedule")
+
 TIMEZONE = "Asia/Kolkata"
 DISABLE_CALENDAR = os.getenv("DISABLE_CALENDAR", "false").lower() == "true"
 
@@ -82,28 +91,21 @@ def _get_doctor(doctor_id: str):
 # ------------------------------------------------------------------
 def get_doctor_from_db(doctor_id):
     """
-    DB-first doctor fetch.
+    DB-first doctor fetch (cached snapshot, see db.doctor_cache).
     Returns None if not found or DB error.
     """
-    db = None
     try:
-        from db.database import SessionLocal
-        from db.models import Doctor
-
-        db = SessionLocal()
-        return db.get(Doctor, doctor_id)
+        with session_scope() as db:
+            return get_doctor_by_id(db, doctor_id)
     except Exception:
         return None
-    finally:
-        if db:
-            db.close()
 
 
 # ------------------------------------------------------------------
 # Phase 6.6.3 – DB-first calendar identity (SAFE)
 # ------------------------------------------------------------------
 def get_calendar_id_for_doctor(doctor_id):
-    with SessionLocal() as db:
+    with session_scope() as db:
         creds = db.execute(
             select(DoctorCalendarCredential).where(
                 DoctorCalendarCredential.doctor_id == doctor_id
@@ -129,28 +131,19 @@ def check_availability_db(
     """
     DB-only availability check.
     Returns True if slot is free, False if overlap exists.
-    Never touches Google Calendar.
+    Never touches Google Calendar. Reads the replica when configured;
+    wrap in primary_reads() where a lagging answer is not acceptable.
     """
 
-    from db.database import SessionLocal
-    from db.models import Appointment
-
-    db = SessionLocal()
-    try:
-        q = db.query(Appointment).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.appointment_date == datetime.strptime(date_str, "%Y-%m-%d").date(),
-            Appointment.appointment_time == datetime.strptime(time_str, "%H:%M").time(),
-            Appointment.status == "BOOKED",
-        )
-
-        if exclude_appointment_id:
-            q = q.filter(Appointment.appointment_id != exclude_appointment_id)
-
-        return not db.query(q.exists()).scalar()
+    stmt, params = slot_taken_query(
+        doctor_id,
+        datetime.strptime(date_str, "%Y-%m-%d").date(),
+        datetime.strptime(time_str, "%H:%M").time(),
+        exclude_appointment_id=exclude_appointment_id,
+    )
 
-    finally:
-        db.close()
+    with read_session_scope() as db:
+        return db.execute(stmt, params).first() is None
 
 
 
@@ -175,6 +168,60 @@ def check_availability(
         return False
 
 
+# ------------------------------------------------------------------
+# Calendar event body (shared by booking and reconciliation)
+# ------------------------------------------------------------------
+EVENT_SOURCE = "medschedule"
+
+
+def build_appointment_event(
+    *,
+    doctor_email,
+    patient_name,
+    patient_phone,
+    start_dt,
+    end_dt,
+):
+    return {
+        "summary": f"New Appointment – {patient_name}",
+        "description": (
+            f"Patient Name: {patient_name}\n"
+            f"Phone: {patient_phone}\n\n"
+            f"Booked via MedSchedule AI"
+        ),
+        "start": {
+            "dateTime": start_dt.isoformat(),
+            "timeZone": TIMEZONE,
+        },
+        "end": {
+            "dateTime": end_dt.isoformat(),
+            "timeZone": TIMEZONE,
+        },
+        "attendees": [
+            {"email": doctor_email}
+        ],
+        "reminders": {
+            "useDefault": False,
+            "overrides": [
+                { "method": "popup", "minutes": 30 }
+            ]
+        },
+        # Lets reconciliation tell our events from the doctor's own
+        "extendedProperties": {
+            "private": {"source": EVENT_SOURCE}
+        },
+    }
+
+
+def is_app_event(event) -> bool:
+    """True for events this app created."""
+    private = event.get("extendedProperties", {}).get("private", {})
+    if private.get("source") == EVENT_SOURCE:
+        return True
+    # Events created before the marker existed
+    return "Booked via MedSchedule AI" in (event.get("description") or "")
+
+
 # ------------------------------------------------------------------
 # Booking (calendar now DB-first, logic unchanged otherwise)
 # ------------------------------------------------------------------
@@ -182,18 +229,15 @@ def book_appointment(date_str, time_str, doctor_id, patient_name, patient_phone)
     if not doctor_id:
         raise ValueError("Doctor context missing during booking")
 
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         doctor_db = get_doctor_by_id(db,doctor_id)
         if not doctor_db:
             raise ValueError("Doctor not found during booking")
 
-        # ✅ ALWAYS create a new patient
-        patient = create_patient(
-            db,
-            name=patient_name,
-            phone=patient_phone
-        )
+        # The slot was checked turns ago, possibly on the replica
+        with primary_reads():
+            if not check_availability_db(date_str, time_str, doctor_id):
+                raise ValueError("That time slot was just taken")
 
         # ❗ Calendar creation is MANDATORY
         if DISABLE_CALENDAR:
@@ -219,64 +263,76 @@ def book_appointment(date_str, time_str, doctor_id, patient_name, patient_phone)
 
         calendar_id = get_calendar_id_for_doctor(doctor_id)
 
-        event = {
-            "summary": f"New Appointment – {patient_name}",
-            "description": (
-                f"Patient Name: {patient_name}\n"
-                f"Phone: {patient_phone}\n\n"
-                f"Booked via MedSchedule AI"
-            ),
-            "start": {
-                "dateTime": start_dt.isoformat(),
-                "timeZone": TIMEZONE,
-            },
-            "end": {
-                "dateTime": end_dt.isoformat(),
-                "timeZone": TIMEZONE,
-            },
-            "attendees": [
-                {"email": doctor_db.email}
-            ],
-           "reminders": {
-            "useDefault": False,
-            "overrides": [
-                { "method": "popup", "minutes": 30 }
-            ]
-        }
-    }
+        event = build_appointment_event(
+            doctor_email=doctor_db.email,
+            patient_name=patient_name,
+            patient_phone=patient_phone,
+            start_dt=start_dt,
+            end_dt=end_dt,
+        )
 
+        # End the read transaction: the connection goes back to the pool
+        # while Google is called, instead of sitting idle in transaction
+        db.commit()
 
+        turn_events.publish("status", text="📅 Adding your appointment to the doctor's calendar…")
 
-        created = service.events().insert(
-            calendarId=calendar_id,
-            body=event,
-            sendUpdates="all"
-        ).execute()
+        created = execute_calendar_request(
+            service.events().insert(
+                calendarId=calendar_id,
+                body=event,
+                sendUpdates="all"
+            ),
+            doctor_id=doctor_id,
+            operation="insert",
+        )
 
 
         event_id = created["id"]
 
-        appt = create_appointment(
-            db,
-            doctor_id=doctor_db.doctor_id,
-            patient_id=patient.patient_id,
-            appointment_date=datetime.strptime(date_str, "%Y-%m-%d").date(),
-            appointment_time=datetime.strptime(time_str, "%H:%M").time(),
-            status="BOOKED",
-            calendar_event_id=event_id,
-        )
+        try:
+            # ✅ One patient per phone (upsert). Done after the calendar
+            # call so the patient row is locked only until the commit below
+            patient = upsert_patient(
+                db,
+                name=patient_name,
+                phone=patient_phone
+            )
 
-        if not appt or not appt.calendar_event_id:
-            # rollback calendar event
-            service.events().delete(
-                calendarId=calendar_id,
-                eventId=appt.calendar_event_id,
-                sendUpdates="all"
-            ).execute()
+            appt = create_appointment(
+                db,
+                doctor_id=doctor_db.doctor_id,
+                patient_id=patient.patient_id,
+                appointment_date=datetime.strptime(date_str, "%Y-%m-%d").date(),
+                appointment_time=datetime.strptime(time_str, "%H:%M").time(),
+                status=AppointmentStatus.BOOKED,
+                calendar_event_id=event_id,
+            )
 
-            raise RuntimeError("Appointment creation failed after calendar event creation")
+            if not appt or not appt.calendar_event_id:
+                raise RuntimeError("Appointment creation failed after calendar event creation")
 
-        db.commit()
+            db.commit()
+
+        except Exception:
+            # rollback calendar event (best effort; the reconciliation
+            # job picks up anything left behind)
+            try:
+                execute_calendar_request(
+                    service.events().delete(
+                        calendarId=calendar_id,
+                        eventId=event_id,
+                        sendUpdates="all"
+                    ),
+                    doctor_id=doctor_id,
+                    operation="delete",
+                )
+            except Exception:
+                logger.exception(
+                    f"Orphan calendar event left behind | doctor_id={doctor_id} | "
+                    f"event_id={event_id}"
+                )
+            raise
 
         
         # 🔔 Doctor Notification (Safe, Non-Blocking)
@@ -301,13 +357,6 @@ def book_appointment(date_str, time_str, doctor_id, patient_name, patient_phone)
             "time": time_str,
         }
 
-    except Exception:
-        db.rollback()
-        raise
-
-    finally:
-        db.close()
-
 # ------------------------------------------------------------------
 # Cancel (calendar deletion now DB-first)
 # ------------------------------------------------------------------
@@ -323,36 +372,172 @@ def cancel_appointment(event_id: str, doctor_id: str):
 # ------------------------------------------------------------------
 # Phase 6.5 – DB-first cancellation (UNCHANGED)
 # ------------------------------------------------------------------
-def cancel_appointment_by_id(appointment_id, doctor_id):
-    appt = get_appointment_by_id(appointment_id)
-    if not appt:
+def delete_appointment_event(doctor_id, event_id: str | None) -> None:
+    """
+    Delete one appointment's calendar event.
+    Calendar side only; the caller cancels the DB row afterwards.
+    """
+    if DISABLE_CALENDAR or not event_id:
         return
 
-    # 1️⃣ Delete from Google Calendar FIRST (if applicable)
-    if not DISABLE_CALENDAR and appt.calendar_event_id:
-        credentials = get_credentials_for_doctor(doctor_id)
-        if not credentials:
-            raise RuntimeError("Doctor calendar is not connected")
+    credentials = get_credentials_for_doctor(doctor_id)
+    if not credentials:
+        raise RuntimeError("Doctor calendar is not connected")
 
-        calendar_id = get_calendar_id_for_doctor(doctor_id)
-        service = build_calendar_service(credentials)
+    calendar_id = get_calendar_id_for_doctor(doctor_id)
+    service = build_calendar_service(credentials)
 
-        try:
+    turn_events.publish("status", text="📅 Removing the appointment from the doctor's calendar…")
+
+    try:
+        execute_calendar_request(
             service.events().delete(
                 calendarId=calendar_id,
-                eventId=appt.calendar_event_id,
+                eventId=event_id,
                 sendUpdates="all"
-            ).execute()
-        except Exception as e:
-            raise RuntimeError(
-                f"Failed to delete calendar event: {str(e)}"
-            )
+            ),
+            doctor_id=doctor_id,
+            operation="delete",
+        )
+    except CalendarUnavailable:
+        raise
+    except Exception as e:
+        raise RuntimeError(
+            f"Failed to delete calendar event: {str(e)}"
+        )
+
+
+def cancel_appointment_by_id(appointment_id, doctor_id):
+    appt = get_appointment_by_id(appointment_id)
+    if not appt:
+        return
+
+    # 1️⃣ Delete from Google Calendar FIRST (if applicable)
+    delete_appointment_event(doctor_id, appt.calendar_event_id)
 
     # 2️⃣ ALWAYS cancel in DB (only if calendar delete succeeded or was not needed)
     cancel_appointment_db(appointment_id)
 
 
 
+# ------------------------------------------------------------------
+# Bulk cancellation (doctor unavailable for a day / range)
+# ------------------------------------------------------------------
+CALENDAR_BATCH_SIZE = 50  # Google's recommended max per batch
+
+
+def delete_calendar_events_batch(doctor_id, event_ids: list[str]) -> dict:
+    """
+    Delete many events of one doctor using Google batch requests.
+    Returns event_id -> error message (None when deleted).
+    Events that are already gone (404 / 410) count as deleted.
+    """
+    event_ids = list(dict.fromkeys(event_ids))
+    results = {event_id: "calendar_unavailable" for event_id in event_ids}
+    if not event_ids:
+        return results
+
+    credentials = get_credentials_for_doctor(doctor_id)
+    if not credentials:
+        raise RuntimeError("Doctor calendar is not connected")
+
+    calendar_id = get_calendar_id_for_doctor(doctor_id)
+    service = build_calendar_service(credentials)
+
+    def on_response(request_id, response, exception):
+        if exception is None or (
+            isinstance(exception, HttpError) and exception.resp.status in (404, 410)
+        ):
+            results[request_id] = None
+        else:
+            results[request_id] = str(exception)
+
+    for start in range(0, len(event_ids), CALENDAR_BATCH_SIZE):
+        batch = new_calendar_batch(service, callback=on_response)
+
+        for event_id in event_ids[start:start + CALENDAR_BATCH_SIZE]:
+            batch.add(
+                service.events().delete(
+                    calendarId=calendar_id,
+                    eventId=event_id,
+                    sendUpdates="all"
+                ),
+                request_id=event_id,
+            )
+
+        try:
+            execute_calendar_request(batch, doctor_id=doctor_id, operation="batch_delete")
+        except CalendarUnavailable:
+            # Remaining events keep their "calendar_unavailable" result
+            break
+
+    return results
+
+
+def cancel_appointments_in_range(
+    *,
+    doctor_id,
+    start_date,
+    end_date,
+    start_time=None,
+    end_time=None,
+):
+    """
+    Cancel every BOOKED appointment of a doctor in a date/time range.
+
+    Calendar first (batched), then ONE DB update for the appointments
+    whose event is gone. Returns (results, cancelled_appointments);
+    notifications are left to the caller.
+    """
+    appts = get_booked_appointments_in_range(
+        doctor_id=doctor_id,
+        start_date=start_date,
+        end_date=end_date,
+        start_time=start_time,
+        end_time=end_time,
+    )
+
+    # 1️⃣ Calendar deletes (batched)
+    event_ids = [a.calendar_event_id for a in appts if a.calendar_event_id]
+    if DISABLE_CALENDAR:
+        calendar_errors = {}
+    else:
+        calendar_errors = delete_calendar_events_batch(doctor_id, event_ids)
+
+    to_cancel = [
+        a for a in appts
+        if not a.calendar_event_id or calendar_errors.get(a.calendar_event_id) is None
+    ]
+
+    # 2️⃣ Single DB update for everything the calendar let go of
+    cancelled_ids = set(
+        bulk_cancel_appointments_db([a.appointment_id for a in to_cancel])
+    )
+
+    results = []
+    cancelled = []
+    for a in appts:
+        if a.appointment_id in cancelled_ids:
+            status, error = "cancelled", None
+            cancelled.append(a)
+        elif a.calendar_event_id and calendar_errors.get(a.calendar_event_id):
+            status, error = "failed", calendar_errors[a.calendar_event_id]
+        else:
+            # Changed by someone else between the read and the update
+            status, error = "skipped", "no_longer_booked"
+
+        results.append({
+            "appointment_id": str(a.appointment_id),
+            "date": a.appointment_date.isoformat(),
+            "time": a.appointment_time.strftime("%H:%M"),
+            "status": status,
+            "error": error,
+        })
+
+    return results, cancelled
+
+
+
 
 
 def is_working_day(date_str: str, doctor_id: str) -> bool:
@@ -399,10 +584,16 @@ def update_calendar_event(
     doctor = get_doctor_from_db(doctor_id)
     end_dt = start_dt + timedelta(minutes=doctor.avg_consult_minutes)
 
-    event = service.events().get(
-        calendarId=calendar_id,
-        eventId=event_id
-    ).execute()
+    turn_events.publish("status", text="📅 Moving your appointment in the doctor's calendar…")
+
+    event = execute_calendar_request(
+        service.events().get(
+            calendarId=calendar_id,
+            eventId=event_id
+        ),
+        doctor_id=doctor_id,
+        operation="get",
+    )
 
     event["start"] = {
         "dateTime": start_dt.isoformat(),
@@ -413,26 +604,27 @@ def update_calendar_event(
         "timeZone": TIMEZONE,
     }
 
-    service.events().patch(
-        calendarId=calendar_id,
-        eventId=event_id,
-        body=event,
-        sendUpdates="all"
-    ).execute()
+    execute_calendar_request(
+        service.events().patch(
+            calendarId=calendar_id,
+            eventId=event_id,
+            body=event,
+            sendUpdates="all"
+        ),
+        doctor_id=doctor_id,
+        operation="patch",
+    )
 
 
 
 
 
 def is_within_clinic_hours(time_str: str, doctor_id) -> bool:
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         doctor = get_doctor_by_id(db, doctor_id)
         if not doctor:
             return False
 
         requested_time = datetime.strptime(time_str, "%H:%M").time()
 
-        return doctor.work_start_time <= requested_time <= doctor.work_end_time
-    finally:
-        db.close()
\ No newline at end of file
+        return doctor.work_start_time <= requested_time <= doctor.work_end_time
\ No newline at end of file